@@ -24,6 +24,8 @@ class Settings(BaseSettings):
     OPENAI_MODEL: str = Field(default="gpt-3.5-turbo", description="OpenAI model name")
     GEMINI_MODEL: str = Field(default="gemini-1.5-flash", description="Gemini model name")
     EMBEDDING_MODEL: str = Field(default="all-MiniLM-L6-v2", description="Sentence transformer model")
+    EMBEDDING_PROVIDER: str = Field(default="hashing", description="Embedding provider: 'hashing' (offline), 'openai' or 'gemini'")
+    EMBEDDING_DIMENSIONS: int = Field(default=384, description="Vector size for the hashing embedding provider")
     
     # Database
     DATABASE_URL: str = Field(
@@ -36,7 +38,49 @@ class Settings(BaseSettings):
         default=str(DATA_DIR / "chroma_db"),
         description="ChromaDB persistent storage directory"
     )
+    VECTOR_STORE_BACKEND: str = Field(default="memory", description="Document store: 'memory' or 'sqlite' (FTS5)")
     CHROMA_COLLECTION: str = Field(default="klu_documents", description="ChromaDB collection name")
+    STORE_CHECKPOINT_INTERVAL: int = Field(default=1000, description="Pending chunk operations that trigger an immediate vector store snapshot")
+    STORE_FLUSH_INTERVAL: float = Field(default=30.0, description="Seconds from the first unsaved change to a background vector store snapshot")
+    STORE_LOG_FSYNC: bool = Field(default=True, description="fsync the vector store operation log after every write")
+    
+    # Retrieval
+    RETRIEVAL_MODE: str = Field(default="keyword", description="Ranking mode: 'keyword', 'bm25', 'dense' or 'hybrid'")
+    BM25_K1: float = Field(default=1.5, description="BM25 term frequency saturation")
+    BM25_B: float = Field(default=0.75, description="BM25 length normalization")
+    PHRASE_BOOST: float = Field(default=10.0, description="Keyword score bonus for an exact phrase match")
+    PROXIMITY_BOOST: float = Field(default=1.0, description="Keyword score bonus when query terms occur close together")
+    PROXIMITY_WINDOW: int = Field(default=8, description="Window in tokens for the proximity bonus")
+    TEXT_ANALYZER: str = Field(default="standard", description="Keyword index analyzer: 'standard' or 'whitespace'")
+    COLLECTION_ANALYZERS: str = Field(
+        default="",
+        description="Comma-separated collection=analyzer overrides of TEXT_ANALYZER"
+    )
+    RETRIEVAL_CACHE_SIZE: int = Field(default=1024, description="Cached query results (0 disables the cache)")
+    RETRIEVAL_CACHE_TTL: float = Field(default=300.0, description="Seconds before a cached query result expires")
+    HYBRID_CANDIDATES: int = Field(default=20, description="Candidates per ranker fused in hybrid mode")
+    RRF_K: int = Field(default=60, description="Reciprocal-rank fusion smoothing constant")
+    MMR_LAMBDA: float = Field(default=0.7, description="MMR relevance weight (1.0 = no diversification)")
+    DENSE_INDEX: str = Field(default="exact", description="Dense search index: 'exact', 'ivf' or 'int8'")
+    IVF_NLIST: int = Field(default=0, description="IVF cluster count (0 = sqrt of chunk count)")
+    IVF_NPROBE: int = Field(default=8, description="IVF clusters scanned per query")
+    IVF_MIN_CHUNKS: int = Field(default=10000, description="Chunk count below which IVF falls back to exact search")
+    QUANTIZED_RESCORE_FACTOR: int = Field(default=4, description="int8 index shortlist size as a multiple of k")
+    
+    # Ingestion
+    INGEST_WORKERS: int = Field(default=0, description="Processes that parse and chunk files in parallel (0 = CPU count)")
+    STREAM_INGEST_MIN_BYTES: int = Field(
+        default=2 * 1024 * 1024,
+        description="Files at least this large are extracted and chunked page by page in bounded memory"
+    )
+    INGEST_BATCH_CHUNKS: int = Field(default=256, description="Chunks per store write when streaming a file")
+    INGEST_JOB_WORKERS: int = Field(default=2, description="Threads that ingest uploaded documents in the background")
+    INGEST_QUEUE_SIZE: int = Field(default=32, description="Maximum upload jobs queued or running; further uploads get 503")
+    NEAR_DUPLICATE_ACTION: str = Field(
+        default="link",
+        description="Near-duplicate chunks of other documents: 'link' (keep, set duplicate_of), 'drop' or 'off'"
+    )
+    NEAR_DUPLICATE_THRESHOLD: float = Field(default=0.9, description="MinHash Jaccard similarity of near-duplicate chunks")
     
     # Server
     HOST: str = Field(default="0.0.0.0", description="Server host")
@@ -55,6 +99,14 @@ class Settings(BaseSettings):
         """Parse CORS origins string into a list"""
         return [origin.strip() for origin in self.CORS_ORIGINS.split(",")]
     
+    def text_analyzer_for(self, collection: str) -> str:
+        """Get the analyzer name of a collection, falling back to TEXT_ANALYZER"""
+        for entry in self.COLLECTION_ANALYZERS.split(","):
+            name, _, analyzer = entry.partition("=")
+            if name.strip() == collection and analyzer.strip():
+                return analyzer.strip()
+        return self.TEXT_ANALYZER
+    
     @property
     def data_dir(self) -> Path:
         """Get the data directory path"""
@@ -28,27 +28,27 @@ async def lifespan(app: FastAPI):
     
     # Auto-ingest sample documents if vector store is empty
     try:
-        from app.services.vector_store import VectorStoreService
-        from app.services.document_processor import DocumentProcessor
+        from app.services.vector_store import get_vector_store
+        from app.services.ingestion import IngestionEngine
         from pathlib import Path
         
-        vector_store = VectorStoreService()
+        vector_store = get_vector_store()
         
         if vector_store.is_empty():
             logger.info("📄 Vector store is empty. Ingesting sample documents...")
             sample_docs_dir = Path(__file__).parent / "seed" / "sample_documents"
             
             if sample_docs_dir.exists():
-                processor = DocumentProcessor()
+                report = IngestionEngine().ingest_directory(str(sample_docs_dir), vector_store)
                 
-                for file_path in sample_docs_dir.iterdir():
-                    if file_path.suffix.lower() in [".txt", ".md", ".pdf"]:
-                        try:
-                            documents, metadata = processor.process_file(str(file_path))
-                            vector_store.add_documents(documents)
-                            logger.info(f"  ✓ Ingested: {file_path.name}")
-                        except Exception as e:
-                            logger.warning(f"  ✗ Error ingesting {file_path.name}: {e}")
+                for metadata in report["documents"]:
+                    logger.info(f"  ✓ Ingested: {metadata['name']}")
+                for failure in report["failed"]:
+                    logger.warning(f"  ✗ Error ingesting {failure['file']}: {failure['error']}")
+                logger.info(
+                    f"  {report['files_per_second']:.1f} files/s, {report['mb_per_second']:.2f} MB/s "
+                    f"with {report['workers']} workers"
+                )
             else:
                 logger.warning("  ⚠ Sample documents directory not found")
         else:
@@ -66,6 +66,22 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("👋 Shutting down KLU Agent Backend...")
+    try:
+        from app.services.ingestion_jobs import shutdown_ingestion_queue
+        shutdown_ingestion_queue()
+    except Exception as e:
+        logger.warning(f"⚠ Error finishing ingestion jobs: {e}")
+    try:
+        from app.services.near_duplicates import save_near_duplicate_index
+        save_near_duplicate_index()
+    except Exception as e:
+        logger.warning(f"⚠ Error saving near-duplicate signatures: {e}")
+    try:
+        from app.services.vector_store import get_vector_store
+        get_vector_store().flush_and_stop()
+        logger.info("💾 Vector store flushed")
+    except Exception as e:
+        logger.warning(f"⚠ Error flushing vector store: {e}")
 
 
 # Create FastAPI application
@@ -2,7 +2,7 @@
 Pydantic schemas for API request/response models
 """
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime, timezone
 
 
@@ -78,7 +78,53 @@ class DocumentUploadResponse(BaseModel):
     """Response for document upload"""
     success: bool
     message: str
-    document: Optional[DocumentInfo] = None
+    job_id: Optional[str] = Field(default=None, description="Ingestion job ID, polled at /documents/jobs/{job_id}")
+
+
+class IngestionJobStatus(BaseModel):
+    """State and progress of a document ingestion job"""
+    job_id: str = Field(..., description="Job ID")
+    filename: str = Field(..., description="Uploaded filename")
+    size: int = Field(..., description="File size in bytes")
+    state: str = Field(..., description="Job state: queued, running, completed or failed")
+    pages_processed: int = Field(default=0, description="Pages extracted so far (text files count as one page)")
+    total_pages: Optional[int] = Field(default=None, description="Pages in the file, once known")
+    chunks_indexed: int = Field(default=0, description="Chunks written to the store so far")
+    document: Optional[DocumentInfo] = Field(default=None, description="Ingested document, once completed")
+    chunks_added: int = Field(default=0, description="Chunks written to the store")
+    chunks_skipped: int = Field(default=0, description="Chunks already stored unchanged")
+    chunks_removed: int = Field(default=0, description="Stored chunks the new version no longer contains")
+    chunks_near_duplicate: int = Field(default=0, description="Chunks near-duplicating another document's chunks")
+    error: Optional[str] = Field(default=None, description="Error message if the job failed")
+    created_at: datetime = Field(..., description="When the job was queued")
+    started_at: Optional[datetime] = Field(default=None, description="When processing started")
+    finished_at: Optional[datetime] = Field(default=None, description="When processing finished")
+
+
+class BatchSearchRequest(BaseModel):
+    """Request to search the knowledge base with many queries at once"""
+    queries: List[str] = Field(..., min_length=1, max_length=1000, description="Query strings")
+    n_results: int = Field(default=5, ge=1, le=50, description="Results per query")
+    filter: Optional[Dict[str, Any]] = Field(default=None, description="Exact-match metadata filter")
+    mode: Optional[str] = Field(default=None, description="Ranking mode; defaults to RETRIEVAL_MODE")
+
+
+class SearchResult(BaseModel):
+    """A retrieved chunk"""
+    content: str
+    metadata: Dict[str, Any] = Field(default={})
+    score: float = Field(..., description="Relevance score")
+
+
+class QueryResults(BaseModel):
+    """Results for one query of a batch"""
+    query: str
+    results: List[SearchResult] = Field(default=[])
+
+
+class BatchSearchResponse(BaseModel):
+    """Response for a batch search"""
+    results: List[QueryResults]
 
 
 # ============== Admin Schemas ==============
@@ -106,6 +152,40 @@ class SystemInfo(BaseModel):
     uptime_seconds: float
 
 
+class RetrievalCacheStats(BaseModel):
+    """Retrieval cache counters"""
+    entries: int
+    max_entries: int
+    ttl_seconds: float
+    hits: int
+    misses: int
+    hit_rate: float
+    evictions: int
+    invalidations: int
+
+
+class PersistenceStats(BaseModel):
+    """Background snapshot counters"""
+    pending_operations: int
+    flush_lag_seconds: float = Field(..., description="Age of the oldest change not yet in a snapshot")
+    flush_interval_seconds: float
+    flushes: int
+    failures: int
+    last_flush_ms: float
+    last_flush_at: Optional[float] = None
+
+
+class VectorStoreMetrics(BaseModel):
+    """Vector store runtime metrics"""
+    backend: str
+    total_documents: int
+    total_chunks: int
+    store_version: int = Field(..., description="Bumped on every add or delete")
+    retrieval_mode: str
+    cache: RetrievalCacheStats
+    persistence: Optional[PersistenceStats] = None
+
+
 # ============== Health Schemas ==============
 
 class HealthResponse(BaseModel):
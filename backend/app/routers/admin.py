@@ -5,12 +5,19 @@ Endpoints for admin functionality
 import logging
 import time
 from fastapi import APIRouter, HTTPException
-from app.models.schemas import DatabaseStats, TableStats, SystemInfo
+from app.models.schemas import (
+    DatabaseStats,
+    PersistenceStats,
+    RetrievalCacheStats,
+    SystemInfo,
+    TableStats,
+    VectorStoreMetrics,
+)
 from app.models.database import SessionLocal
 from app.models.college_models import (
     Student, Faculty, Course, Event, Department, Admission, Facility
 )
-from app.services.vector_store import VectorStoreService
+from app.services.vector_store import get_vector_store
 from app.services.llm_provider import get_llm_info
 from app.config import settings
 
@@ -80,7 +87,7 @@ async def get_system_info():
         llm_info = get_llm_info()
         
         # Get vector store stats
-        vector_store = VectorStoreService()
+        vector_store = get_vector_store()
         vs_stats = vector_store.get_collection_stats()
         
         # Dynamically count database tables
@@ -111,15 +118,50 @@ async def get_system_info():
         db.close()
 
 
+@router.get("/vector-store", response_model=VectorStoreMetrics)
+async def get_vector_store_metrics():
+    """
+    Get vector store runtime metrics.
+    
+    Returns the store version, retrieval cache hit/miss counters and
+    background persistence lag.
+    """
+    try:
+        vector_store = get_vector_store()
+        stats = vector_store.get_collection_stats()
+        cache_stats = vector_store.get_cache_stats()
+        store_version = cache_stats.pop("store_version")
+        persistence_stats = vector_store.get_persistence_stats()
+        
+        return VectorStoreMetrics(
+            backend=settings.VECTOR_STORE_BACKEND,
+            total_documents=stats["total_documents"],
+            total_chunks=stats["total_chunks"],
+            store_version=store_version,
+            retrieval_mode=settings.RETRIEVAL_MODE,
+            cache=RetrievalCacheStats(**cache_stats),
+            persistence=PersistenceStats(**persistence_stats) if persistence_stats else None,
+        )
+    
+    except Exception as e:
+        logger.error(f"Error getting vector store metrics: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error getting vector store metrics: {str(e)}",
+        )
+
+
 @router.post("/seed-documents")
 async def seed_sample_documents():
     """
     Seed the vector store with sample documents.
     
-    This ingests the sample KLU documents if not already done.
+    This ingests the sample KLU documents if not already done; unchanged
+    documents are skipped.
     """
     from pathlib import Path
-    from app.services.document_processor import DocumentProcessor
+    from starlette.concurrency import run_in_threadpool
+    from app.services.ingestion import IngestionEngine
     
     try:
         sample_docs_dir = Path(__file__).parent.parent / "seed" / "sample_documents"
@@ -130,24 +172,28 @@ async def seed_sample_documents():
                 "message": "Sample documents directory not found",
             }
         
-        processor = DocumentProcessor()
-        vector_store = VectorStoreService()
+        vector_store = get_vector_store()
         
-        ingested = []
-        
-        for file_path in sample_docs_dir.iterdir():
-            if file_path.suffix.lower() in [".txt", ".md", ".pdf"]:
-                try:
-                    documents, metadata = processor.process_file(str(file_path))
-                    vector_store.add_documents(documents)
-                    ingested.append(metadata["name"])
-                except Exception as e:
-                    logger.warning(f"Error ingesting {file_path}: {e}")
+        # Parsing runs in worker processes; keep the event loop free meanwhile
+        report = await run_in_threadpool(
+            IngestionEngine().ingest_directory, str(sample_docs_dir), vector_store
+        )
+        ingested = [metadata["name"] for metadata in report["documents"]]
         
         return {
             "success": True,
             "message": f"Ingested {len(ingested)} documents",
             "documents": ingested,
+            "failed": report["failed"],
+            "unchanged_files": report["unchanged_files"],
+            "chunks_added": report["chunks_added"],
+            "chunks_skipped": report["chunks_skipped"],
+            "chunks_removed": report["chunks_removed"],
+            "chunks_near_duplicate": report["chunks_near_duplicate"],
+            "dedup_ratio": report["dedup_ratio"],
+            "seconds": report["seconds"],
+            "files_per_second": report["files_per_second"],
+            "mb_per_second": report["mb_per_second"],
         }
     
     except Exception as e:
@@ -3,95 +3,178 @@ Documents Router
 Endpoints for document management
 """
 import logging
-from fastapi import APIRouter, HTTPException, UploadFile, File
-from typing import List
-from app.models.schemas import DocumentInfo, DocumentStats, DocumentUploadResponse
-from app.services.document_processor import DocumentProcessor
-from app.services.vector_store import VectorStoreService
+import os
+from fastapi import APIRouter, HTTPException, Request, Response
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
+from app.models.schemas import (
+    BatchSearchRequest,
+    BatchSearchResponse,
+    DocumentInfo,
+    DocumentStats,
+    DocumentUploadResponse,
+    IngestionJobStatus,
+    QueryResults,
+    SearchResult,
+)
+from app.services.document_processor import DocumentProcessor, UploadTooLargeError
+from app.services.ingestion_jobs import QueueFullError, get_ingestion_queue
+from app.services.multipart_upload import MultipartUploadReceiver, UploadFormError
+from app.services.vector_store import get_vector_store
 
 logger = logging.getLogger(__name__)
 
 # Maximum upload size: 10 MB
 MAX_UPLOAD_SIZE = 10 * 1024 * 1024
 
+# Allowance for multipart boundaries and part headers in the request size
+MAX_FORM_OVERHEAD = 64 * 1024
+
+ALLOWED_EXTENSIONS = [".pdf", ".txt", ".md"]
+
 router = APIRouter(prefix="/documents", tags=["Documents"])
 
 
-@router.post("/upload", response_model=DocumentUploadResponse)
-async def upload_document(file: UploadFile = File(...)):
+@router.post(
+    "/upload",
+    response_model=DocumentUploadResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {"file": {"type": "string", "format": "binary"}},
+                        "required": ["file"],
+                    }
+                }
+            },
+        }
+    },
+)
+async def upload_document(request: Request, response: Response):
     """
     Upload a document for ingestion into the knowledge base.
     
     Supported formats: PDF, TXT, MD
     
-    The document will be:
-    1. Saved to the documents directory
-    2. Parsed and chunked
-    3. Embedded and stored in the vector database
+    The document is sent as the "file" field of a multipart form. It is
+    written straight to a temporary file as it arrives, and a request whose
+    Content-Length already exceeds the size limit is rejected unread.
+    
+    The document is queued and the request returns 202 with a job ID at
+    once. In the background the document will be:
+    1. Parsed and chunked
+    2. Embedded and stored in the vector database
+    3. Saved to the documents directory
+    
+    Poll GET /documents/jobs/{job_id} for progress.
     """
-    # Validate file type
-    allowed_extensions = [".pdf", ".txt", ".md"]
-    file_ext = "." + file.filename.split(".")[-1].lower() if "." in file.filename else ""
+    # Reject oversize uploads before reading the body
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_SIZE + MAX_FORM_OVERHEAD:
+        return _too_large_response(int(content_length))
     
-    if file_ext not in allowed_extensions:
-        return DocumentUploadResponse(
-            success=False,
-            message=f"Unsupported file type '{file_ext}'. Allowed formats: {', '.join(allowed_extensions)}",
-        )
+    processor = DocumentProcessor()
+    receiver = MultipartUploadReceiver(processor, MAX_UPLOAD_SIZE, ALLOWED_EXTENSIONS)
+    temp_path = None
     
     try:
-        # Read file content
-        content = await file.read()
-        
-        # Validate file size
-        if len(content) > MAX_UPLOAD_SIZE:
-            return DocumentUploadResponse(
-                success=False,
-                message=f"File too large ({len(content) / (1024*1024):.1f} MB). Maximum size: {MAX_UPLOAD_SIZE / (1024*1024):.0f} MB.",
+        # Stream the file to a temp file in blocks, hashing and size-checking as we go
+        try:
+            filename, temp_path, size, content_hash = await receiver.receive(
+                request.headers.get("content-type", ""), request.stream()
             )
+        except UploadFormError as e:
+            return DocumentUploadResponse(success=False, message=str(e))
+        except UploadTooLargeError:
+            return _too_large_response()
         
-        if len(content) == 0:
+        if size == 0:
+            processor.discard_upload(temp_path)
             return DocumentUploadResponse(
                 success=False,
                 message="File is empty. Please upload a file with content.",
             )
         
-        # Process document
-        processor = DocumentProcessor()
-        documents, metadata = processor.process_file(
-            file_path=file.filename,
-            file_content=content,
-        )
-        
-        # Save to documents directory
-        saved_path = processor.save_uploaded_file(file.filename, content)
-        
-        # Add to vector store
-        vector_store = VectorStoreService()
-        vector_store.add_documents(documents)
-        
-        logger.info(f"Successfully uploaded document: {file.filename} ({len(content)} bytes, {metadata['chunk_count']} chunks)")
+        # Ingest in the background; unchanged chunks of a re-uploaded file are skipped
+        job = get_ingestion_queue().submit(filename, temp_path, size, content_hash)
         
+        response.status_code = 202
         return DocumentUploadResponse(
             success=True,
-            message=f"Successfully uploaded and processed {file.filename}",
-            document=DocumentInfo(
-                id=metadata["id"],
-                name=metadata["name"],
-                size=metadata["size"],
-                chunk_count=metadata["chunk_count"],
-                upload_date=metadata["upload_date"],
-            ),
+            message=f"Accepted {filename} for processing",
+            job_id=job.id,
         )
     
+    except QueueFullError as e:
+        processor.discard_upload(temp_path)
+        raise HTTPException(status_code=503, detail=f"{e}. Please try again shortly.")
     except Exception as e:
-        logger.error(f"Error processing uploaded document {file.filename}: {e}")
+        if temp_path:
+            processor.discard_upload(temp_path)
+        logger.error(f"Error queueing uploaded document {receiver.filename}: {e}")
         return DocumentUploadResponse(
             success=False,
             message=f"Failed to process document. Please check the file format and try again.",
         )
 
 
+def _too_large_response(size: Optional[int] = None) -> DocumentUploadResponse:
+    """Upload response rejecting a file over MAX_UPLOAD_SIZE"""
+    size_note = f" ({size / (1024*1024):.1f} MB)" if size is not None else ""
+    return DocumentUploadResponse(
+        success=False,
+        message=f"File too large{size_note}. Maximum size: {MAX_UPLOAD_SIZE / (1024*1024):.0f} MB.",
+    )
+
+
+@router.get("/jobs/{job_id}", response_model=IngestionJobStatus)
+async def get_ingestion_job(job_id: str):
+    """
+    Get the state and progress of a document ingestion job.
+    
+    - **job_id**: Job ID returned by the upload endpoint
+    
+    Reports pages processed and chunks indexed while the job runs, and
+    the ingested document once it has completed.
+    """
+    job = get_ingestion_queue().get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Ingestion job {job_id} not found",
+        )
+    
+    status = job.to_dict()
+    result = status["result"] or {}
+    return IngestionJobStatus(
+        job_id=status["id"],
+        filename=status["filename"],
+        size=status["size"],
+        state=status["state"],
+        pages_processed=status["pages_processed"],
+        total_pages=status["total_pages"],
+        chunks_indexed=status["chunks_indexed"],
+        document=DocumentInfo(
+            id=result["id"],
+            name=result["name"],
+            size=result["size"],
+            chunk_count=result["chunk_count"],
+            upload_date=result["upload_date"],
+        ) if result else None,
+        chunks_added=result.get("chunks_added", 0),
+        chunks_skipped=result.get("chunks_skipped", 0),
+        chunks_removed=result.get("chunks_removed", 0),
+        chunks_near_duplicate=result.get("chunks_near_duplicate", 0),
+        error=status["error"],
+        created_at=status["created_at"],
+        started_at=status["started_at"],
+        finished_at=status["finished_at"],
+    )
+
+
 @router.get("", response_model=List[DocumentInfo])
 async def list_documents():
     """
@@ -100,7 +183,7 @@ async def list_documents():
     Returns information about each document in the knowledge base.
     """
     try:
-        vector_store = VectorStoreService()
+        vector_store = get_vector_store()
         documents = vector_store.get_all_documents()
         
         return [
@@ -131,16 +214,10 @@ async def delete_document(doc_id: str):
     Removes all chunks associated with the document.
     """
     try:
-        vector_store = VectorStoreService()
+        vector_store = get_vector_store()
         
         # First try to find document by ID or name
-        documents = vector_store.get_all_documents()
-        doc_to_delete = None
-        
-        for doc in documents:
-            if doc.get("id") == doc_id or doc.get("name") == doc_id:
-                doc_to_delete = doc
-                break
+        doc_to_delete = vector_store.find_document(doc_id)
         
         if not doc_to_delete:
             raise HTTPException(
@@ -173,7 +250,7 @@ async def get_document_stats():
     Returns total documents, chunks, and list of sources.
     """
     try:
-        vector_store = VectorStoreService()
+        vector_store = get_vector_store()
         stats = vector_store.get_collection_stats()
         
         return DocumentStats(
@@ -187,3 +264,47 @@ async def get_document_stats():
             status_code=500,
             detail=f"Error getting stats: {str(e)}",
         )
+
+
+@router.post("/search/batch", response_model=BatchSearchResponse)
+async def search_batch(request: BatchSearchRequest):
+    """
+    Search the knowledge base with many queries in one call.
+    
+    All queries are scored against the index in a single batched pass,
+    which is much faster than one request per query for evaluation runs.
+    """
+    try:
+        vector_store = get_vector_store()
+        # Scoring is CPU-bound; keep it off the event loop
+        rankings = await run_in_threadpool(
+            vector_store.query_many,
+            request.queries,
+            n_results=request.n_results,
+            filter_dict=request.filter,
+            mode=request.mode,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error searching documents: {str(e)}",
+        )
+    
+    return BatchSearchResponse(
+        results=[
+            QueryResults(
+                query=query,
+                results=[
+                    SearchResult(
+                        content=result["content"],
+                        metadata=result["metadata"],
+                        score=result["similarity_score"],
+                    )
+                    for result in ranking
+                ],
+            )
+            for query, ranking in zip(request.queries, rankings)
+        ]
+    )
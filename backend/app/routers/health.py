@@ -26,7 +26,7 @@ async def readiness_check():
     Readiness check endpoint.
     Verifies that all required services are available.
     """
-    from app.services.vector_store import VectorStoreService
+    from app.services.vector_store import get_vector_store
     from app.services.sql_agent import SQLAgentService
     
     checks = {
@@ -44,7 +44,7 @@ async def readiness_check():
     
     try:
         # Check vector store
-        vector_store = VectorStoreService()
+        vector_store = get_vector_store()
         vector_store.get_collection_stats()
         checks["vector_store"] = True
     except Exception:
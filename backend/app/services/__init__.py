@@ -2,7 +2,7 @@
 Backend services
 """
 from .llm_provider import get_llm, get_embeddings
-from .vector_store import VectorStoreService
+from .vector_store import VectorStoreService, get_vector_store
 from .document_processor import DocumentProcessor
 from .sql_agent import SQLAgentService
 from .agent_router import AgentRouter
@@ -9,7 +9,7 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.documents import Document
 from langchain_core.output_parsers import StrOutputParser
 from app.services.llm_provider import get_llm
-from app.services.vector_store import VectorStoreService
+from app.services.vector_store import get_vector_store
 from app.services.sql_agent import SQLAgentService
 
 
@@ -23,7 +23,7 @@ class AgentRouter:
     
     def __init__(self):
         """Initialize the agent router with tools"""
-        self.vector_store = VectorStoreService()
+        self.vector_store = get_vector_store()
         self.sql_agent = SQLAgentService()
     
     def _search_documents(self, query: str) -> str:
@@ -0,0 +1,133 @@
+"""
+Chunk Records
+Compact in-memory representation of stored chunks
+"""
+from typing import Any, Dict, Optional, Tuple
+
+# Metadata fields that vary per chunk; everything else belongs to the document
+CHUNK_METADATA_FIELDS = ("chunk_index", "chunk_hash", "start_index", "duplicate_of")
+
+
+class DocumentRecord:
+    """Document-level metadata shared by every chunk of a document"""
+    
+    __slots__ = ("metadata", "key", "refcount")
+    
+    def __init__(self, metadata: Dict[str, Any], key: Any):
+        self.metadata = metadata
+        self.key = key
+        self.refcount = 0
+
+
+class ChunkRecord:
+    """
+    A stored chunk.
+    
+    Holds either the chunk text or its row in the store snapshot, the
+    chunk-level metadata, and a reference to a shared DocumentRecord.
+    """
+    
+    __slots__ = ("document", "chunk_index", "extra", "content", "row")
+    
+    def __init__(
+        self,
+        document: DocumentRecord,
+        chunk_index: Optional[int],
+        extra: Optional[Dict[str, Any]] = None,
+        content: Optional[str] = None,
+        row: int = -1,
+    ):
+        self.document = document
+        self.chunk_index = chunk_index
+        self.extra = extra
+        self.content = content
+        self.row = row
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        """Look up one metadata field without building the metadata dict"""
+        if key == "chunk_index" and self.chunk_index is not None:
+            return self.chunk_index
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        return self.document.metadata.get(key, default)
+    
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Full chunk metadata as a new dict"""
+        metadata = dict(self.document.metadata)
+        if self.chunk_index is not None:
+            metadata["chunk_index"] = self.chunk_index
+        if self.extra:
+            metadata.update(self.extra)
+        return metadata
+
+
+def split_metadata(metadata: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[int], Optional[Dict[str, Any]]]:
+    """
+    Split chunk metadata into document-level fields, chunk index and other
+    chunk-level fields.
+    """
+    document = {}
+    extra = None
+    for key, value in metadata.items():
+        if key in CHUNK_METADATA_FIELDS:
+            if key != "chunk_index":
+                extra = extra or {}
+                extra[key] = value
+        else:
+            document[key] = value
+    return document, metadata.get("chunk_index"), extra
+
+
+class DocumentRegistry:
+    """
+    Interns document-level metadata.
+    
+    Chunks whose document-level fields are equal share one DocumentRecord,
+    which is dropped once its last chunk is released.
+    """
+    
+    def __init__(self):
+        self._records: Dict[Any, DocumentRecord] = {}
+    
+    def __len__(self) -> int:
+        return len(self._records)
+    
+    def acquire(self, metadata: Dict[str, Any], chunks: int = 1) -> DocumentRecord:
+        """
+        Get the shared record for document-level metadata.
+        
+        Args:
+            metadata: Document-level metadata fields
+            chunks: Number of chunks taking a reference to the record
+        """
+        try:
+            key = tuple(sorted(metadata.items()))
+            hash(key)
+        except TypeError:
+            # Unhashable values (e.g. lists) are not interned
+            key = None
+        
+        record = self._records.get(key) if key is not None else None
+        if record is None:
+            record = DocumentRecord(metadata, key)
+            if key is not None:
+                self._records[key] = record
+        record.refcount += chunks
+        return record
+    
+    def release(self, record: DocumentRecord):
+        """Drop one chunk's reference to a document record"""
+        record.refcount -= 1
+        if record.refcount <= 0 and record.key is not None:
+            self._records.pop(record.key, None)
+    
+    def make_chunk(
+        self,
+        metadata: Dict[str, Any],
+        content: Optional[str] = None,
+        row: int = -1,
+    ) -> ChunkRecord:
+        """Build a chunk record from full chunk metadata"""
+        document, chunk_index, extra = split_metadata(metadata)
+        return ChunkRecord(self.acquire(document), chunk_index, extra, content, row)
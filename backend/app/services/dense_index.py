@@ -0,0 +1,269 @@
+"""
+Dense Index
+Exact nearest-neighbour search over chunk embeddings
+"""
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+import numpy as np
+
+
+class DenseIndex:
+    """
+    Chunk embeddings stored as contiguous float32 rows.
+    
+    Rows are L2-normalized on insert, so cosine similarity is a single
+    matrix-vector product. Rows freed by deletes are zeroed and reused.
+    
+    An index opened with ``from_matrix`` searches the given array in place
+    (e.g. memory-mapped from a snapshot) and never copies it: vectors added
+    since go to an in-memory overlay, and removed or replaced snapshot rows
+    are only masked out until the next checkpoint writes a compacted array.
+    """
+    
+    def __init__(self, dimensions: int, initial_capacity: int = 1024):
+        """
+        Initialize an empty index.
+        
+        Args:
+            dimensions: Embedding size
+            initial_capacity: Number of rows to preallocate
+        """
+        self.dimensions = dimensions
+        
+        # Read-only rows from a snapshot; slots below _base_size
+        self._base = np.zeros((0, dimensions), dtype=np.float32)
+        self._base_size = 0
+        
+        # Rows of slots added in memory, indexed by slot - _base_size
+        self._overlay = np.zeros((initial_capacity, dimensions), dtype=np.float32)
+        self._valid = np.zeros(initial_capacity, dtype=bool)
+        self._slot_ids: List[Optional[str]] = []
+        self._slots: Dict[str, int] = {}
+        self._free_slots: List[int] = []
+    
+    @classmethod
+    def from_matrix(cls, chunk_ids: Sequence[str], matrix: np.ndarray, **kwargs) -> "DenseIndex":
+        """
+        Open an index over existing normalized embedding rows.
+        
+        Args:
+            chunk_ids: Chunk ID for each row
+            matrix: Array of shape (len(chunk_ids), dimensions); never copied
+            **kwargs: Extra constructor arguments of subclasses
+        
+        Returns:
+            DenseIndex searching the matrix in place
+        """
+        index = cls(matrix.shape[1], initial_capacity=0, **kwargs)
+        index._base = matrix
+        index._base_size = len(chunk_ids)
+        index._valid = np.ones(len(chunk_ids), dtype=bool)
+        index._slot_ids = list(chunk_ids)
+        index._slots = {chunk_id: slot for slot, chunk_id in enumerate(chunk_ids)}
+        return index
+    
+    def training_state(self) -> Optional[Dict[str, Any]]:
+        """Trained search structures to carry over to a reopened index; None if there are none"""
+        return None
+    
+    def restore_training(self, state: Dict[str, Any]):
+        """Reuse the training_state of a previous index over the same embeddings"""
+    
+    def _rows(self, slots: np.ndarray) -> np.ndarray:
+        """Vectors of slots, from the snapshot array or the overlay"""
+        slots = np.asarray(slots, dtype=np.int64)
+        rows = np.empty((len(slots), self.dimensions), dtype=np.float32)
+        in_base = slots < self._base_size
+        if in_base.any():
+            rows[in_base] = self._base[slots[in_base]]
+        if not in_base.all():
+            rows[~in_base] = self._overlay[slots[~in_base] - self._base_size]
+        return rows
+    
+    def vectors(self, chunk_ids: Sequence[str]) -> np.ndarray:
+        """
+        Get the stored (normalized) embeddings of chunks.
+        
+        Args:
+            chunk_ids: Chunk identifiers, all of which must be indexed
+        
+        Returns:
+            Array of shape (len(chunk_ids), dimensions)
+        """
+        return self._rows(np.array([self._slots[chunk_id] for chunk_id in chunk_ids], dtype=np.int64))
+    
+    def __len__(self) -> int:
+        return len(self._slots)
+    
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._slots
+    
+    def _allocate(self) -> int:
+        """Get a free overlay row, growing the buffers if needed"""
+        if self._free_slots:
+            return self._free_slots.pop()
+        
+        slot = len(self._slot_ids)
+        self._slot_ids.append(None)
+        if slot >= len(self._valid):
+            valid = np.zeros(max(1024, 2 * len(self._valid)), dtype=bool)
+            valid[:slot] = self._valid[:slot]
+            self._valid = valid
+        
+        overlay_row = slot - self._base_size
+        if overlay_row >= len(self._overlay):
+            self._overlay = self._grow_overlay(max(1024, 2 * len(self._overlay)))
+        return slot
+    
+    def _grow_overlay(self, capacity: int) -> np.ndarray:
+        """Overlay buffer of the given capacity holding the current overlay rows"""
+        overlay = np.zeros((capacity, self.dimensions), dtype=np.float32)
+        overlay[:len(self._overlay)] = self._overlay
+        return overlay
+    
+    def add(self, chunk_ids: Sequence[str], vectors: np.ndarray):
+        """
+        Insert or replace embeddings.
+        
+        Args:
+            chunk_ids: Chunk identifiers
+            vectors: Array of shape (len(chunk_ids), dimensions)
+        """
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(chunk_ids), self.dimensions)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+        
+        for chunk_id, vector in zip(chunk_ids, vectors):
+            slot = self._slots.get(chunk_id)
+            if slot is not None and slot < self._base_size:
+                # Snapshot rows are read-only; move the chunk to the overlay
+                self.remove(chunk_id)
+                slot = None
+            if slot is None:
+                slot = self._allocate()
+                self._slots[chunk_id] = slot
+                self._slot_ids[slot] = chunk_id
+            self._overlay[slot - self._base_size] = vector
+            self._valid[slot] = True
+    
+    def remove(self, chunk_id: str) -> bool:
+        """
+        Remove a chunk's embedding.
+        
+        Returns:
+            True if the chunk was indexed
+        """
+        if chunk_id not in self._slots:
+            return False
+        
+        slot = self._slots.pop(chunk_id)
+        self._valid[slot] = False
+        self._slot_ids[slot] = None
+        # Snapshot slots stay tombstoned; overlay slots are reused
+        if slot >= self._base_size:
+            self._overlay[slot - self._base_size] = 0.0
+            self._free_slots.append(slot)
+        return True
+    
+    def _scores(self, queries: np.ndarray) -> np.ndarray:
+        """Dot products of normalized queries with every slot, shape (n_queries, n_slots)"""
+        n_slots = len(self._slot_ids)
+        scores = np.empty((len(queries), n_slots), dtype=np.float32)
+        scores[:, :self._base_size] = queries @ self._base.T
+        if n_slots > self._base_size:
+            scores[:, self._base_size:] = queries @ self._overlay[:n_slots - self._base_size].T
+        return scores
+    
+    def _mask(self, allowed_ids: Optional[Set[str]]) -> np.ndarray:
+        """Boolean mask of the slots a search may return"""
+        n_slots = len(self._slot_ids)
+        if allowed_ids is None:
+            return self._valid[:n_slots]
+        mask = np.zeros(n_slots, dtype=bool)
+        mask[[self._slots[i] for i in allowed_ids if i in self._slots]] = True
+        return mask
+    
+    def search(
+        self,
+        query_vector: np.ndarray,
+        k: int,
+        allowed_ids: Optional[Set[str]] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        Find the k most similar chunks by cosine similarity.
+        
+        Args:
+            query_vector: Query embedding
+            k: Number of results
+            allowed_ids: Optional set restricting which chunks may be returned
+        
+        Returns:
+            List of (chunk ID, similarity) sorted by similarity
+        """
+        if not self._slots or k <= 0:
+            return []
+        
+        query = np.asarray(query_vector, dtype=np.float32).reshape(self.dimensions)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+        
+        scores = self._scores(query[None, :])[0]
+        mask = self._mask(allowed_ids)
+        scores = np.where(mask, scores, -np.inf)
+        
+        k = min(k, int(mask.sum()))
+        if k == 0:
+            return []
+        
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self._slot_ids[slot], float(scores[slot])) for slot in top]
+    
+    def search_many(
+        self,
+        query_vectors: np.ndarray,
+        k: int,
+        allowed_ids: Optional[Set[str]] = None,
+        block_size: int = 256,
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        Find the k most similar chunks for each of several queries.
+        
+        Queries are scored in blocks with one matrix-matrix product each.
+        
+        Args:
+            query_vectors: Array of shape (n_queries, dimensions)
+            k: Number of results per query
+            allowed_ids: Optional set restricting which chunks may be returned
+            block_size: Queries scored per matrix product
+        
+        Returns:
+            One list of (chunk ID, similarity) per query, sorted by similarity
+        """
+        queries = np.asarray(query_vectors, dtype=np.float32).reshape(-1, self.dimensions)
+        if not self._slots or k <= 0:
+            return [[] for _ in range(len(queries))]
+        
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = np.divide(queries, norms, out=np.zeros_like(queries), where=norms > 0)
+        
+        mask = self._mask(allowed_ids)
+        k = min(k, int(mask.sum()))
+        if k == 0:
+            return [[] for _ in range(len(queries))]
+        
+        results = []
+        for start in range(0, len(queries), block_size):
+            scores = self._scores(queries[start:start + block_size])
+            scores[:, ~mask] = -np.inf
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+            for slots, row_scores in zip(top.tolist(), top_scores.tolist()):
+                results.append([
+                    (self._slot_ids[slot], score)
+                    for slot, score in zip(slots, row_scores)
+                ])
+        return results
@@ -2,21 +2,147 @@
 Document Processor Service
 Handles PDF and text file parsing with chunking for vector storage
 """
+import hashlib
 import logging
 import os
+import shutil
+import tempfile
 import uuid
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Tuple
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from typing import Callable, List, Dict, Any, Iterable, Iterator, Optional, Tuple
 from langchain_core.documents import Document
 import pypdf
 import fitz  # PyMuPDF
 from app.config import settings
+from app.services.fingerprints import chunk_hash, file_sha256
+from app.services.text_splitter import RecursiveTextSplitter
 
 logger = logging.getLogger(__name__)
 
 
+class UploadTooLargeError(Exception):
+    """Raised when an uploaded file exceeds the maximum upload size"""
+
+
+class UploadSpool:
+    """
+    Temporary file an upload is written to as it arrives.
+    
+    Every block is hashed and size-checked as it is written, so memory use
+    does not depend on the file size and an oversize file is rejected as
+    soon as it passes max_size. The file sits in its own hidden
+    ``.upload-*`` directory under its original name, so it can be processed
+    as that file and later kept with DocumentProcessor.keep_uploaded_file
+    or removed with DocumentProcessor.discard_upload.
+    """
+    
+    def __init__(self, directory: Path, filename: str, max_size: int):
+        """
+        Create the temporary file.
+        
+        Args:
+            directory: Directory to create the hidden upload directory in
+            filename: Original filename
+            max_size: Maximum size in bytes
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.size = 0
+        self._temp_dir = tempfile.mkdtemp(prefix=".upload-", dir=directory)
+        self.path = os.path.join(self._temp_dir, os.path.basename(filename))
+        self._digest = hashlib.sha256()
+        self._file = open(self.path, "wb")
+    
+    def write(self, block: bytes):
+        """
+        Append a block of the upload.
+        
+        Raises:
+            UploadTooLargeError: If the upload now holds more than max_size bytes
+        """
+        self.size += len(block)
+        if self.size > self.max_size:
+            raise UploadTooLargeError(f"Upload exceeds {self.max_size} bytes")
+        self._digest.update(block)
+        self._file.write(block)
+    
+    def close(self) -> Tuple[str, int, str]:
+        """
+        Finish the file.
+        
+        Returns:
+            Tuple of (temporary file path, size in bytes, SHA-256 hex digest)
+        """
+        self._file.close()
+        return self.path, self.size, self._digest.hexdigest()
+    
+    def discard(self):
+        """Close and remove the temporary file and its directory"""
+        self._file.close()
+        shutil.rmtree(self._temp_dir, ignore_errors=True)
+
+
+class IncrementalTextSplitter:
+    """
+    Splits text that arrives in pieces, e.g. one PDF page at a time.
+    
+    Pieces are buffered until the buffer holds ``window`` characters; the
+    buffer is then split and every chunk but the last is emitted. The text
+    from the last chunk onwards stays in the buffer as the start of the
+    next split, so chunks overlap across piece boundaries the same way they
+    do within a piece. Memory is bounded by the window plus one piece, not
+    by the text size. Chunks come with their offset in the whole text.
+    """
+    
+    def __init__(self, splitter: RecursiveTextSplitter, window: int):
+        """
+        Initialize the splitter.
+        
+        Args:
+            splitter: Splitter applied to the buffered text
+            window: Buffered characters that trigger a split
+        """
+        self.splitter = splitter
+        self.window = window
+        self._parts: List[str] = []
+        self._size = 0
+        # Offset of the buffer in the whole text
+        self._offset = 0
+    
+    def feed(self, text: str) -> List[Tuple[str, int]]:
+        """
+        Append text and return the chunks that are now final.
+        
+        Args:
+            text: Next piece of text
+        
+        Returns:
+            (chunk, start offset) of each completed chunk, possibly none
+        """
+        self._parts.append(text)
+        self._size += len(text)
+        if self._size < self.window:
+            return []
+        
+        buffer = "".join(self._parts)
+        spans = self.splitter.split_offsets(buffer)
+        if len(spans) <= 1:
+            return []
+        chunks = [(buffer[start:end], self._offset + start) for start, end in spans[:-1]]
+        last_start = spans[-1][0]
+        self._parts = [buffer[last_start:]]
+        self._size = len(self._parts[0])
+        self._offset += last_start
+        return chunks
+    
+    def finish(self) -> List[Tuple[str, int]]:
+        """Split and return whatever text is still buffered"""
+        buffer = "".join(self._parts)
+        self._parts, self._size = [], 0
+        return [(buffer[start:end], self._offset + start) for start, end in self.splitter.split_offsets(buffer)]
+
+
 class DocumentProcessor:
     """Processes documents for ingestion into the vector store"""
     
@@ -34,10 +160,9 @@ class DocumentProcessor:
         """
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        self.text_splitter = RecursiveCharacterTextSplitter(
+        self.text_splitter = RecursiveTextSplitter(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
-            length_function=len,
             separators=["\n\n", "\n", " ", ""],
         )
         self.documents_dir = settings.documents_dir
@@ -46,6 +171,8 @@ class DocumentProcessor:
         self,
         file_path: str,
         file_content: Optional[bytes] = None,
+        on_page: Optional[Callable[[int, int], Any]] = None,
+        content_hash: Optional[str] = None,
     ) -> Tuple[List[Document], Dict[str, Any]]:
         """
         Process a file and return chunked documents with metadata.
@@ -53,6 +180,8 @@ class DocumentProcessor:
         Args:
             file_path: Path to the file or filename
             file_content: Optional file content bytes (for uploaded files)
+            on_page: Optional callback with (pages read, total pages) after each page
+            content_hash: SHA-256 of the file if already known
             
         Returns:
             Tuple of (list of Document objects, file metadata dict)
@@ -62,30 +191,30 @@ class DocumentProcessor:
         
         # Extract text based on file type
         if file_ext == ".pdf":
-            text = self._extract_pdf_text(file_path, file_content)
+            text = self._extract_pdf_text(file_path, file_content, on_page)
         elif file_ext in [".txt", ".md"]:
             text = self._extract_text_file(file_path, file_content)
+            if on_page:
+                on_page(1, 1)
         else:
             raise ValueError(f"Unsupported file type: {file_ext}")
         
         # Create metadata
-        doc_id = str(uuid.uuid4())
-        metadata = {
-            "id": doc_id,
-            "source": filename,
-            "file_type": file_ext,
-            "upload_date": datetime.utcnow().isoformat(),
-        }
+        metadata = self._document_metadata(file_path, file_content, content_hash)
+        doc_id = metadata["id"]
         
         # Split text into chunks
-        chunks = self.text_splitter.split_text(text)
+        spans = self.text_splitter.split_offsets(text)
+        chunks = [text[start:end] for start, end in spans]
         
         # Create Document objects with metadata
         documents = []
-        for i, chunk in enumerate(chunks):
+        for i, (chunk, (start, _)) in enumerate(zip(chunks, spans)):
             doc_metadata = {
                 **metadata,
                 "chunk_index": i,
+                "chunk_hash": chunk_hash(chunk),
+                "start_index": start,
                 "total_chunks": len(chunks),
             }
             documents.append(Document(page_content=chunk, metadata=doc_metadata))
@@ -95,15 +224,113 @@ class DocumentProcessor:
             "name": filename,
             "chunk_count": len(chunks),
             "upload_date": metadata["upload_date"],
-            "size": len(file_content) if file_content else os.path.getsize(file_path),
+            "size": metadata["size"],
+            "content_hash": metadata["content_hash"],
         }
         
         return documents, file_metadata
     
+    def stream_file(
+        self,
+        file_path: str,
+        on_batch: Callable[[List[Document]], Any],
+        file_content: Optional[bytes] = None,
+        batch_size: int = 256,
+        on_page: Optional[Callable[[int, int], Any]] = None,
+        content_hash: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Process a file in bounded memory, handing chunks over in batches.
+        
+        PDF pages are extracted one at a time and text files are read in
+        blocks; both are fed through an IncrementalTextSplitter, so peak
+        memory does not grow with the document. Chunk boundaries may differ
+        slightly from process_file, and chunks carry no "total_chunks"
+        field since the count is only known at the end.
+        
+        Args:
+            file_path: Path to the file or filename
+            on_batch: Called with each batch of up to batch_size chunks
+            file_content: Optional file content bytes (for uploaded files)
+            batch_size: Chunks per batch
+            on_page: Optional callback with (pages read, total pages) after
+                each PDF page; text files count as a single page
+            content_hash: SHA-256 of the file if already known
+        
+        Returns:
+            File metadata dict, as returned by process_file
+        """
+        filename = os.path.basename(file_path)
+        file_ext = os.path.splitext(filename)[1].lower()
+        
+        if file_ext == ".pdf":
+            pieces = self._iter_pdf_text(file_path, file_content, on_page)
+        elif file_ext in [".txt", ".md"]:
+            pieces = self._iter_text_file(file_path, file_content)
+        else:
+            raise ValueError(f"Unsupported file type: {file_ext}")
+        
+        metadata = self._document_metadata(file_path, file_content, content_hash)
+        splitter = IncrementalTextSplitter(self.text_splitter, window=self.chunk_size * 8)
+        chunk_count = 0
+        batch = []
+        
+        def emit(chunks: List[Tuple[str, int]]):
+            nonlocal chunk_count, batch
+            for chunk, start in chunks:
+                batch.append(Document(
+                    page_content=chunk,
+                    metadata={
+                        **metadata,
+                        "chunk_index": chunk_count,
+                        "chunk_hash": chunk_hash(chunk),
+                        "start_index": start,
+                    },
+                ))
+                chunk_count += 1
+                if len(batch) >= batch_size:
+                    on_batch(batch)
+                    batch = []
+        
+        for piece in pieces:
+            emit(splitter.feed(piece))
+        emit(splitter.finish())
+        if batch:
+            on_batch(batch)
+        if on_page and file_ext != ".pdf":
+            on_page(1, 1)
+        
+        return {
+            "id": metadata["id"],
+            "name": filename,
+            "chunk_count": chunk_count,
+            "upload_date": metadata["upload_date"],
+            "size": metadata["size"],
+            "content_hash": metadata["content_hash"],
+        }
+    
+    def _document_metadata(
+        self,
+        file_path: str,
+        file_content: Optional[bytes] = None,
+        content_hash: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Document-level metadata shared by every chunk of a new document"""
+        filename = os.path.basename(file_path)
+        return {
+            "id": str(uuid.uuid4()),
+            "source": filename,
+            "file_type": os.path.splitext(filename)[1].lower(),
+            "upload_date": datetime.utcnow().isoformat(),
+            "size": len(file_content) if file_content else os.path.getsize(file_path),
+            "content_hash": content_hash or file_sha256(file_path, file_content),
+        }
+    
     def _extract_pdf_text(
         self,
         file_path: str,
         file_content: Optional[bytes] = None,
+        on_page: Optional[Callable[[int, int], Any]] = None,
     ) -> str:
         """
         Extract text from a PDF file using PyMuPDF (faster) with PyPDF2 fallback.
@@ -111,11 +338,34 @@ class DocumentProcessor:
         Args:
             file_path: Path to PDF file
             file_content: Optional PDF bytes
+            on_page: Optional callback with (pages read, total pages) after each page
             
         Returns:
             Extracted text
         """
-        text_parts = []
+        return "\n\n".join(self._iter_pdf_pages(file_path, file_content, on_page))
+    
+    def _iter_pdf_pages(
+        self,
+        file_path: str,
+        file_content: Optional[bytes] = None,
+        on_page: Optional[Callable[[int, int], Any]] = None,
+    ) -> Iterator[str]:
+        """
+        Yield the text of each non-empty PDF page, one page at a time.
+        
+        Uses PyMuPDF, falling back to pypdf for the remaining pages if
+        PyMuPDF cannot open or read the file.
+        
+        Args:
+            file_path: Path to PDF file
+            file_content: Optional PDF bytes
+            on_page: Optional callback with (pages read, total pages) after each page
+        
+        Yields:
+            Page text prefixed with a "[Page n]" marker
+        """
+        pages_done = 0
         
         try:
             # Try PyMuPDF first (faster and better quality)
@@ -124,15 +374,20 @@ class DocumentProcessor:
             else:
                 doc = fitz.open(file_path)
             
-            for page_num, page in enumerate(doc, 1):
-                page_text = page.get_text()
-                if page_text.strip():
-                    text_parts.append(f"[Page {page_num}]\n{page_text}")
-            
-            doc.close()
-            
+            try:
+                for page_num, page in enumerate(doc, 1):
+                    page_text = page.get_text()
+                    pages_done = page_num
+                    if on_page:
+                        on_page(page_num, doc.page_count)
+                    if page_text.strip():
+                        yield f"[Page {page_num}]\n{page_text}"
+            finally:
+                doc.close()
+            return
+        
         except Exception:
-            # Fallback to PyPDF2
+            # Fallback to pypdf, resuming after the last page read
             if file_content:
                 import io
                 pdf_file = io.BytesIO(file_content)
@@ -141,11 +396,23 @@ class DocumentProcessor:
                 reader = pypdf.PdfReader(file_path)
             
             for page_num, page in enumerate(reader.pages, 1):
+                if page_num <= pages_done:
+                    continue
                 page_text = page.extract_text()
+                if on_page:
+                    on_page(page_num, len(reader.pages))
                 if page_text and page_text.strip():
-                    text_parts.append(f"[Page {page_num}]\n{page_text}")
-        
-        return "\n\n".join(text_parts)
+                    yield f"[Page {page_num}]\n{page_text}"
+    
+    def _iter_pdf_text(
+        self,
+        file_path: str,
+        file_content: Optional[bytes] = None,
+        on_page: Optional[Callable[[int, int], Any]] = None,
+    ) -> Iterator[str]:
+        """Yield PDF text in page-sized pieces that concatenate to _extract_pdf_text"""
+        for i, page_text in enumerate(self._iter_pdf_pages(file_path, file_content, on_page)):
+            yield page_text if i == 0 else "\n\n" + page_text
     
     def _extract_text_file(
         self,
@@ -168,30 +435,74 @@ class DocumentProcessor:
         with open(file_path, "r", encoding="utf-8") as f:
             return f.read()
     
-    def save_uploaded_file(
+    def _iter_text_file(
         self,
-        filename: str,
-        content: bytes,
-    ) -> str:
+        file_path: str,
+        file_content: Optional[bytes] = None,
+        block_size: int = 64 * 1024,
+    ) -> Iterable[str]:
+        """
+        Yield a text file in blocks of up to block_size characters.
+        
+        Args:
+            file_path: Path to text file
+            file_content: Optional file bytes
+            block_size: Characters per block
+        
+        Yields:
+            Consecutive pieces of the file text
+        """
+        if file_content:
+            yield file_content.decode("utf-8")
+            return
+        
+        with open(file_path, "r", encoding="utf-8") as f:
+            while True:
+                block = f.read(block_size)
+                if not block:
+                    return
+                yield block
+    
+    def open_upload(self, filename: str, max_size: int) -> UploadSpool:
         """
-        Save an uploaded file to the documents directory.
+        Create a temporary file in the documents directory to write an upload to.
         
         Args:
             filename: Original filename
-            content: File content bytes
+            max_size: Maximum size in bytes
+        
+        Returns:
+            UploadSpool for the upload
+        """
+        return UploadSpool(self.documents_dir, filename, max_size)
+    
+    def keep_uploaded_file(self, filename: str, temp_path: str) -> str:
+        """
+        Move a spooled upload into the documents directory.
+        
+        Args:
+            filename: Original filename
+            temp_path: Temporary file path of a spooled upload
             
         Returns:
             Path to saved file
         """
+        file_path = self._upload_path(filename)
+        os.replace(temp_path, file_path)
+        return str(file_path)
+    
+    def discard_upload(self, temp_path: str):
+        """Remove a spooled upload's temporary directory, if still there"""
+        temp_dir = os.path.dirname(temp_path)
+        if os.path.basename(temp_dir).startswith(".upload-"):
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    
+    def _upload_path(self, filename: str) -> Path:
+        """Unique path in the documents directory for an uploaded file"""
         # Create unique filename to avoid collisions
-        name, ext = os.path.splitext(filename)
+        name, ext = os.path.splitext(os.path.basename(filename))
         unique_name = f"{name}_{uuid.uuid4().hex[:8]}{ext}"
-        file_path = self.documents_dir / unique_name
-        
-        with open(file_path, "wb") as f:
-            f.write(content)
-        
-        return str(file_path)
+        return self.documents_dir / unique_name
     
     def process_directory(
         self,
@@ -200,21 +511,17 @@ class DocumentProcessor:
         """
         Process all supported files in a directory.
         
+        Files are parsed and chunked in parallel worker processes
+        (see IngestionEngine and INGEST_WORKERS).
+        
         Args:
             directory: Path to directory
             
         Returns:
             List of (documents, metadata) tuples for each file
         """
-        results = []
-        dir_path = Path(directory)
-        
-        for file_path in dir_path.iterdir():
-            if file_path.suffix.lower() in [".pdf", ".txt", ".md"]:
-                try:
-                    docs, metadata = self.process_file(str(file_path))
-                    results.append((docs, metadata))
-                except Exception as e:
-                    logger.warning(f"Error processing {file_path}: {e}")
+        from app.services.ingestion import IngestionEngine, list_supported_files
         
+        engine = IngestionEngine(chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap)
+        results, _ = engine.parse_files(list_supported_files(directory))
         return results
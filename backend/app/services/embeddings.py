@@ -0,0 +1,82 @@
+"""
+Local Embeddings
+Offline embedding provider based on feature hashing
+"""
+import re
+import zlib
+from typing import List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic embeddings built from hashed word and character n-grams.
+    
+    Needs no model download or API key, so dense retrieval works offline and
+    in tests. Quality is closer to a lexical model than to a neural encoder,
+    but character n-grams give some robustness to inflections and typos.
+    """
+    
+    def __init__(self, dimensions: int = 384, char_ngram: int = 3):
+        """
+        Initialize the embedder.
+        
+        Args:
+            dimensions: Output vector size
+            char_ngram: Character n-gram length (0 disables n-gram features)
+        """
+        self.dimensions = dimensions
+        self.char_ngram = char_ngram
+    
+    def _features(self, text: str) -> List[str]:
+        """Extract word and character n-gram features from text"""
+        features = []
+        n = self.char_ngram
+        for word in _WORD_PATTERN.findall(text.lower()):
+            features.append(word)
+            if n and len(word) > n:
+                padded = f"<{word}>"
+                features.extend(
+                    "#" + padded[i:i + n] for i in range(len(padded) - n + 1)
+                )
+        return features
+    
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts into a float32 matrix with L2-normalized rows.
+        
+        Args:
+            texts: Texts to embed
+        
+        Returns:
+            Array of shape (len(texts), dimensions)
+        """
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = np.fromiter(
+                (zlib.crc32(feature.encode()) for feature in self._features(text)),
+                dtype=np.uint32,
+            )
+            if not len(hashes):
+                continue
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0)
+            matrix[row] = np.bincount(
+                hashes % self.dimensions,
+                weights=signs,
+                minlength=self.dimensions,
+            )
+        
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a list of documents"""
+        return self.embed_array(texts).tolist()
+    
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single query"""
+        return self.embed_array([text])[0].tolist()
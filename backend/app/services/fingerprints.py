@@ -0,0 +1,52 @@
+"""
+Fingerprints
+Content hashes used to detect unchanged files and chunks on re-ingestion
+"""
+import hashlib
+import unicodedata
+from typing import Optional
+
+# Bytes read per step when hashing a file
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_sha256(file_path: str, file_content: Optional[bytes] = None) -> str:
+    """
+    SHA-256 of a file's bytes, as a hex string.
+    
+    Args:
+        file_path: Path to the file (read in blocks if file_content is None)
+        file_content: Optional file bytes
+    
+    Returns:
+        Hex digest
+    """
+    if file_content is not None:
+        return hashlib.sha256(file_content).hexdigest()
+    
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def normalize_chunk(text: str) -> str:
+    """NFKC-normalize text and collapse whitespace runs to single spaces"""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def chunk_hash(text: str) -> str:
+    """
+    Fingerprint of a chunk's normalized text.
+    
+    Chunks that differ only in whitespace or Unicode compatibility forms
+    hash the same.
+    
+    Args:
+        text: Chunk text
+    
+    Returns:
+        First 128 bits of the SHA-256 digest, as hex
+    """
+    return hashlib.sha256(normalize_chunk(text).encode("utf-8")).hexdigest()[:32]
@@ -0,0 +1,78 @@
+"""
+Hybrid Ranking
+Reciprocal-rank fusion and maximal marginal relevance for hybrid retrieval
+"""
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[Tuple[str, float]]],
+    k: int = 60,
+) -> List[Tuple[str, float]]:
+    """
+    Fuse ranked lists with reciprocal-rank fusion.
+    
+    Each chunk scores ``sum(1 / (k + rank))`` over the lists it appears in,
+    with ranks starting at 1. Only ranks are used, so lists with scores on
+    different scales (BM25, cosine similarity) fuse without calibration.
+    
+    Args:
+        rankings: Ranked (chunk ID, score) lists, best first
+        k: Rank smoothing constant; larger values flatten the rank weights
+    
+    Returns:
+        Fused (chunk ID, score) list, best first
+    """
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, (chunk_id, _) in enumerate(ranking, start=1):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+def maximal_marginal_relevance(
+    relevance: np.ndarray,
+    vectors: np.ndarray,
+    k: int,
+    lambda_mult: float = 0.7,
+) -> List[int]:
+    """
+    Greedily pick a relevant but diverse subset of candidates.
+    
+    Each step picks the candidate maximizing
+    ``lambda * relevance - (1 - lambda) * max_similarity_to_picked``.
+    The candidate similarity matrix is computed once, and each step updates
+    the running max-similarity vector in a single vectorized operation.
+    
+    Args:
+        relevance: Relevance of each candidate, scaled to [0, 1]
+        vectors: L2-normalized candidate embeddings, one row per candidate
+        k: Number of candidates to pick
+        lambda_mult: Trade-off between relevance (1.0) and diversity (0.0)
+    
+    Returns:
+        Indices of the picked candidates, in pick order
+    """
+    n_candidates = len(relevance)
+    k = min(k, n_candidates)
+    if k <= 0:
+        return []
+    
+    similarity = vectors @ vectors.T
+    max_similarity = np.full(n_candidates, -np.inf, dtype=np.float64)
+    available = np.ones(n_candidates, dtype=bool)
+    picked: List[int] = []
+    
+    for _ in range(k):
+        if picked:
+            scores = lambda_mult * relevance - (1.0 - lambda_mult) * max_similarity
+        else:
+            scores = np.asarray(relevance, dtype=np.float64).copy()
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        picked.append(best)
+        available[best] = False
+        max_similarity = np.maximum(max_similarity, similarity[:, best])
+    
+    return picked
@@ -0,0 +1,547 @@
+"""
+Ingestion Engine
+Parallel parsing and chunking of document files with a process pool
+"""
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from langchain_core.documents import Document
+from app.config import settings
+from app.services.document_processor import DocumentProcessor
+from app.services.fingerprints import chunk_hash, file_sha256
+from app.services.near_duplicates import NearDuplicateIndex, get_near_duplicate_index
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = (".pdf", ".txt", ".md")
+
+# Batches smaller than this are parsed inline; starting a pool costs more
+PARALLEL_MIN_BYTES = 4 * 1024 * 1024
+
+# Per-process processor, created by the pool initializer
+_worker_processor: Optional[DocumentProcessor] = None
+
+
+def _init_worker(chunk_size: int, chunk_overlap: int):
+    """Create the document processor of a pool worker process"""
+    global _worker_processor
+    _worker_processor = DocumentProcessor(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+def _process_file(file_path: str) -> Tuple[Optional[List[Document]], Optional[Dict[str, Any]], Optional[str]]:
+    """Parse and chunk one file in a worker; returns (documents, metadata, error)"""
+    try:
+        documents, metadata = _worker_processor.process_file(file_path)
+        return documents, metadata, None
+    except Exception as e:
+        return None, None, str(e)
+
+
+def _pool_context():
+    """
+    Process start method for the worker pool.
+    
+    Forking is cheapest (workers inherit the imported modules) but is only
+    safe while this process runs a single thread; otherwise use forkserver,
+    or spawn where that is unavailable.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    if "fork" in methods and threading.active_count() == 1:
+        return multiprocessing.get_context("fork")
+    if "forkserver" in methods:
+        context = multiprocessing.get_context("forkserver")
+        # Import the parsers once in the server rather than in every worker
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def list_supported_files(directory: str) -> List[str]:
+    """Supported document files in a directory, sorted by name"""
+    return sorted(
+        str(path) for path in Path(directory).iterdir()
+        if path.is_file() and path.suffix.lower() in SUPPORTED_EXTENSIONS
+    )
+
+
+def _unchanged_result(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Result of re-ingesting a file identical to the stored document"""
+    return {
+        **document,
+        "chunks_added": 0,
+        "chunks_skipped": document["chunk_count"],
+        "chunks_removed": 0,
+        "chunks_near_duplicate": 0,
+    }
+
+
+class IngestionProgress:
+    """
+    Counters of a single-file ingestion, updated while it runs.
+    
+    Written from the ingesting thread and read from others; each update is
+    a single attribute assignment, so readers never see a torn value.
+    """
+    
+    def __init__(self):
+        self.pages_processed = 0
+        self.total_pages: Optional[int] = None
+        self.chunks_indexed = 0
+    
+    def page_read(self, pages_processed: int, total_pages: int):
+        """Record that pages_processed of total_pages pages have been read"""
+        self.total_pages = total_pages
+        self.pages_processed = pages_processed
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "pages_processed": self.pages_processed,
+            "total_pages": self.total_pages,
+            "chunks_indexed": self.chunks_indexed,
+        }
+
+
+class DocumentSync:
+    """
+    Re-indexes one document incrementally against its stored chunks.
+    
+    New chunks are matched to stored chunks of the same source by content
+    fingerprint (chunk_hash). Matches are skipped, unmatched new chunks are
+    added under the stored document's ID, and stored chunks left unmatched
+    are deleted by finish. A document not yet in the store is simply added.
+    Chunk IDs are derived from the fingerprints, so a kept chunk keeps its
+    ID (and its original chunk_index) across versions.
+    
+    With a near-duplicate index, each chunk to be added is also looked up
+    there; a near-duplicate of another document's chunk is dropped or
+    stored with a "duplicate_of" link to the canonical chunk, according to
+    NEAR_DUPLICATE_ACTION.
+    """
+    
+    def __init__(self, vector_store, source: str, near_duplicates: Optional[NearDuplicateIndex] = None):
+        """
+        Initialize the sync.
+        
+        Args:
+            vector_store: Store holding the document
+            source: Document source filename
+            near_duplicates: Optional index to detect near-duplicate chunks with
+        """
+        self.vector_store = vector_store
+        self.source = source
+        self.near_duplicates = near_duplicates
+        self.drop_near_duplicates = settings.NEAR_DUPLICATE_ACTION == "drop"
+        existing = vector_store.find_document(source)
+        self.doc_id: Optional[str] = existing["id"] if existing else None
+        stored = vector_store.get_chunk_hashes(source) if existing else {}
+        
+        # Stored chunk IDs by fingerprint, not yet matched by a new chunk
+        self._stored: Dict[str, List[str]] = {}
+        for chunk_id, fingerprint in stored.items():
+            self._stored.setdefault(fingerprint, []).append(chunk_id)
+        self._taken = set(stored)
+        self.added_ids: List[str] = []
+        self.skipped = 0
+        self.near_duplicate_count = 0
+    
+    def _chunk_id(self, fingerprint: str) -> str:
+        """Unused chunk ID derived from the document ID and chunk fingerprint"""
+        base = f"{self.doc_id}_{fingerprint[:16]}"
+        chunk_id, n = base, 1
+        while chunk_id in self._taken:
+            n += 1
+            chunk_id = f"{base}_{n}"
+        self._taken.add(chunk_id)
+        return chunk_id
+    
+    def prepare(self, documents: List[Document]) -> Tuple[List[Document], List[str]]:
+        """
+        Select the chunks that need to be written.
+        
+        Args:
+            documents: Next chunks of the new version, in order
+        
+        Returns:
+            Tuple of (chunks to add, their chunk IDs)
+        """
+        new_documents, new_ids = [], []
+        for document in documents:
+            if self.doc_id is None:
+                self.doc_id = document.metadata["id"]
+            document.metadata["id"] = self.doc_id
+            
+            fingerprint = document.metadata.get("chunk_hash") or chunk_hash(document.page_content)
+            matches = self._stored.get(fingerprint)
+            if matches:
+                matches.pop()
+                self.skipped += 1
+                continue
+            
+            if self.near_duplicates is not None:
+                signature = self.near_duplicates.hasher.signature(document.page_content)
+                canonical = self.near_duplicates.find(signature, self.source)
+                if canonical is not None:
+                    self.near_duplicate_count += 1
+                    if self.drop_near_duplicates:
+                        continue
+                    document.metadata["duplicate_of"] = canonical
+                chunk_id = self._chunk_id(fingerprint)
+                self.near_duplicates.add(chunk_id, self.source, signature, canonical, fingerprint)
+            else:
+                chunk_id = self._chunk_id(fingerprint)
+            new_documents.append(document)
+            new_ids.append(chunk_id)
+        self.added_ids.extend(new_ids)
+        return new_documents, new_ids
+    
+    def add(self, documents: List[Document]):
+        """Write the new chunks among documents to the store"""
+        new_documents, new_ids = self.prepare(documents)
+        if new_documents:
+            self.vector_store.add_documents(new_documents, ids=new_ids)
+    
+    def finish(self, file_metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Delete the stored chunks the new version no longer contains.
+        
+        The new version's document-level metadata (content hash, size,
+        upload date, chunk total) is then written to every chunk of the
+        document, including chunks kept from the stored version, so the
+        document describes the new file even if no chunk was added.
+        
+        Args:
+            file_metadata: File metadata dict of the new version
+        
+        Returns:
+            File metadata with the stored document ID and the chunks_added,
+            chunks_skipped, chunks_removed and chunks_near_duplicate counts
+        """
+        stale = [chunk_id for chunk_ids in self._stored.values() for chunk_id in chunk_ids]
+        removed = self.vector_store.delete_chunks(stale) if stale else 0
+        self.vector_store.update_document(self.source, {
+            "content_hash": file_metadata.get("content_hash"),
+            "size": file_metadata["size"],
+            "upload_date": file_metadata["upload_date"],
+            "total_chunks": file_metadata["chunk_count"],
+        })
+        return {
+            **file_metadata,
+            "id": self.doc_id or file_metadata["id"],
+            "chunks_added": len(self.added_ids),
+            "chunks_skipped": self.skipped,
+            "chunks_removed": removed,
+            "chunks_near_duplicate": self.near_duplicate_count,
+        }
+    
+    def rollback(self):
+        """Delete the chunks added so far, restoring the stored version"""
+        if self.added_ids:
+            self.vector_store.delete_chunks(self.added_ids)
+        if self.near_duplicates is not None:
+            self.near_duplicates.remove(self.added_ids)
+
+
+class IngestionEngine:
+    """
+    Parses and chunks files in parallel and writes them to the store at once.
+    
+    PDF extraction and text splitting are CPU-bound, so files are fanned
+    out to a ProcessPoolExecutor. Each worker process builds its own
+    DocumentProcessor once, and results come back in input order. The
+    chunks of every file are then added to the store in a single
+    add_documents call. Batches under PARALLEL_MIN_BYTES are processed
+    inline, since starting worker processes costs more than it saves.
+    
+    Files of at least STREAM_INGEST_MIN_BYTES are streamed instead: pages
+    are chunked one at a time in this process and written to the store in
+    batches of INGEST_BATCH_CHUNKS, so memory stays bounded.
+    
+    Re-ingesting a file is incremental: unchanged files (same SHA-256) are
+    skipped and changed ones only write their new chunks (see DocumentSync).
+    Chunks that near-duplicate another document's chunks are linked or
+    dropped on the way in (see NearDuplicateIndex).
+    """
+    
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+    ):
+        """
+        Initialize the engine.
+        
+        Args:
+            workers: Worker processes; defaults to INGEST_WORKERS (0 = CPU count)
+            chunk_size: Size of text chunks
+            chunk_overlap: Overlap between chunks
+        """
+        workers = settings.INGEST_WORKERS if workers is None else workers
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+    
+    def workers_for(self, file_paths: List[str]) -> int:
+        """Worker processes to use for a batch of files (1 = inline)"""
+        try:
+            total_bytes = sum(os.path.getsize(file_path) for file_path in file_paths)
+        except OSError:
+            total_bytes = 0
+        if total_bytes < PARALLEL_MIN_BYTES:
+            return 1
+        return max(1, min(self.workers, len(file_paths)))
+    
+    def parse_files(
+        self,
+        file_paths: Iterable[str],
+    ) -> Tuple[List[Tuple[List[Document], Dict[str, Any]]], List[Tuple[str, str]]]:
+        """
+        Parse and chunk files, in parallel when there are enough of them.
+        
+        Args:
+            file_paths: Paths of the files to process
+        
+        Returns:
+            Tuple of ((documents, file metadata) per parsed file, in input
+            order; (file path, error message) per failed file)
+        """
+        file_paths = list(file_paths)
+        workers = self.workers_for(file_paths)
+        
+        if workers <= 1:
+            _init_worker(self.chunk_size, self.chunk_overlap)
+            outcomes = [_process_file(file_path) for file_path in file_paths]
+        else:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=_pool_context(),
+                initializer=_init_worker,
+                initargs=(self.chunk_size, self.chunk_overlap),
+            ) as executor:
+                outcomes = list(executor.map(_process_file, file_paths))
+        
+        parsed = []
+        failed = []
+        for file_path, (documents, metadata, error) in zip(file_paths, outcomes):
+            if error is not None:
+                logger.warning(f"Error processing {file_path}: {error}")
+                failed.append((file_path, error))
+            else:
+                parsed.append((documents, metadata))
+        return parsed, failed
+    
+    def ingest_files(self, file_paths: Iterable[str], vector_store) -> Dict[str, Any]:
+        """
+        Parse files in parallel and add their new chunks in one batched write.
+        
+        Files whose bytes match the fingerprint of the stored document of
+        the same name are skipped without parsing. Changed files are
+        re-indexed incrementally (see DocumentSync).
+        
+        Args:
+            file_paths: Paths of the files to ingest
+            vector_store: Store to add the chunks to (see get_vector_store)
+        
+        Returns:
+            Report with the per-file results, failures, chunks added,
+            skipped, removed and near-duplicate, the dedup ratio, elapsed
+            seconds, files/sec and MB/sec
+        """
+        file_paths = list(file_paths)
+        sizes = {file_path: os.path.getsize(file_path) for file_path in file_paths}
+        total_bytes = sum(sizes.values())
+        
+        start = time.perf_counter()
+        results = []
+        pending = []
+        for file_path in file_paths:
+            existing = vector_store.find_document(os.path.basename(file_path))
+            if existing and existing.get("content_hash") == file_sha256(file_path):
+                results.append(_unchanged_result(existing))
+            else:
+                pending.append(file_path)
+        unchanged = len(results)
+        streamed = [path for path in pending if sizes[path] >= settings.STREAM_INGEST_MIN_BYTES]
+        pooled = [path for path in pending if sizes[path] < settings.STREAM_INGEST_MIN_BYTES]
+        
+        parsed, failed = self.parse_files(pooled)
+        near_duplicates = get_near_duplicate_index(vector_store) if pending else None
+        syncs = []
+        documents, ids = [], []
+        for file_documents, metadata in parsed:
+            sync = DocumentSync(vector_store, metadata["name"], near_duplicates)
+            new_documents, new_ids = sync.prepare(file_documents)
+            documents.extend(new_documents)
+            ids.extend(new_ids)
+            syncs.append((sync, metadata))
+        if documents:
+            try:
+                vector_store.add_documents(documents, ids=ids)
+            except Exception:
+                if near_duplicates is not None:
+                    near_duplicates.remove(ids)
+                raise
+        results.extend(sync.finish(metadata) for sync, metadata in syncs)
+        
+        for file_path in streamed:
+            try:
+                results.append(self.stream_file(file_path, vector_store, near_duplicates=near_duplicates))
+            except Exception as e:
+                logger.warning(f"Error processing {file_path}: {e}")
+                failed.append((file_path, str(e)))
+        elapsed = time.perf_counter() - start
+        
+        # Share of the chunks new to the store that near-duplicate stored chunks
+        near_duplicate_count = sum(result["chunks_near_duplicate"] for result in results)
+        examined = sum(result["chunks_added"] for result in results)
+        if settings.NEAR_DUPLICATE_ACTION == "drop":
+            examined += near_duplicate_count
+        report = {
+            "documents": results,
+            "failed": [{"file": os.path.basename(path), "error": error} for path, error in failed],
+            "files": len(file_paths),
+            "unchanged_files": unchanged,
+            "chunks_added": sum(result["chunks_added"] for result in results),
+            "chunks_skipped": sum(result["chunks_skipped"] for result in results),
+            "chunks_removed": sum(result["chunks_removed"] for result in results),
+            "chunks_near_duplicate": near_duplicate_count,
+            "dedup_ratio": near_duplicate_count / examined if examined else 0.0,
+            "bytes": total_bytes,
+            "seconds": elapsed,
+            "files_per_second": len(file_paths) / elapsed if elapsed > 0 else 0.0,
+            "mb_per_second": total_bytes / (1024 * 1024) / elapsed if elapsed > 0 else 0.0,
+            "workers": self.workers_for(pooled),
+        }
+        logger.info(
+            f"Ingested {len(results)}/{len(file_paths)} files ({unchanged} unchanged) in {elapsed:.2f}s: "
+            f"{report['chunks_added']} chunks added, {report['chunks_skipped']} skipped, "
+            f"{report['chunks_removed']} removed, {near_duplicate_count} near-duplicates "
+            f"({report['dedup_ratio']:.1%}); "
+            f"{report['files_per_second']:.1f} files/s, {report['mb_per_second']:.2f} MB/s"
+        )
+        return report
+    
+    def ingest_file(
+        self,
+        file_path: str,
+        vector_store,
+        file_content: Optional[bytes] = None,
+        progress: Optional[IngestionProgress] = None,
+        content_hash: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Ingest a single file, skipping it if the stored version is identical.
+        
+        Args:
+            file_path: Path to the file; its basename is the document's source name
+            vector_store: Store to add the chunks to
+            file_content: Optional file bytes (file_path is then only a name)
+            progress: Optional counters to update with pages read and chunks written
+            content_hash: SHA-256 of the file if already known
+        
+        Returns:
+            File metadata dict with chunks_added, chunks_skipped, chunks_removed
+            and chunks_near_duplicate
+        """
+        content_hash = content_hash or file_sha256(file_path, file_content)
+        existing = vector_store.find_document(os.path.basename(file_path))
+        if existing and existing.get("content_hash") == content_hash:
+            return _unchanged_result(existing)
+        
+        size = len(file_content) if file_content is not None else os.path.getsize(file_path)
+        if size >= settings.STREAM_INGEST_MIN_BYTES:
+            # Large files are chunked page by page and stored in batches
+            return self.stream_file(
+                file_path,
+                vector_store,
+                file_content=file_content,
+                progress=progress,
+                content_hash=content_hash,
+            )
+        
+        processor = DocumentProcessor(chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap)
+        documents, metadata = processor.process_file(
+            file_path,
+            file_content=file_content,
+            on_page=progress.page_read if progress else None,
+            content_hash=content_hash,
+        )
+        sync = DocumentSync(vector_store, metadata["name"], get_near_duplicate_index(vector_store))
+        try:
+            sync.add(documents)
+        except Exception:
+            # Also drops the near-duplicate signatures of the chunks not stored
+            sync.rollback()
+            raise
+        if progress:
+            progress.chunks_indexed = len(sync.added_ids)
+        return sync.finish(metadata)
+    
+    def stream_file(
+        self,
+        file_path: str,
+        vector_store,
+        file_content: Optional[bytes] = None,
+        near_duplicates: Optional[NearDuplicateIndex] = None,
+        progress: Optional[IngestionProgress] = None,
+        content_hash: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Chunk one file page by page and write the chunks to the store in batches.
+        
+        If processing fails part-way, the chunks written so far are deleted
+        again and the stored version of the document is left as it was.
+        
+        Args:
+            file_path: Path to the file or filename
+            vector_store: Store to add the chunks to
+            file_content: Optional file content bytes (for uploaded files)
+            near_duplicates: Near-duplicate index; defaults to the shared one
+            progress: Optional counters to update with pages read and chunks written
+            content_hash: SHA-256 of the file if already known
+        
+        Returns:
+            File metadata dict with chunks_added, chunks_skipped, chunks_removed
+            and chunks_near_duplicate
+        """
+        processor = DocumentProcessor(chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap)
+        if near_duplicates is None:
+            near_duplicates = get_near_duplicate_index(vector_store)
+        sync = DocumentSync(vector_store, os.path.basename(file_path), near_duplicates)
+        
+        def add_batch(documents: List[Document]):
+            sync.add(documents)
+            if progress:
+                progress.chunks_indexed = len(sync.added_ids)
+        
+        try:
+            metadata = processor.stream_file(
+                file_path,
+                add_batch,
+                file_content=file_content,
+                batch_size=settings.INGEST_BATCH_CHUNKS,
+                on_page=progress.page_read if progress else None,
+                content_hash=content_hash,
+            )
+        except Exception:
+            sync.rollback()
+            raise
+        return sync.finish(metadata)
+    
+    def ingest_directory(self, directory: str, vector_store) -> Dict[str, Any]:
+        """
+        Ingest every supported file in a directory.
+        
+        Args:
+            directory: Directory path
+            vector_store: Store to add the chunks to
+        
+        Returns:
+            Report as returned by ingest_files
+        """
+        return self.ingest_files(list_supported_files(directory), vector_store)
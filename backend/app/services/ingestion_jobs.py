@@ -0,0 +1,235 @@
+"""
+Ingestion Jobs
+Background queue that ingests uploaded documents outside the request
+"""
+import logging
+import threading
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Deque, Dict, Optional, Tuple
+from app.config import settings
+from app.services.document_processor import DocumentProcessor
+from app.services.ingestion import IngestionEngine, IngestionProgress
+from app.services.vector_store import get_vector_store
+
+logger = logging.getLogger(__name__)
+
+JOB_STATES = ("queued", "running", "completed", "failed")
+
+# Finished jobs kept for status lookups; the oldest are forgotten first
+MAX_FINISHED_JOBS = 200
+
+
+class QueueFullError(Exception):
+    """Raised when the ingestion queue already holds its maximum number of jobs"""
+
+
+class IngestionJob:
+    """An uploaded document waiting for or going through ingestion"""
+    
+    def __init__(self, filename: str, size: int):
+        self.id = str(uuid.uuid4())
+        self.filename = filename
+        self.size = size
+        self.state = "queued"
+        self.progress = IngestionProgress()
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.utcnow().isoformat()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+    
+    @property
+    def finished(self) -> bool:
+        return self.state in ("completed", "failed")
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "filename": self.filename,
+            "size": self.size,
+            "state": self.state,
+            **self.progress.to_dict(),
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class IngestionJobQueue:
+    """
+    Runs uploaded-document ingestion on a bounded pool of worker threads.
+    
+    Extraction, chunking and indexing are synchronous, so running them in
+    the upload request would block the event loop for the whole file.
+    submit() only records the job and hands it to the pool; the caller
+    gets the job back at once and polls get() for its progress. At most
+    INGEST_QUEUE_SIZE jobs may be queued or running at a time.
+    
+    Jobs for the same filename run one after another, in submission
+    order, since each re-indexes the stored version of that document:
+    only the first is handed to the pool, and each later one waits in a
+    per-filename queue until the job before it finishes, without holding
+    a worker thread.
+    """
+    
+    def __init__(self, workers: int, max_pending: int):
+        """
+        Initialize the queue.
+        
+        Args:
+            workers: Worker threads processing jobs
+            max_pending: Maximum jobs queued or running at once
+        """
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingest")
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._pending = 0
+        self._lock = threading.Lock()
+        # Jobs waiting behind a running job of the same filename; a filename
+        # has an entry only while one of its jobs is queued or running
+        self._waiting: Dict[str, Deque[Tuple[IngestionJob, str, str]]] = {}
+        self._idle = threading.Condition(self._lock)
+    
+    def submit(self, filename: str, file_path: str, size: int, content_hash: str) -> IngestionJob:
+        """
+        Queue a spooled upload for ingestion.
+        
+        The job owns the temporary file from here on: it is moved into the
+        documents directory if the document changed and removed otherwise.
+        
+        Args:
+            filename: Original filename (the document's source name)
+            file_path: Temporary file of the spooled upload (see UploadSpool)
+            size: File size in bytes
+            content_hash: SHA-256 of the file
+        
+        Returns:
+            The queued job
+        
+        Raises:
+            QueueFullError: If max_pending jobs are already queued or running
+        """
+        job = IngestionJob(filename, size)
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFullError(f"Ingestion queue is full ({self.max_pending} jobs pending)")
+            self._pending += 1
+            self._jobs[job.id] = job
+            self._prune()
+            waiting = self._waiting.get(filename)
+            if waiting is None:
+                try:
+                    self._executor.submit(self._run, job, file_path, content_hash)
+                except RuntimeError:
+                    self._pending -= 1
+                    del self._jobs[job.id]
+                    raise
+                self._waiting[filename] = deque()
+            else:
+                waiting.append((job, file_path, content_hash))
+        
+        logger.info(f"Queued ingestion job {job.id} for {filename} ({size} bytes)")
+        return job
+    
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        """Look up a job by ID; None if unknown or already forgotten"""
+        with self._lock:
+            return self._jobs.get(job_id)
+    
+    def _run(self, job: IngestionJob, file_path: str, content_hash: str):
+        """Ingest one job's file, record the outcome and start the next job of the same filename"""
+        processor = DocumentProcessor()
+        try:
+            job.state = "running"
+            job.started_at = datetime.utcnow().isoformat()
+            vector_store = get_vector_store()
+            stored = vector_store.find_document(job.filename)
+            metadata = IngestionEngine().ingest_file(
+                file_path,
+                vector_store,
+                progress=job.progress,
+                content_hash=content_hash,
+            )
+            
+            # Save to documents directory unless the stored document has the same bytes;
+            # a changed file is kept even if every chunk of it was already stored
+            if stored is None or stored.get("content_hash") != content_hash:
+                processor.keep_uploaded_file(job.filename, file_path)
+            
+            job.result = metadata
+            job.state = "completed"
+            logger.info(
+                f"Ingestion job {job.id} finished: {job.filename} ({metadata['chunk_count']} chunks: "
+                f"{metadata['chunks_added']} added, {metadata['chunks_skipped']} unchanged, "
+                f"{metadata['chunks_removed']} removed)"
+            )
+        except Exception as e:
+            logger.error(f"Ingestion job {job.id} failed for {job.filename}: {e}")
+            job.error = str(e)
+            job.state = "failed"
+        finally:
+            processor.discard_upload(file_path)
+            job.finished_at = datetime.utcnow().isoformat()
+            with self._lock:
+                self._pending -= 1
+                self._start_next(job.filename)
+    
+    def _start_next(self, filename: str):
+        """Hand the next waiting job of a filename to the pool, or forget the filename (lock held)"""
+        waiting = self._waiting[filename]
+        while waiting:
+            job, file_path, content_hash = waiting.popleft()
+            try:
+                self._executor.submit(self._run, job, file_path, content_hash)
+                return
+            except RuntimeError:
+                # The pool was shut down without waiting for queued jobs
+                DocumentProcessor().discard_upload(file_path)
+                job.error = "Ingestion queue was shut down"
+                job.state = "failed"
+                job.finished_at = datetime.utcnow().isoformat()
+                self._pending -= 1
+        del self._waiting[filename]
+        if not self._waiting:
+            self._idle.notify_all()
+    
+    def _prune(self):
+        """Forget the oldest finished jobs beyond MAX_FINISHED_JOBS (lock held)"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+    
+    def shutdown(self, wait: bool = True):
+        """Stop accepting jobs; with wait, finish the queued ones first"""
+        if wait:
+            with self._idle:
+                self._idle.wait_for(lambda: not self._waiting)
+        self._executor.shutdown(wait=wait)
+
+
+_queue: Optional[IngestionJobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_ingestion_queue() -> IngestionJobQueue:
+    """Get the shared ingestion job queue, creating it on first use"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = IngestionJobQueue(settings.INGEST_JOB_WORKERS, settings.INGEST_QUEUE_SIZE)
+        return _queue
+
+
+def shutdown_ingestion_queue():
+    """Wait for queued jobs to finish and release the shared queue, if it was started"""
+    global _queue
+    with _queue_lock:
+        queue, _queue = _queue, None
+    if queue is not None:
+        queue.shutdown(wait=True)
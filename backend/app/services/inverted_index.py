@@ -0,0 +1,740 @@
+"""
+Inverted Index
+Term -> posting list index used by the vector store for keyword retrieval
+"""
+import math
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+import numpy as np
+from app.services.text_analysis import Analyzer, StandardAnalyzer
+
+# Relative slack on MaxScore term bounds: term scores are computed in float32
+# and can round a few ulps above the exact bound, which must never prune them
+BOUND_SLACK = 1e-5
+
+
+class InvertedIndex:
+    """
+    In-memory inverted index over document chunks.
+    
+    Each term maps to a posting list of ``{slot: term_frequency}``. Chunks are
+    addressed internally by integer slots so posting lists stay compact;
+    slots freed by deletes are reused by later inserts.
+    
+    Document frequencies, chunk lengths and the total corpus length are
+    maintained incrementally so BM25 scoring needs no corpus pass.
+    
+    Text is split into terms by a pluggable Analyzer, once per chunk at
+    insert time. Every chunk keeps its token sequence as a compact array of
+    term IDs; those arrays hold term positions for phrase and proximity
+    scoring and let a chunk be unindexed without re-analyzing its text.
+    
+    An index can also be opened over posting arrays from a snapshot (see
+    ``load_arrays``). Those postings stay in the (possibly memory-mapped)
+    arrays and a term's posting dict is only built when a query or update
+    first touches it.
+    """
+    
+    def __init__(self, analyzer: Optional[Analyzer] = None):
+        """
+        Initialize an empty index.
+        
+        Args:
+            analyzer: Analyzer for chunk and query text; defaults to StandardAnalyzer
+        """
+        self.analyzer = analyzer if analyzer is not None else StandardAnalyzer()
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._slot_ids: List[Optional[str]] = []
+        self._slot_tokens: List[Optional[np.ndarray]] = []
+        self._slots: Dict[str, int] = {}
+        self._free_slots: List[int] = []
+        
+        # Vocabulary: term IDs are stable for the life of the index
+        self._term_ids: Dict[str, int] = {}
+        self._terms: List[str] = []
+        
+        # Term statistics for BM25
+        self._lengths = np.zeros(1024, dtype=np.float32)
+        self._total_length = 0
+        
+        # Posting lists as slot-sorted (slots, term frequencies) arrays, built
+        # lazily per term, and each term's (max tf, min chunk length) for
+        # BM25 upper bounds
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._bounds: Dict[str, Tuple[float, float]] = {}
+        
+        # Snapshot postings in CSR form for terms not yet materialized
+        self._base_terms: Dict[str, int] = {}
+        self._base_offsets: Optional[np.ndarray] = None
+        self._base_slots: Optional[np.ndarray] = None
+        self._base_tfs: Optional[np.ndarray] = None
+        self._base_tokens: Optional[np.ndarray] = None
+        self._base_token_offsets: Optional[np.ndarray] = None
+        self._base_size = 0
+        self._base_deleted: set = set()
+    
+    def tokenize(self, text: str) -> List[str]:
+        """Split text into index terms with the index's analyzer"""
+        return self.analyzer.analyze(text)
+    
+    def __len__(self) -> int:
+        return len(self._slots)
+    
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._slots
+    
+    def _get_postings(self, term: str) -> Optional[Dict[int, int]]:
+        """Get a term's posting dict, materializing it from the snapshot if needed"""
+        postings = self._postings.get(term)
+        if postings is not None:
+            return postings
+        
+        row = self._base_terms.pop(term, None)
+        if row is None:
+            return None
+        
+        start, end = int(self._base_offsets[row]), int(self._base_offsets[row + 1])
+        deleted = self._base_deleted
+        postings = {
+            slot: tf
+            for slot, tf in zip(
+                self._base_slots[start:end].tolist(),
+                self._base_tfs[start:end].tolist(),
+            )
+            if slot not in deleted
+        }
+        if not postings:
+            return None
+        self._postings[term] = postings
+        return postings
+    
+    def _term_id(self, term: str) -> int:
+        """Get a term's ID, adding it to the vocabulary if new"""
+        term_id = self._term_ids.get(term)
+        if term_id is None:
+            term_id = self._term_ids[term] = len(self._terms)
+            self._terms.append(term)
+        return term_id
+    
+    def _tokens(self, slot: int) -> np.ndarray:
+        """Term IDs of a chunk in text order"""
+        tokens = self._slot_tokens[slot]
+        if tokens is None:
+            start, end = int(self._base_token_offsets[slot]), int(self._base_token_offsets[slot + 1])
+            tokens = self._base_tokens[start:end]
+        return tokens
+    
+    def add(self, chunk_id: str, text: str):
+        """
+        Index a chunk, replacing any previous entry with the same ID.
+        
+        Args:
+            chunk_id: Chunk identifier
+            text: Chunk content
+        """
+        if chunk_id in self._slots:
+            self.remove(chunk_id)
+        
+        if self._free_slots:
+            slot = self._free_slots.pop()
+        else:
+            slot = len(self._slot_ids)
+            self._slot_ids.append(None)
+            self._slot_tokens.append(None)
+            if slot >= len(self._lengths):
+                self._lengths = np.concatenate(
+                    [self._lengths, np.zeros_like(self._lengths)]
+                )
+        
+        tokens = self.tokenize(text)
+        term_counts = Counter(tokens)
+        for term, tf in term_counts.items():
+            postings = self._get_postings(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+            postings[slot] = tf
+            self._arrays.pop(term, None)
+            self._bounds.pop(term, None)
+        
+        self._lengths[slot] = len(tokens)
+        self._total_length += len(tokens)
+        self._slot_ids[slot] = chunk_id
+        self._slot_tokens[slot] = np.array([self._term_id(term) for term in tokens], dtype=np.int32)
+        self._slots[chunk_id] = slot
+    
+    def remove(self, chunk_id: str) -> bool:
+        """
+        Remove a chunk from the index.
+        
+        Args:
+            chunk_id: Chunk identifier
+        
+        Returns:
+            True if the chunk was indexed
+        """
+        slot = self._slots.pop(chunk_id, None)
+        if slot is None:
+            return False
+        
+        terms = [self._terms[term_id] for term_id in np.unique(self._tokens(slot)).tolist()]
+        if slot < self._base_size:
+            # Unmaterialized snapshot terms skip the chunk via _base_deleted
+            self._base_deleted.add(slot)
+        
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None or slot not in postings:
+                continue
+            del postings[slot]
+            self._arrays.pop(term, None)
+            self._bounds.pop(term, None)
+            if not postings:
+                del self._postings[term]
+        
+        self._total_length -= int(self._lengths[slot])
+        self._lengths[slot] = 0
+        self._slot_ids[slot] = None
+        self._slot_tokens[slot] = None
+        # Snapshot slots stay tombstoned so their CSR postings remain valid
+        if slot >= self._base_size:
+            self._free_slots.append(slot)
+        return True
+    
+    def clear(self):
+        """Drop every indexed chunk"""
+        self.__init__(self.analyzer)
+    
+    def load_arrays(
+        self,
+        chunk_ids: List[str],
+        lengths: np.ndarray,
+        terms: List[str],
+        offsets: np.ndarray,
+        slots: np.ndarray,
+        tfs: np.ndarray,
+        tokens: np.ndarray,
+        token_offsets: np.ndarray,
+    ):
+        """
+        Replace the index contents with postings from a snapshot.
+        
+        Args:
+            chunk_ids: Chunk ID for each snapshot row
+            lengths: Chunk length in terms for each row
+            terms: Vocabulary, in CSR row order
+            offsets: CSR row offsets into slots/tfs (len(terms) + 1)
+            slots: Concatenated posting slots
+            tfs: Concatenated term frequencies
+            tokens: Concatenated term IDs (rows of terms) of every chunk
+            token_offsets: Offsets of each chunk's tokens (len(chunk_ids) + 1)
+        """
+        self.clear()
+        n_chunks = len(chunk_ids)
+        self._slot_ids = list(chunk_ids)
+        self._slot_tokens = [None] * n_chunks
+        self._slots = {chunk_id: slot for slot, chunk_id in enumerate(chunk_ids)}
+        self._terms = list(terms)
+        self._term_ids = {term: row for row, term in enumerate(terms)}
+        
+        self._lengths = np.zeros(max(1024, 2 * n_chunks), dtype=np.float32)
+        self._lengths[:n_chunks] = lengths
+        self._total_length = int(np.sum(lengths, dtype=np.int64))
+        
+        self._base_terms = {term: row for row, term in enumerate(terms)}
+        self._base_offsets = offsets
+        self._base_slots = slots
+        self._base_tfs = tfs
+        self._base_tokens = tokens
+        self._base_token_offsets = token_offsets
+        self._base_size = n_chunks
+    
+    def export_arrays(self) -> Dict[str, Any]:
+        """
+        Export the index as compact CSR arrays for a snapshot.
+        
+        Live chunks are renumbered into dense rows; tombstoned and free
+        slots are dropped.
+        
+        Returns:
+            Dict with chunk_ids, lengths, terms, offsets, slots, tfs,
+            tokens, token_offsets and the analyzer name
+        """
+        n_slots = len(self._slot_ids)
+        live = np.array([chunk_id is not None for chunk_id in self._slot_ids], dtype=bool)
+        remap = np.full(n_slots, -1, dtype=np.int64)
+        remap[live] = np.arange(int(live.sum()))
+        
+        terms: List[str] = []
+        slot_parts: List[np.ndarray] = []
+        tf_parts: List[np.ndarray] = []
+        
+        for term, postings in self._postings.items():
+            posting_slots = np.fromiter(postings.keys(), dtype=np.int64, count=len(postings))
+            order = np.argsort(remap[posting_slots])
+            terms.append(term)
+            slot_parts.append(remap[posting_slots][order])
+            tf_parts.append(np.fromiter(postings.values(), dtype=np.int32, count=len(postings))[order])
+        
+        for term, row in self._base_terms.items():
+            start, end = int(self._base_offsets[row]), int(self._base_offsets[row + 1])
+            posting_slots = remap[np.asarray(self._base_slots[start:end], dtype=np.int64)]
+            keep = posting_slots >= 0
+            if not keep.any():
+                continue
+            terms.append(term)
+            slot_parts.append(posting_slots[keep])
+            tf_parts.append(np.asarray(self._base_tfs[start:end], dtype=np.int32)[keep])
+        
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(part) for part in slot_parts], dtype=np.int64)
+        
+        # Token arrays are renumbered to rows of the exported vocabulary
+        term_remap = np.full(len(self._terms), -1, dtype=np.int32)
+        term_remap[[self._term_ids[term] for term in terms]] = np.arange(len(terms), dtype=np.int32)
+        live_slots = np.flatnonzero(live).tolist()
+        token_parts = [term_remap[self._tokens(slot)] for slot in live_slots]
+        token_offsets = np.zeros(len(live_slots) + 1, dtype=np.int64)
+        token_offsets[1:] = np.cumsum([len(part) for part in token_parts], dtype=np.int64)
+        
+        return {
+            "chunk_ids": [chunk_id for chunk_id in self._slot_ids if chunk_id is not None],
+            "lengths": self._lengths[:n_slots][live].astype(np.int32),
+            "terms": terms,
+            "offsets": offsets,
+            "slots": np.concatenate(slot_parts).astype(np.int32) if slot_parts else np.zeros(0, dtype=np.int32),
+            "tfs": np.concatenate(tf_parts) if tf_parts else np.zeros(0, dtype=np.int32),
+            "tokens": np.concatenate(token_parts) if token_parts else np.zeros(0, dtype=np.int32),
+            "token_offsets": token_offsets,
+            "analyzer": self.analyzer.name,
+        }
+    
+    def match_counts(self, terms: Iterable[str]) -> Dict[str, int]:
+        """
+        Count how many of the given terms occur in each chunk.
+        
+        Only chunks that share at least one term with the query are visited.
+        Results come back in slot order so score ties break deterministically.
+        
+        Args:
+            terms: Distinct query terms
+        
+        Returns:
+            Dict mapping chunk ID to number of matching terms
+        """
+        counts: Dict[int, int] = {}
+        for term in terms:
+            for slot in self._get_postings(term) or ():
+                counts[slot] = counts.get(slot, 0) + 1
+        
+        return {self._slot_ids[slot]: count for slot, count in sorted(counts.items())}
+    
+    def phrase_matches(self, terms: Sequence[str]) -> Set[str]:
+        """
+        Find chunks containing the terms as a contiguous phrase.
+        
+        Candidates are the intersection of the terms' posting lists,
+        smallest first; each candidate's term positions are then checked
+        with one vectorized comparison per phrase term.
+        
+        Args:
+            terms: Phrase terms in order
+        
+        Returns:
+            IDs of chunks containing the phrase
+        """
+        if not terms:
+            return set()
+        
+        term_ids = [self._term_ids.get(term) for term in terms]
+        postings = [self._get_postings(term) for term in set(terms)]
+        if any(term_id is None for term_id in term_ids) or any(p is None for p in postings):
+            return set()
+        
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting.keys())
+        
+        n_terms = len(term_ids)
+        matches = set()
+        for slot in candidates:
+            tokens = self._tokens(slot)
+            n_starts = len(tokens) - n_terms + 1
+            if n_starts <= 0:
+                continue
+            found = tokens[:n_starts] == term_ids[0]
+            for offset in range(1, n_terms):
+                found &= tokens[offset:offset + n_starts] == term_ids[offset]
+            if found.any():
+                matches.add(self._slot_ids[slot])
+        return matches
+    
+    def proximity_counts(
+        self,
+        terms: Iterable[str],
+        chunk_ids: Sequence[str],
+        window: int,
+    ) -> Dict[str, int]:
+        """
+        Count the most distinct query terms that fall within one window.
+        
+        The query-term positions of all chunks are laid out on one axis, with
+        chunks spaced far enough apart that no window spans two of them. For
+        every occurrence of a query term, each term's sorted positions are
+        searched for an occurrence in ``[position, position + window)``, and
+        the best window start per chunk gives the count.
+        
+        Args:
+            terms: Distinct query terms
+            chunk_ids: Chunks to score
+            window: Window size in tokens
+        
+        Returns:
+            Dict mapping chunk ID to the largest number of distinct query
+            terms found within a single window
+        """
+        term_ids = [self._term_ids[term] for term in set(terms) if term in self._term_ids]
+        if not term_ids or not chunk_ids:
+            return {}
+        
+        is_query_term = np.zeros(len(self._terms), dtype=bool)
+        is_query_term[term_ids] = True
+        
+        token_arrays = [self._tokens(self._slots[chunk_id]) for chunk_id in chunk_ids]
+        lengths = np.array([len(tokens) for tokens in token_arrays], dtype=np.int64)
+        tokens = np.concatenate(token_arrays)
+        chunk_of = np.repeat(np.arange(len(token_arrays)), lengths)
+        starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        
+        # Position on the shared axis: chunk number * spacing + position in chunk
+        spacing = int(lengths.max()) + window + 1
+        hits = np.flatnonzero(is_query_term[tokens])
+        if not len(hits):
+            return {}
+        hit_chunks = chunk_of[hits]
+        positions = hit_chunks * spacing + (hits - starts[hit_chunks])
+        hit_terms = tokens[hits]
+        
+        in_window = np.zeros(len(hits), dtype=np.int32)
+        for term_id in term_ids:
+            term_positions = positions[hit_terms == term_id]
+            nxt = np.searchsorted(term_positions, positions)
+            found = nxt < len(term_positions)
+            found[found] = term_positions[nxt[found]] < positions[found] + window
+            in_window += found
+        
+        # Hits are grouped by chunk, so reduce per contiguous run
+        run_starts = np.flatnonzero(np.r_[True, hit_chunks[1:] != hit_chunks[:-1]])
+        best = np.maximum.reduceat(in_window, run_starts)
+        return {
+            chunk_ids[chunk]: int(count)
+            for chunk, count in zip(hit_chunks[run_starts].tolist(), best.tolist())
+        }
+    
+    def document_frequency(self, term: str) -> int:
+        """Number of chunks containing the term"""
+        return len(self._get_postings(term) or ())
+    
+    @property
+    def average_length(self) -> float:
+        """Average chunk length in terms"""
+        return self._total_length / len(self._slots) if self._slots else 0.0
+    
+    def _posting_arrays(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Get a term's posting list as (slots, term frequencies) arrays, sorted by slot"""
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            postings = self._get_postings(term)
+            if not postings:
+                return None
+            slots = np.fromiter(postings.keys(), dtype=np.int64, count=len(postings))
+            tfs = np.fromiter(postings.values(), dtype=np.float32, count=len(postings))
+            order = np.argsort(slots, kind="stable")
+            arrays = (slots[order], tfs[order])
+            self._arrays[term] = arrays
+        return arrays
+    
+    def _term_bound(self, term: str, slots: np.ndarray, tfs: np.ndarray) -> Tuple[float, float]:
+        """Get a term's (max term frequency, min chunk length), cached until its postings change"""
+        bound = self._bounds.get(term)
+        if bound is None:
+            bound = (float(tfs.max()), float(self._lengths[slots].min()))
+            self._bounds[term] = bound
+        return bound
+    
+    def slot_mask(self, chunk_ids: Iterable[str]) -> np.ndarray:
+        """Boolean mask over slots marking the given chunks"""
+        mask = np.zeros(len(self._slot_ids), dtype=bool)
+        mask[[self._slots[i] for i in chunk_ids if i in self._slots]] = True
+        return mask
+    
+    def _term_scores(
+        self,
+        term: str,
+        n_docs: int,
+        avg_length: float,
+        k1: float,
+        b: float,
+    ) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """BM25 contribution of one term to every chunk containing it, as (slots, scores)"""
+        arrays = self._posting_arrays(term)
+        if arrays is None:
+            return None
+        slots, tfs = arrays
+        df = len(slots)
+        idf = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+        norm = k1 * (1.0 - b + b * self._lengths[slots] / avg_length)
+        return slots, idf * tfs * (k1 + 1.0) / (tfs + norm)
+    
+    def bm25_scores(
+        self,
+        terms: Iterable[str],
+        k1: float = 1.5,
+        b: float = 0.75,
+    ) -> Dict[str, float]:
+        """
+        Score chunks against the query terms with Okapi BM25.
+        
+        Each term's contribution is computed over its whole posting list in
+        one vectorized step; contributions are then summed per chunk.
+        
+        Args:
+            terms: Distinct query terms
+            k1: Term frequency saturation
+            b: Length normalization strength
+        
+        Returns:
+            Dict mapping chunk ID to BM25 score
+        """
+        n_docs = len(self._slots)
+        if not n_docs:
+            return {}
+        
+        avg_length = self.average_length or 1.0
+        slot_parts = []
+        score_parts = []
+        
+        for term in terms:
+            scored = self._term_scores(term, n_docs, avg_length, k1, b)
+            if scored is None:
+                continue
+            slot_parts.append(scored[0])
+            score_parts.append(scored[1])
+        
+        if not slot_parts:
+            return {}
+        
+        unique_slots, inverse = np.unique(np.concatenate(slot_parts), return_inverse=True)
+        totals = np.bincount(inverse, weights=np.concatenate(score_parts))
+        
+        slot_ids = self._slot_ids
+        return {
+            slot_ids[slot]: float(score)
+            for slot, score in zip(unique_slots.tolist(), totals.tolist())
+        }
+    
+    def bm25_top_k(
+        self,
+        terms: Iterable[str],
+        k: int,
+        k1: float = 1.5,
+        b: float = 0.75,
+        mask: Optional[np.ndarray] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        Find the k best chunks by BM25 with MaxScore dynamic pruning.
+        
+        Each term's contribution is bounded from above using its highest term
+        frequency and shortest chunk. Terms are processed from the highest
+        bound down while tracking the k-th best partial score (a lower bound
+        on the final top-k scores). Once the bounds of the remaining terms
+        sum to less than that threshold, no chunk outside the current
+        candidates can reach the top k, so the remaining (typically long,
+        low-IDF) posting lists are only probed for the candidates by binary
+        search, and candidates that can no longer reach the threshold are
+        dropped. Results match bm25_scores followed by a full sort.
+        
+        Args:
+            terms: Distinct query terms
+            k: Number of results
+            k1: Term frequency saturation
+            b: Length normalization strength
+            mask: Optional slot mask (see slot_mask) restricting results
+        
+        Returns:
+            List of (chunk ID, score), best first; ties keep slot order
+        """
+        n_docs = len(self._slots)
+        if not n_docs or k <= 0:
+            return []
+        
+        avg_length = self.average_length or 1.0
+        lists = []
+        for term in set(terms):
+            arrays = self._posting_arrays(term)
+            if arrays is None:
+                continue
+            slots, tfs = arrays
+            df = len(slots)
+            idf = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+            max_tf, min_length = self._term_bound(term, slots, tfs)
+            bound = idf * max_tf * (k1 + 1.0) / (max_tf + k1 * (1.0 - b + b * min_length / avg_length))
+            bound *= 1.0 + BOUND_SLACK
+            lists.append((bound, term, slots, tfs, idf))
+        if not lists:
+            return []
+        
+        lists.sort(key=lambda item: (-item[0], item[1]))
+        # remaining[i]: most any chunk can still gain from terms i onward
+        remaining = np.cumsum([item[0] for item in lists][::-1])[::-1].tolist()
+        
+        candidates = np.zeros(0, dtype=np.int64)
+        scores = np.zeros(0, dtype=np.float64)
+        threshold = 0.0
+        for i, (_, term, slots, tfs, idf) in enumerate(lists):
+            if len(candidates) < k or remaining[i] >= threshold:
+                # Essential term: any chunk in its list may still reach the top k
+                if mask is not None:
+                    keep = mask[slots]
+                    slots, tfs = slots[keep], tfs[keep]
+                norm = k1 * (1.0 - b + b * self._lengths[slots] / avg_length)
+                term_scores = idf * tfs * (k1 + 1.0) / (tfs + norm)
+                candidates, inverse = np.unique(np.concatenate([candidates, slots]), return_inverse=True)
+                scores = np.bincount(inverse, weights=np.concatenate([scores, term_scores]))
+            else:
+                # Non-essential term: only score existing candidates that can still make it
+                alive = scores + remaining[i] >= threshold
+                candidates, scores = candidates[alive], scores[alive]
+                positions = np.minimum(np.searchsorted(slots, candidates), len(slots) - 1)
+                hit = slots[positions] == candidates
+                hit_tfs = tfs[positions[hit]]
+                norm = k1 * (1.0 - b + b * self._lengths[candidates[hit]] / avg_length)
+                scores[hit] += idf * hit_tfs * (k1 + 1.0) / (hit_tfs + norm)
+            
+            if len(scores) >= k:
+                threshold = float(np.partition(scores, len(scores) - k)[len(scores) - k])
+        
+        keep = scores > 0
+        candidates, scores = candidates[keep], scores[keep]
+        order = np.lexsort((candidates, -scores))[:k]
+        slot_ids = self._slot_ids
+        return [(slot_ids[slot], score) for slot, score in zip(candidates[order].tolist(), scores[order].tolist())]
+    
+    def _accumulate_many(
+        self,
+        term_lists: Sequence[Iterable[str]],
+        term_scores,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Sum per-term chunk scores for a batch of queries in one pass.
+        
+        This is the product of the sparse query-term matrix with the sparse
+        term-chunk score matrix: every (query, posting) pair is keyed as
+        ``query * n_slots + slot`` and the keys are reduced with a single
+        unique + bincount. Each distinct term is scored once per batch.
+        
+        Args:
+            term_lists: Distinct terms of each query
+            term_scores: Function mapping a term to (slots, scores) or None
+        
+        Returns:
+            (query numbers, slots, totals), sorted by query then slot
+        """
+        cache: Dict[str, Optional[Tuple[np.ndarray, np.ndarray]]] = {}
+        query_parts, slot_parts, score_parts = [], [], []
+        for query, terms in enumerate(term_lists):
+            for term in terms:
+                if term not in cache:
+                    cache[term] = term_scores(term)
+                scored = cache[term]
+                if scored is None:
+                    continue
+                slots, scores = scored
+                query_parts.append(np.full(len(slots), query, dtype=np.int64))
+                slot_parts.append(slots)
+                score_parts.append(scores)
+        
+        if not slot_parts:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, np.zeros(0, dtype=np.float64)
+        
+        n_slots = max(len(self._slot_ids), 1)
+        keys = np.concatenate(query_parts) * n_slots + np.concatenate(slot_parts)
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        totals = np.bincount(inverse, weights=np.concatenate(score_parts))
+        queries, slots = np.divmod(unique_keys, n_slots)
+        return queries, slots, totals
+    
+    def match_counts_many(self, term_lists: Sequence[Iterable[str]]) -> List[Dict[str, int]]:
+        """
+        Batched match_counts for several queries.
+        
+        Args:
+            term_lists: Distinct terms of each query
+        
+        Returns:
+            One dict per query mapping chunk ID to number of matching terms,
+            in slot order
+        """
+        def term_counts(term):
+            arrays = self._posting_arrays(term)
+            if arrays is None:
+                return None
+            return arrays[0], np.ones(len(arrays[0]), dtype=np.float64)
+        
+        queries, slots, totals = self._accumulate_many(term_lists, term_counts)
+        results: List[Dict[str, int]] = [{} for _ in term_lists]
+        slot_ids = self._slot_ids
+        for query, slot, count in zip(queries.tolist(), slots.tolist(), totals.tolist()):
+            results[query][slot_ids[slot]] = int(count)
+        return results
+    
+    def bm25_top_k_many(
+        self,
+        term_lists: Sequence[Iterable[str]],
+        k: int,
+        k1: float = 1.5,
+        b: float = 0.75,
+        mask: Optional[np.ndarray] = None,
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        Score a batch of queries with BM25 and keep each query's top k.
+        
+        Args:
+            term_lists: Distinct terms of each query
+            k: Results per query
+            k1: Term frequency saturation
+            b: Length normalization strength
+            mask: Optional slot mask (see slot_mask) restricting results
+        
+        Returns:
+            One list of (chunk ID, score) per query, best first; ties keep
+            slot order as in bm25_scores
+        """
+        results: List[List[Tuple[str, float]]] = [[] for _ in term_lists]
+        n_docs = len(self._slots)
+        if not n_docs or k <= 0:
+            return results
+        
+        avg_length = self.average_length or 1.0
+        queries, slots, totals = self._accumulate_many(
+            term_lists,
+            lambda term: self._term_scores(term, n_docs, avg_length, k1, b),
+        )
+        
+        keep = totals > 0
+        if mask is not None:
+            keep &= mask[slots]
+        queries, slots, totals = queries[keep], slots[keep], totals[keep]
+        
+        order = np.lexsort((slots, -totals, queries))
+        queries, slots, totals = queries[order], slots[order], totals[order]
+        starts = np.searchsorted(queries, np.arange(len(term_lists)))
+        top = np.arange(len(queries)) - starts[queries] < k
+        
+        slot_ids = self._slot_ids
+        for query, slot, score in zip(
+            queries[top].tolist(), slots[top].tolist(), totals[top].tolist()
+        ):
+            results[query].append((slot_ids[slot], score))
+        return results
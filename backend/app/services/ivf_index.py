@@ -0,0 +1,310 @@
+"""
+IVF Index
+Approximate nearest-neighbour search with an inverted file over k-means clusters
+"""
+import logging
+import math
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+import numpy as np
+from app.services.dense_index import DenseIndex
+
+logger = logging.getLogger(__name__)
+
+# Rows scored per matrix product when assigning vectors to clusters
+ASSIGN_BLOCK_SIZE = 65536
+
+
+def spherical_kmeans(
+    vectors: np.ndarray,
+    n_clusters: int,
+    iterations: int = 10,
+    seed: int = 0,
+) -> np.ndarray:
+    """
+    Cluster L2-normalized vectors by cosine similarity (Lloyd's algorithm).
+    
+    Args:
+        vectors: Normalized vectors, one per row
+        n_clusters: Number of clusters
+        iterations: Assignment/update rounds
+        seed: Random seed for the initial centroids
+    
+    Returns:
+        Normalized centroids of shape (n_clusters, dimensions)
+    """
+    rng = np.random.default_rng(seed)
+    n_clusters = min(n_clusters, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    
+    for _ in range(iterations):
+        labels = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        counts = np.bincount(labels, minlength=n_clusters)
+        
+        # Re-seed empty clusters with random points
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            sums[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+        
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = np.divide(sums, norms, out=np.zeros_like(sums), where=norms > 0)
+    
+    return centroids
+
+
+class IVFDenseIndex(DenseIndex):
+    """
+    Dense index with an inverted-file (IVF) coarse quantizer.
+    
+    Embeddings are partitioned into ``nlist`` k-means clusters. A query is
+    compared with the centroids first and only the chunks in the ``nprobe``
+    closest clusters are scored exactly, so search cost scales with
+    ``nprobe / nlist`` of the corpus. Larger ``nprobe`` raises recall and
+    latency.
+    
+    The quantizer is trained on first search once the index holds
+    ``min_train`` chunks (smaller indexes are searched exactly), new chunks
+    are assigned to their nearest centroid on insert, and the quantizer is
+    retrained once the index has grown ``retrain_growth`` times past the
+    size it was trained on.
+    """
+    
+    def __init__(
+        self,
+        dimensions: int,
+        initial_capacity: int = 1024,
+        nlist: int = 0,
+        nprobe: int = 8,
+        min_train: int = 10000,
+        retrain_growth: float = 4.0,
+    ):
+        """
+        Initialize an empty index.
+        
+        Args:
+            dimensions: Embedding size
+            initial_capacity: Number of rows to preallocate
+            nlist: Number of clusters; 0 picks sqrt(n_chunks) at training time
+            nprobe: Clusters scanned per query
+            min_train: Minimum number of chunks before the quantizer is trained
+            retrain_growth: Growth factor that triggers retraining
+        """
+        super().__init__(dimensions, initial_capacity)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train = min_train
+        self.retrain_growth = retrain_growth
+        
+        self._centroids: Optional[np.ndarray] = None
+        self._trained_size = 0
+        self._clusters: Dict[int, int] = {}
+        self._lists: List[List[int]] = []
+        # Index of each assigned slot within its inverted list
+        self._positions: Dict[int, int] = {}
+        self._list_arrays: Dict[int, np.ndarray] = {}
+    
+    @property
+    def is_trained(self) -> bool:
+        """Whether the coarse quantizer has been trained"""
+        return self._centroids is not None
+    
+    def train(self):
+        """Train the coarse quantizer on the current embeddings and assign every chunk"""
+        n_chunks = len(self._slots)
+        nlist = self.nlist or max(1, int(round(math.sqrt(n_chunks))))
+        slots = np.fromiter(self._slots.values(), dtype=np.int64, count=n_chunks)
+        
+        # k-means on a sample keeps training time bounded on large corpora
+        sample_size = min(n_chunks, 64 * nlist)
+        sample = np.random.default_rng(0).choice(slots, sample_size, replace=False)
+        sample = np.sort(sample)
+        self._centroids = spherical_kmeans(
+            self._rows(sample), nlist
+        )
+        self._trained_size = n_chunks
+        
+        self._clusters = {}
+        self._positions = {}
+        self._lists = [[] for _ in range(len(self._centroids))]
+        self._list_arrays = {}
+        self._assign(np.sort(slots))
+        logger.info(f"Trained IVF quantizer: {len(self._centroids)} clusters over {n_chunks} chunks")
+    
+    def training_state(self) -> Optional[Dict[str, Any]]:
+        """Centroids of the trained quantizer and the size they were trained on"""
+        if not self.is_trained:
+            return None
+        return {"centroids": self._centroids, "trained_size": self._trained_size}
+    
+    def restore_training(self, state: Dict[str, Any]):
+        """Reuse trained centroids, assigning every chunk to its nearest one"""
+        centroids = state.get("centroids")
+        if centroids is None or centroids.shape[1] != self.dimensions:
+            return
+        self._centroids = centroids
+        self._trained_size = state["trained_size"]
+        self._clusters = {}
+        self._positions = {}
+        self._lists = [[] for _ in range(len(centroids))]
+        self._list_arrays = {}
+        self._assign(np.sort(np.fromiter(self._slots.values(), dtype=np.int64, count=len(self._slots))))
+    
+    def _assign(self, slots: np.ndarray):
+        """Add slots to the inverted list of their nearest centroid"""
+        for start in range(0, len(slots), ASSIGN_BLOCK_SIZE):
+            block = slots[start:start + ASSIGN_BLOCK_SIZE]
+            labels = np.argmax(self._rows(block) @ self._centroids.T, axis=1)
+            for slot, cluster in zip(block.tolist(), labels.tolist()):
+                self._clusters[slot] = cluster
+                self._positions[slot] = len(self._lists[cluster])
+                self._lists[cluster].append(slot)
+                self._list_arrays.pop(cluster, None)
+    
+    def _unassign(self, slot: int):
+        """Drop a slot from its inverted list, moving the list's last slot into its place"""
+        cluster = self._clusters.pop(slot, None)
+        if cluster is None:
+            return
+        members = self._lists[cluster]
+        position = self._positions.pop(slot)
+        last = members.pop()
+        if last != slot:
+            members[position] = last
+            self._positions[last] = position
+        self._list_arrays.pop(cluster, None)
+    
+    def _list_array(self, cluster: int) -> np.ndarray:
+        """Get an inverted list as an array, cached until the list changes"""
+        array = self._list_arrays.get(cluster)
+        if array is None:
+            array = np.array(self._lists[cluster], dtype=np.int64)
+            self._list_arrays[cluster] = array
+        return array
+    
+    def add(self, chunk_ids: Sequence[str], vectors: np.ndarray):
+        """
+        Insert or replace embeddings, assigning them to clusters if trained.
+        
+        Args:
+            chunk_ids: Chunk identifiers
+            vectors: Array of shape (len(chunk_ids), dimensions)
+        """
+        if self.is_trained:
+            for chunk_id in chunk_ids:
+                if chunk_id in self._slots:
+                    self._unassign(self._slots[chunk_id])
+        
+        super().add(chunk_ids, vectors)
+        
+        if self.is_trained:
+            # A chunk ID repeated in one batch has a single slot
+            slots = np.unique(np.array([self._slots[chunk_id] for chunk_id in chunk_ids], dtype=np.int64))
+            self._assign(slots)
+    
+    def remove(self, chunk_id: str) -> bool:
+        """
+        Remove a chunk's embedding.
+        
+        Returns:
+            True if the chunk was indexed
+        """
+        if self.is_trained and chunk_id in self._slots:
+            self._unassign(self._slots[chunk_id])
+        return super().remove(chunk_id)
+    
+    def _ready(self) -> bool:
+        """Train or retrain the quantizer if due; False if the index is too small for IVF"""
+        n_chunks = len(self._slots)
+        if n_chunks < self.min_train:
+            return False
+        if not self.is_trained or n_chunks > self.retrain_growth * self._trained_size:
+            self.train()
+        return True
+    
+    def _probe(self, queries: np.ndarray) -> np.ndarray:
+        """Indices of the nprobe closest clusters for each normalized query"""
+        nprobe = min(self.nprobe, len(self._centroids))
+        centroid_scores = queries @ self._centroids.T
+        if nprobe >= len(self._centroids):
+            return np.tile(np.arange(len(self._centroids)), (len(queries), 1))
+        return np.argpartition(-centroid_scores, nprobe - 1, axis=1)[:, :nprobe]
+    
+    def _search_candidates(
+        self,
+        query: np.ndarray,
+        candidates: np.ndarray,
+        k: int,
+    ) -> List[Tuple[str, float]]:
+        """Score candidate slots exactly and return the top k"""
+        if not len(candidates):
+            return []
+        scores = self._rows(candidates) @ query
+        k = min(k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self._slot_ids[candidates[i]], float(scores[i])) for i in top.tolist()]
+    
+    def _normalize_queries(self, query_vectors: np.ndarray) -> np.ndarray:
+        """L2-normalize query rows"""
+        queries = np.asarray(query_vectors, dtype=np.float32).reshape(-1, self.dimensions)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        return np.divide(queries, norms, out=np.zeros_like(queries), where=norms > 0)
+    
+    def search(
+        self,
+        query_vector: np.ndarray,
+        k: int,
+        allowed_ids: Optional[Set[str]] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        Find approximately the k most similar chunks by cosine similarity.
+        
+        Filtered searches score the allowed chunks exactly instead, since a
+        filter usually leaves far fewer chunks than the probed clusters hold.
+        
+        Args:
+            query_vector: Query embedding
+            k: Number of results
+            allowed_ids: Optional set restricting which chunks may be returned
+        
+        Returns:
+            List of (chunk ID, similarity) sorted by similarity
+        """
+        return self.search_many(np.asarray(query_vector)[None, :], k, allowed_ids)[0]
+    
+    def search_many(
+        self,
+        query_vectors: np.ndarray,
+        k: int,
+        allowed_ids: Optional[Set[str]] = None,
+        block_size: int = 256,
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        Approximate search for several queries.
+        
+        Args:
+            query_vectors: Array of shape (n_queries, dimensions)
+            k: Number of results per query
+            allowed_ids: Optional set restricting which chunks may be returned
+            block_size: Queries per matrix product when falling back to exact search
+        
+        Returns:
+            One list of (chunk ID, similarity) per query, sorted by similarity
+        """
+        if not self._slots or k <= 0 or not self._ready():
+            return super().search_many(query_vectors, k, allowed_ids, block_size)
+        
+        queries = self._normalize_queries(query_vectors)
+        if allowed_ids is not None:
+            candidates = np.array(
+                sorted(self._slots[i] for i in allowed_ids if i in self._slots),
+                dtype=np.int64,
+            )
+            return [self._search_candidates(query, candidates, k) for query in queries]
+        
+        results = []
+        for query, clusters in zip(queries, self._probe(queries)):
+            candidates = np.concatenate([self._list_array(c) for c in clusters.tolist()])
+            results.append(self._search_candidates(query, candidates, k))
+        return results
@@ -12,6 +12,12 @@ from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Embedding models of the remote providers and their vector sizes
+GEMINI_EMBEDDING_MODEL = "models/embedding-001"
+GEMINI_EMBEDDING_DIMENSIONS = 768
+OPENAI_EMBEDDING_MODEL = "text-embedding-ada-002"
+OPENAI_EMBEDDING_DIMENSIONS = 1536
+
 def retry_with_backoff(func):
     """
     Decorator to retry functions with exponential backoff on 429 errors.
@@ -91,25 +97,74 @@ def get_llm(temperature: float = 0.7) -> BaseLanguageModel:
 
 def get_embeddings() -> Embeddings:
     """
-    Get the configured embeddings model.
-    Uses Google's embedding API for lightweight deployment.
+    Get the configured embeddings model based on EMBEDDING_PROVIDER setting.
+    The default 'hashing' provider runs fully offline.
     
     Returns:
         Embeddings: Configured embeddings instance
+    
+    Raises:
+        ValueError: If the embedding provider is unknown
     """
-    provider = settings.LLM_PROVIDER.lower()
+    provider = settings.EMBEDDING_PROVIDER.lower()
     
-    if provider == "gemini":
+    if provider == "hashing":
+        from app.services.embeddings import HashingEmbeddings
+        return HashingEmbeddings(dimensions=settings.EMBEDDING_DIMENSIONS)
+    
+    elif provider == "gemini":
         from langchain_google_genai import GoogleGenerativeAIEmbeddings
         return GoogleGenerativeAIEmbeddings(
-            model="models/embedding-001",
+            model=GEMINI_EMBEDDING_MODEL,
             api_key=settings.GOOGLE_API_KEY,
         )
-    else:
+    
+    elif provider == "openai":
         from langchain_openai import OpenAIEmbeddings
         return OpenAIEmbeddings(
+            model=OPENAI_EMBEDDING_MODEL,
             api_key=settings.OPENAI_API_KEY,
         )
+    
+    else:
+        raise ValueError(
+            f"Unknown embedding provider: {provider}. "
+            "Supported providers: 'hashing', 'openai', 'gemini'"
+        )
+
+
+def get_embedding_info() -> dict:
+    """
+    Get the identity of the configured embeddings model without loading it.
+    
+    Stored embeddings are only valid for the model that produced them, so
+    the vector store records this with its snapshots.
+    
+    Returns:
+        dict: Embedding provider, model name and vector size
+    
+    Raises:
+        ValueError: If the embedding provider is unknown
+    """
+    provider = settings.EMBEDDING_PROVIDER.lower()
+    
+    if provider == "hashing":
+        model, dimensions = "hashing", settings.EMBEDDING_DIMENSIONS
+    elif provider == "gemini":
+        model, dimensions = GEMINI_EMBEDDING_MODEL, GEMINI_EMBEDDING_DIMENSIONS
+    elif provider == "openai":
+        model, dimensions = OPENAI_EMBEDDING_MODEL, OPENAI_EMBEDDING_DIMENSIONS
+    else:
+        raise ValueError(
+            f"Unknown embedding provider: {provider}. "
+            "Supported providers: 'hashing', 'openai', 'gemini'"
+        )
+    
+    return {
+        "provider": provider,
+        "model": model,
+        "dimensions": dimensions,
+    }
 
 
 def get_llm_info() -> dict:
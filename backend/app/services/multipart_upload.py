@@ -0,0 +1,148 @@
+"""
+Multipart Upload
+Streams the file part of a multipart/form-data request body to an upload spool
+"""
+import os
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
+from starlette.concurrency import run_in_threadpool
+from app.services.document_processor import DocumentProcessor, UploadSpool
+
+try:
+    from python_multipart import MultipartParser
+    from python_multipart.multipart import parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart import MultipartParser
+    from multipart.multipart import parse_options_header
+
+
+class UploadFormError(Exception):
+    """Raised when an upload form is malformed, has no file or has a file of an unsupported type"""
+
+
+class MultipartUploadReceiver:
+    """
+    Writes the file field of a multipart form straight to an UploadSpool.
+    
+    Starlette's form parsing spools every file part to its own temporary
+    file before the endpoint runs, so an upload would be stored twice and
+    an oversize file read in full before it could be rejected. This
+    receiver parses the body as it arrives instead: the file field's bytes
+    go to the spool (in the threadpool) as each network chunk is parsed,
+    other fields are ignored, and the upload is rejected as soon as its
+    file type or size is known to be unacceptable.
+    """
+    
+    def __init__(
+        self,
+        processor: DocumentProcessor,
+        max_size: int,
+        allowed_extensions: Sequence[str],
+        field_name: str = "file",
+    ):
+        """
+        Initialize the receiver.
+        
+        Args:
+            processor: Processor whose documents directory holds the spool
+            max_size: Maximum file size in bytes
+            allowed_extensions: Accepted file extensions, with the dot
+            field_name: Form field carrying the file
+        """
+        self.processor = processor
+        self.max_size = max_size
+        self.allowed_extensions = allowed_extensions
+        self.field_name = field_name
+        self.filename: Optional[str] = None
+        self._spool: Optional[UploadSpool] = None
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._in_file = False
+        self._pending: List[bytes] = []
+    
+    def on_part_begin(self):
+        self._disposition = b""
+        self._in_file = False
+    
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+    
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+    
+    def on_header_end(self):
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name = self._header_value = b""
+    
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        if options.get(b"name") != self.field_name.encode() or b"filename" not in options:
+            return
+        if self._spool is not None:
+            raise UploadFormError(f"Only one '{self.field_name}' may be uploaded at a time")
+        
+        filename = os.path.basename(options[b"filename"].decode("utf-8", errors="replace"))
+        file_ext = "." + filename.split(".")[-1].lower() if "." in filename else ""
+        if file_ext not in self.allowed_extensions:
+            raise UploadFormError(
+                f"Unsupported file type '{file_ext}'. Allowed formats: {', '.join(self.allowed_extensions)}"
+            )
+        self.filename = filename
+        self._spool = self.processor.open_upload(filename, self.max_size)
+        self._in_file = True
+    
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self._in_file:
+            self._pending.append(bytes(data[start:end]))
+    
+    def on_part_end(self):
+        self._in_file = False
+    
+    def _write_pending(self, blocks: List[bytes]):
+        for block in blocks:
+            self._spool.write(block)
+    
+    async def receive(self, content_type: str, stream: AsyncIterator[bytes]) -> Tuple[str, str, int, str]:
+        """
+        Parse a request body and spool its file field.
+        
+        Args:
+            content_type: Content-Type header of the request
+            stream: Request body chunks
+        
+        Returns:
+            Tuple of (original filename, temporary file path, size in bytes, SHA-256 hex digest)
+        
+        Raises:
+            UploadFormError: If the body is not a form with one file of an allowed type
+            UploadTooLargeError: If the file is larger than max_size
+        """
+        media_type, params = parse_options_header(content_type)
+        if media_type != b"multipart/form-data" or b"boundary" not in params:
+            raise UploadFormError("Expected a multipart/form-data upload")
+        
+        parser = MultipartParser(params[b"boundary"], {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+        })
+        try:
+            async for chunk in stream:
+                parser.write(chunk)
+                if self._pending:
+                    blocks, self._pending = self._pending, []
+                    await run_in_threadpool(self._write_pending, blocks)
+            parser.finalize()
+            if self._spool is None:
+                raise UploadFormError(f"No '{self.field_name}' in the upload form")
+            temp_path, size, content_hash = self._spool.close()
+        except BaseException:
+            if self._spool is not None:
+                self._spool.discard()
+            raise
+        return self.filename, temp_path, size, content_hash
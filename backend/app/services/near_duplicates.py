@@ -0,0 +1,406 @@
+"""
+Near-Duplicate Detection
+MinHash signatures and locality-sensitive hashing over chunk texts
+"""
+import logging
+import os
+import tempfile
+import threading
+import time
+import zlib
+from collections import deque
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.services.fingerprints import chunk_hash, normalize_chunk
+
+logger = logging.getLogger(__name__)
+
+NEAR_DUPLICATE_ACTIONS = ("off", "link", "drop")
+
+# MinHash permutations per signature and words per shingle
+NUM_PERM = 128
+SHINGLE_SIZE = 3
+
+# Saved signatures, in the store's persist directory
+SIGNATURES_FILE = "near_duplicates.npz"
+
+
+def lsh_params(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    Choose LSH (bands, rows) for a Jaccard threshold.
+    
+    Picks the banding whose S-curve midpoint (1/bands)^(1/rows) is the
+    highest one not above the threshold, so that pairs at the threshold
+    are very likely to collide; candidates are verified afterwards.
+    
+    Args:
+        threshold: Jaccard similarity threshold
+        num_perm: Signature length
+    
+    Returns:
+        Tuple of (bands, rows per band)
+    """
+    best = (num_perm, 1)
+    best_midpoint = 0.0
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        midpoint = (1.0 / bands) ** (1.0 / rows)
+        if best_midpoint < midpoint <= threshold:
+            best, best_midpoint = (bands, rows), midpoint
+    return best
+
+
+class MinHasher:
+    """
+    MinHash signatures of word shingles.
+    
+    Text is normalized as for chunk fingerprints and casefolded, and each
+    word hashed with CRC-32 (stable across processes). Every run of
+    SHINGLE_SIZE consecutive word hashes is combined into one shingle
+    value. Each of the num_perm hash functions is a multiply-shift hash of
+    that value; the signature keeps the minimum of each, and the fraction
+    of equal positions between two signatures estimates the Jaccard
+    similarity of their shingle sets.
+    """
+    
+    def __init__(self, num_perm: int = NUM_PERM, shingle_size: int = SHINGLE_SIZE, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.seed = seed
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self._a = rng.integers(1, 2 ** 63, size=(num_perm, 1), dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, size=(num_perm, 1), dtype=np.uint64)
+        # Odd multipliers that mix the word hashes of a shingle
+        self._mix = rng.integers(1, 2 ** 63, size=shingle_size, dtype=np.uint64) | np.uint64(1)
+    
+    def shingle_values(self, text: str) -> np.ndarray:
+        """64-bit values of the word shingles of a text (with repeats)"""
+        words = normalize_chunk(text).casefold().split() or [""]
+        hashes = np.fromiter(
+            (zlib.crc32(word.encode("utf-8")) for word in words),
+            dtype=np.uint64,
+            count=len(words),
+        )
+        k = min(self.shingle_size, len(words))
+        n = len(words) - k + 1
+        # uint64 arithmetic wraps modulo 2^64
+        values = hashes[:n] * self._mix[0]
+        for i in range(1, k):
+            values = values + hashes[i:i + n] * self._mix[i]
+        return values
+    
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of a text, as num_perm uint32 values"""
+        values = self.shingle_values(text)
+        hashed = (self._a * values + self._b) >> np.uint64(32)
+        return hashed.min(axis=1).astype(np.uint32)
+
+
+class NearDuplicateIndex:
+    """
+    LSH index of stored chunks for near-duplicate lookups.
+    
+    Signatures are split into bands; chunks sharing any band are
+    candidates, and a candidate is a near-duplicate if the signatures
+    estimate a Jaccard similarity of at least the threshold. Only chunks of
+    other documents are considered, so a document's own overlapping chunks
+    and its previous version never match.
+    
+    The index is built from the store once and then follows it: it
+    registers as a store listener and queues the store's adds and deletes,
+    applying them before the next lookup. Chunks added through DocumentSync
+    already have their signature indexed and are recognised by chunk hash,
+    so only chunks written some other way are hashed again. Signatures are
+    saved next to the store (see save) and reused on the next build for
+    chunks whose hash is unchanged, so a restart does not re-hash the corpus.
+    """
+    
+    def __init__(self, threshold: float, num_perm: int = NUM_PERM):
+        """
+        Initialize an empty index.
+        
+        Args:
+            threshold: Jaccard similarity at or above which chunks are near-duplicates
+            num_perm: MinHash signature length
+        """
+        self.hasher = MinHasher(num_perm)
+        self.lock = threading.RLock()
+        self._events: deque = deque()
+        self._store = None
+        self._dirty = False
+        self.threshold = threshold
+        self.bands, self.rows = lsh_params(threshold, num_perm)
+        self._clear()
+    
+    def set_threshold(self, threshold: float):
+        """Change the similarity threshold, re-banding the indexed signatures"""
+        with self.lock:
+            self.threshold = threshold
+            self.bands, self.rows = lsh_params(threshold, self.hasher.num_perm)
+            self._tables = [{} for _ in range(self.bands)]
+            for chunk_id, signature in self._signatures.items():
+                for table, key in zip(self._tables, self._band_keys(signature)):
+                    table.setdefault(key, set()).add(chunk_id)
+    
+    def _clear(self):
+        """Drop every indexed chunk"""
+        self._tables: List[Dict[bytes, Set[str]]] = [{} for _ in range(self.bands)]
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._hashes: Dict[str, str] = {}
+        self._sources: Dict[str, str] = {}
+        self._canonical: Dict[str, str] = {}
+    
+    def __len__(self) -> int:
+        return len(self._signatures)
+    
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        """One hashable key per band of a signature"""
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+    
+    def chunks_added(self, entries: List[Tuple[str, str, Dict[str, Any]]]):
+        """Store listener: queue (chunk ID, text, metadata) of written chunks"""
+        self._events.append(("add", entries))
+    
+    def chunks_deleted(self, chunk_ids: List[str]):
+        """Store listener: queue IDs of deleted chunks"""
+        self._events.append(("delete", chunk_ids))
+    
+    def _apply_events(self):
+        """Apply queued store adds and deletes in order (lock held)"""
+        while self._events:
+            op, items = self._events.popleft()
+            if op == "delete":
+                self.remove(items)
+                continue
+            for chunk_id, content, metadata in items:
+                fingerprint = metadata.get("chunk_hash") or chunk_hash(content)
+                if self._hashes.get(chunk_id) == fingerprint:
+                    continue
+                self.add(
+                    chunk_id,
+                    metadata.get("source"),
+                    self.hasher.signature(content),
+                    metadata.get("duplicate_of"),
+                    fingerprint,
+                )
+    
+    def ensure_current(self, vector_store):
+        """
+        Build the index from the store on first use and apply queued changes.
+        
+        Args:
+            vector_store: Store the chunks are ingested into
+        """
+        with self.lock:
+            if self._store is vector_store:
+                self._apply_events()
+                return
+            
+            if self._store is not None:
+                self._store.remove_listener(self)
+            start = time.perf_counter()
+            self._clear()
+            self._events.clear()
+            # Listen first, so changes made while building are applied afterwards
+            self._store = vector_store
+            vector_store.add_listener(self)
+            cached = self._load_signatures(self._signatures_path(vector_store))
+            hashed = 0
+            for chunk_id, source, content, duplicate_of, fingerprint in vector_store.iter_chunks():
+                signature = cached.get((chunk_id, fingerprint))
+                if signature is None:
+                    signature = self.hasher.signature(content)
+                    hashed += 1
+                self.add(chunk_id, source, signature, duplicate_of, fingerprint)
+            self._apply_events()
+            if hashed:
+                self.save()
+            logger.info(
+                f"Built near-duplicate index over {len(self)} chunks ({hashed} hashed) "
+                f"in {time.perf_counter() - start:.2f}s"
+            )
+    
+    def detach(self):
+        """Stop following the store and drop every indexed chunk"""
+        with self.lock:
+            if self._store is not None:
+                self._store.remove_listener(self)
+            self._store = None
+            self._events.clear()
+            self._clear()
+    
+    def find(self, signature: np.ndarray, source: str) -> Optional[str]:
+        """
+        Find the canonical chunk a signature is a near-duplicate of.
+        
+        Args:
+            signature: MinHash signature of the new chunk
+            source: Source name of the new chunk's document
+        
+        Returns:
+            Chunk ID of the canonical chunk, or None
+        """
+        with self.lock:
+            self._apply_events()
+            candidates = set()
+            for table, key in zip(self._tables, self._band_keys(signature)):
+                candidates.update(table.get(key, ()))
+            
+            best, best_similarity = None, self.threshold
+            for chunk_id in candidates:
+                if self._sources[chunk_id] == source:
+                    continue
+                similarity = float(np.mean(self._signatures[chunk_id] == signature))
+                if similarity >= best_similarity:
+                    best, best_similarity = chunk_id, similarity
+            return self._canonical.get(best, best) if best is not None else None
+    
+    def add(
+        self,
+        chunk_id: str,
+        source: str,
+        signature: np.ndarray,
+        duplicate_of: Optional[str] = None,
+        fingerprint: Optional[str] = None,
+    ):
+        """
+        Index a chunk.
+        
+        Args:
+            chunk_id: Chunk ID
+            source: Source name of the chunk's document
+            signature: MinHash signature
+            duplicate_of: Canonical chunk ID if the chunk is a linked near-duplicate
+            fingerprint: Chunk hash of the text the signature was computed from
+        """
+        with self.lock:
+            if chunk_id in self._signatures:
+                self.remove([chunk_id])
+            self._signatures[chunk_id] = signature
+            self._sources[chunk_id] = source or ""
+            if fingerprint:
+                self._hashes[chunk_id] = fingerprint
+            if duplicate_of:
+                self._canonical[chunk_id] = duplicate_of
+            for table, key in zip(self._tables, self._band_keys(signature)):
+                table.setdefault(key, set()).add(chunk_id)
+            self._dirty = True
+    
+    def remove(self, chunk_ids: List[str]):
+        """Remove chunks from the index; unknown IDs are ignored"""
+        with self.lock:
+            for chunk_id in chunk_ids:
+                signature = self._signatures.pop(chunk_id, None)
+                if signature is None:
+                    continue
+                self._hashes.pop(chunk_id, None)
+                self._sources.pop(chunk_id, None)
+                self._canonical.pop(chunk_id, None)
+                for table, key in zip(self._tables, self._band_keys(signature)):
+                    bucket = table.get(key)
+                    if bucket is not None:
+                        bucket.discard(chunk_id)
+                        if not bucket:
+                            del table[key]
+                self._dirty = True
+    
+    @staticmethod
+    def _signatures_path(vector_store) -> str:
+        return os.path.join(vector_store.persist_directory, SIGNATURES_FILE)
+    
+    def _load_signatures(self, path: str) -> Dict[Tuple[str, str], np.ndarray]:
+        """Saved signatures by (chunk ID, chunk hash); empty if missing or from another hasher"""
+        if not os.path.exists(path):
+            return {}
+        try:
+            with np.load(path) as saved:
+                if int(saved["num_perm"]) != self.hasher.num_perm or int(saved["seed"]) != self.hasher.seed:
+                    return {}
+                return {
+                    (chunk_id, fingerprint): signature
+                    for chunk_id, fingerprint, signature in zip(
+                        saved["chunk_ids"].tolist(), saved["hashes"].tolist(), saved["signatures"]
+                    )
+                }
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable near-duplicate signatures {path}: {e}")
+            return {}
+    
+    def save(self):
+        """Write the signatures of hashed chunks next to the store, atomically"""
+        with self.lock:
+            if self._store is None or not self._dirty:
+                return
+            self._apply_events()
+            chunk_ids = [chunk_id for chunk_id in self._signatures if chunk_id in self._hashes]
+            path = self._signatures_path(self._store)
+            arrays = {
+                "num_perm": np.array(self.hasher.num_perm),
+                "seed": np.array(self.hasher.seed),
+                "chunk_ids": np.array(chunk_ids, dtype=str),
+                "hashes": np.array([self._hashes[chunk_id] for chunk_id in chunk_ids], dtype=str),
+                "signatures": (
+                    np.stack([self._signatures[chunk_id] for chunk_id in chunk_ids])
+                    if chunk_ids else np.zeros((0, self.hasher.num_perm), dtype=np.uint32)
+                ),
+            }
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    np.savez(f, **arrays)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+            self._dirty = False
+
+
+_index: Optional[NearDuplicateIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_near_duplicate_index(vector_store) -> Optional[NearDuplicateIndex]:
+    """
+    Get the near-duplicate index for a store, brought up to date.
+    
+    Args:
+        vector_store: Store the chunks are ingested into
+    
+    Returns:
+        The shared index, or None if NEAR_DUPLICATE_ACTION is "off"
+    """
+    global _index
+    action = settings.NEAR_DUPLICATE_ACTION
+    if action not in NEAR_DUPLICATE_ACTIONS:
+        raise ValueError(
+            f"Unknown near-duplicate action '{action}'. Expected one of: {', '.join(NEAR_DUPLICATE_ACTIONS)}"
+        )
+    with _index_lock:
+        if action == "off":
+            if _index is not None:
+                _index.detach()
+                _index = None
+            return None
+        if _index is None:
+            _index = NearDuplicateIndex(settings.NEAR_DUPLICATE_THRESHOLD)
+        elif _index.threshold != settings.NEAR_DUPLICATE_THRESHOLD:
+            _index.set_threshold(settings.NEAR_DUPLICATE_THRESHOLD)
+        index = _index
+    index.ensure_current(vector_store)
+    return index
+
+
+def save_near_duplicate_index():
+    """Save the shared index's signatures, if it was built"""
+    with _index_lock:
+        index = _index
+    if index is not None:
+        index.save()
@@ -0,0 +1,163 @@
+"""
+Persistence Worker
+Background thread that coalesces store mutations into debounced flushes
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PersistenceWorker:
+    """
+    Runs a flush callback in a background thread, off the request path.
+    
+    Writers call ``notify`` after each mutation; notifications are coalesced
+    and the callback runs once ``interval`` seconds have passed since the
+    first unflushed mutation, or as soon as ``max_pending`` mutations are
+    waiting, whichever comes first. ``flush`` runs the callback in the
+    calling thread instead (for shutdown and explicit checkpoints); flushes
+    never overlap.
+    
+    The thread is started on the first notification, so a store that is
+    only read never starts it.
+    """
+    
+    def __init__(
+        self,
+        flush: Callable[[], None],
+        interval: float = 30.0,
+        max_pending: int = 1000,
+        name: str = "persistence",
+    ):
+        """
+        Initialize the worker.
+        
+        Args:
+            flush: Callback that persists the current state; raises on failure
+            interval: Seconds from the first unflushed mutation to a flush
+            max_pending: Pending mutation count that triggers an immediate flush
+            name: Thread name
+        """
+        self._flush = flush
+        self.interval = interval
+        self.max_pending = max_pending
+        self.name = name
+        
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        
+        self._pending = 0
+        self._dirty_since: Optional[float] = None
+        self.flushes = 0
+        self.failures = 0
+        self.last_flush_at: Optional[float] = None
+        self.last_flush_ms = 0.0
+    
+    def notify(self, operations: int = 1):
+        """
+        Record unflushed mutations.
+        
+        Args:
+            operations: Number of mutations
+        """
+        if operations <= 0:
+            return
+        with self._condition:
+            self._pending += operations
+            if self._dirty_since is None:
+                self._dirty_since = time.monotonic()
+            if self._thread is None and not self._stopped:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+    
+    def _due_in(self) -> Optional[float]:
+        """Seconds until the next flush is due; None if clean. Caller holds the condition"""
+        if self._dirty_since is None:
+            return None
+        if self._pending >= self.max_pending:
+            return 0.0
+        return max(0.0, self._dirty_since + self.interval - time.monotonic())
+    
+    def _run(self):
+        """Thread body: wait for due flushes until stopped"""
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    due_in = self._due_in()
+                    if due_in == 0.0:
+                        break
+                    self._condition.wait(due_in)
+                if self._stopped:
+                    return
+            if not self.flush():
+                # Back off before retrying a failed flush
+                with self._condition:
+                    self._condition.wait(max(self.interval, 1.0))
+    
+    def flush(self) -> bool:
+        """
+        Run the flush callback now, in the calling thread.
+        
+        Returns:
+            True if the callback succeeded
+        """
+        with self._flush_lock:
+            with self._condition:
+                pending, dirty_since = self._pending, self._dirty_since
+                self._pending, self._dirty_since = 0, None
+            
+            start = time.monotonic()
+            try:
+                self._flush()
+            except Exception as e:
+                logger.error(f"Background flush failed: {e}")
+                with self._condition:
+                    # Keep the mutations pending
+                    self._pending += pending
+                    if dirty_since is not None:
+                        self._dirty_since = min(dirty_since, self._dirty_since or dirty_since)
+                    self.failures += 1
+                return False
+            
+            self.flushes += 1
+            self.last_flush_at = time.time()
+            self.last_flush_ms = (time.monotonic() - start) * 1000
+            return True
+    
+    def stop(self, flush: bool = True):
+        """
+        Stop the thread, flushing pending mutations first.
+        
+        Args:
+            flush: Whether to flush pending mutations before returning
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        with self._condition:
+            pending = self._pending
+        if flush and pending:
+            self.flush()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Pending mutations, flush lag and flush counters"""
+        with self._condition:
+            lag = time.monotonic() - self._dirty_since if self._dirty_since is not None else 0.0
+            return {
+                "pending_operations": self._pending,
+                "flush_lag_seconds": lag,
+                "flush_interval_seconds": self.interval,
+                "flushes": self.flushes,
+                "failures": self.failures,
+                "last_flush_ms": self.last_flush_ms,
+                "last_flush_at": self.last_flush_at,
+            }
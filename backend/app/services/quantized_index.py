@@ -0,0 +1,233 @@
+"""
+Quantized Dense Index
+Dense search over int8 scalar-quantized embeddings with exact re-scoring
+"""
+import logging
+import tempfile
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+import numpy as np
+from app.services.dense_index import DenseIndex
+
+logger = logging.getLogger(__name__)
+
+# Rows decoded per matrix product when scoring codes
+SCORE_BLOCK_SIZE = 1024
+
+# Queries scored together against the codes
+QUERY_BLOCK_SIZE = 32
+
+
+class QuantizedDenseIndex(DenseIndex):
+    """
+    Dense index that searches int8 codes and re-scores a shortlist exactly.
+    
+    Each dimension is quantized to 256 levels between its minimum and
+    maximum, so the codes held in RAM take a quarter of the float32 size.
+    A query is scored against the codes, and the best ``rescore_factor * k``
+    candidates are re-scored with their float vectors.
+    
+    Float vectors of chunks loaded from a snapshot stay in the (memory-mapped)
+    snapshot array and are never copied; only the pages of shortlisted rows
+    are read. Vectors added since then, including every vector of an index
+    built from scratch, go to an overlay in an unlinked temporary file that
+    is memory-mapped the same way, so RAM holds only the codes.
+    """
+    
+    def __init__(
+        self,
+        dimensions: int,
+        initial_capacity: int = 1024,
+        rescore_factor: int = 4,
+        spill_dir: Optional[str] = None,
+    ):
+        """
+        Initialize an empty index.
+        
+        Args:
+            dimensions: Embedding size
+            initial_capacity: Number of rows to preallocate
+            rescore_factor: Shortlist size as a multiple of k
+            spill_dir: Directory of the overlay file; the system temporary directory if None
+        """
+        super().__init__(dimensions, initial_capacity=0)
+        self.rescore_factor = rescore_factor
+        self.spill_dir = spill_dir
+        self._spill_file = None
+        if initial_capacity:
+            self._overlay = self._grow_overlay(initial_capacity)
+            self._valid = np.zeros(initial_capacity, dtype=bool)
+        self._codes = np.zeros((initial_capacity, dimensions), dtype=np.int8)
+        
+        # Per-dimension quantizer, fitted on first search
+        self._offset: Optional[np.ndarray] = None
+        self._scale: Optional[np.ndarray] = None
+    
+    @classmethod
+    def from_matrix(cls, chunk_ids: Sequence[str], matrix: np.ndarray, **kwargs) -> "QuantizedDenseIndex":
+        """
+        Open an index over existing normalized embedding rows.
+        
+        Args:
+            chunk_ids: Chunk ID for each row
+            matrix: Array of shape (len(chunk_ids), dimensions); never copied
+            **kwargs: Constructor arguments
+        
+        Returns:
+            QuantizedDenseIndex reading float rows from the matrix
+        """
+        index = super().from_matrix(chunk_ids, matrix, **kwargs)
+        index._codes = np.zeros((len(chunk_ids), index.dimensions), dtype=np.int8)
+        return index
+    
+    @property
+    def code_bytes(self) -> int:
+        """Bytes held in RAM by the codes"""
+        return len(self._slot_ids) * self.dimensions
+    
+    def _grow_overlay(self, capacity: int) -> np.ndarray:
+        """Extend the overlay file to the given capacity and map it"""
+        if self._spill_file is None:
+            self._spill_file = tempfile.TemporaryFile(prefix=".dense-overlay-", dir=self.spill_dir)
+        # Extending the file keeps the rows written so far and zero-fills the rest
+        self._spill_file.truncate(capacity * self.dimensions * 4)
+        return np.memmap(self._spill_file, dtype=np.float32, mode="r+", shape=(capacity, self.dimensions))
+    
+    def _encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Quantize float rows to int8 codes"""
+        levels = np.rint((vectors - self._offset) / self._scale) - 128.0
+        return np.clip(levels, -128, 127).astype(np.int8)
+    
+    def _fit_quantizer(self):
+        """Fit per-dimension ranges on the stored vectors and encode every slot"""
+        n_slots = len(self._slot_ids)
+        low = np.full(self.dimensions, np.inf, dtype=np.float32)
+        high = np.full(self.dimensions, -np.inf, dtype=np.float32)
+        for start in range(0, n_slots, SCORE_BLOCK_SIZE):
+            rows = self._rows(np.arange(start, min(n_slots, start + SCORE_BLOCK_SIZE)))
+            low = np.minimum(low, rows.min(axis=0))
+            high = np.maximum(high, rows.max(axis=0))
+        
+        self._offset = low
+        self._scale = np.maximum(high - low, 1e-6) / 255.0
+        self._encode_slots()
+        logger.info(f"Quantized {n_slots} embeddings to int8")
+    
+    def training_state(self) -> Optional[Dict[str, Any]]:
+        """Per-dimension offset and scale of the fitted quantizer"""
+        if self._offset is None:
+            return None
+        return {"offset": self._offset, "scale": self._scale}
+    
+    def restore_training(self, state: Dict[str, Any]):
+        """Reuse a fitted quantizer, encoding every slot with it"""
+        offset = state.get("offset")
+        if offset is None or len(offset) != self.dimensions:
+            return
+        self._offset, self._scale = offset, state["scale"]
+        self._encode_slots()
+    
+    def _encode_slots(self):
+        """Encode every slot with the current quantizer"""
+        n_slots = len(self._slot_ids)
+        for start in range(0, n_slots, SCORE_BLOCK_SIZE):
+            block = np.arange(start, min(n_slots, start + SCORE_BLOCK_SIZE))
+            self._codes[block] = self._encode(self._rows(block))
+    
+    def _allocate(self) -> int:
+        """Get a free overlay row, growing the codes with the other buffers"""
+        slot = super()._allocate()
+        if slot >= len(self._codes):
+            codes = np.zeros((len(self._valid), self.dimensions), dtype=np.int8)
+            codes[:len(self._codes)] = self._codes
+            self._codes = codes
+        return slot
+    
+    def add(self, chunk_ids: Sequence[str], vectors: np.ndarray):
+        """
+        Insert or replace embeddings, encoding them if the quantizer is fitted.
+        
+        Args:
+            chunk_ids: Chunk identifiers
+            vectors: Array of shape (len(chunk_ids), dimensions)
+        """
+        super().add(chunk_ids, vectors)
+        if self._offset is not None:
+            slots = np.array([self._slots[chunk_id] for chunk_id in chunk_ids], dtype=np.int64)
+            self._codes[slots] = self._encode(self._rows(slots))
+    
+    def search(
+        self,
+        query_vector: np.ndarray,
+        k: int,
+        allowed_ids: Optional[Set[str]] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        Find the k most similar chunks by cosine similarity.
+        
+        Args:
+            query_vector: Query embedding
+            k: Number of results
+            allowed_ids: Optional set restricting which chunks may be returned
+        
+        Returns:
+            List of (chunk ID, similarity) sorted by similarity
+        """
+        return self.search_many(np.asarray(query_vector)[None, :], k, allowed_ids)[0]
+    
+    def search_many(
+        self,
+        query_vectors: np.ndarray,
+        k: int,
+        allowed_ids: Optional[Set[str]] = None,
+        block_size: int = QUERY_BLOCK_SIZE,
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        Find the k most similar chunks for each of several queries.
+        
+        Args:
+            query_vectors: Array of shape (n_queries, dimensions)
+            k: Number of results per query
+            allowed_ids: Optional set restricting which chunks may be returned
+            block_size: Queries scored together against the codes
+        
+        Returns:
+            One list of (chunk ID, similarity) per query, sorted by similarity
+        """
+        queries = np.asarray(query_vectors, dtype=np.float32).reshape(-1, self.dimensions)
+        n_slots = len(self._slot_ids)
+        if not self._slots or k <= 0:
+            return [[] for _ in range(len(queries))]
+        
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = np.divide(queries, norms, out=np.zeros_like(queries), where=norms > 0)
+        
+        mask = self._mask(allowed_ids)
+        n_allowed = int(mask.sum())
+        k = min(k, n_allowed)
+        if k == 0:
+            return [[] for _ in range(len(queries))]
+        shortlist_size = min(n_allowed, max(k, self.rescore_factor * k))
+        
+        if self._offset is None:
+            self._fit_quantizer()
+        
+        results = []
+        for start in range(0, len(queries), block_size):
+            block = queries[start:start + block_size]
+            # Dot products with the dequantized rows, up to a per-query constant
+            weights = (block * self._scale).T
+            approx = np.empty((n_slots, len(block)), dtype=np.float32)
+            for row in range(0, n_slots, SCORE_BLOCK_SIZE):
+                end = min(n_slots, row + SCORE_BLOCK_SIZE)
+                approx[row:end] = self._codes[row:end].astype(np.float32) @ weights
+            approx[~mask] = -np.inf
+            
+            shortlists = np.argpartition(-approx, shortlist_size - 1, axis=0)[:shortlist_size].T
+            for query, shortlist in zip(block, shortlists):
+                scores = self._rows(shortlist) @ query
+                top = np.argpartition(-scores, k - 1)[:k]
+                top = top[np.argsort(-scores[top])]
+                results.append([
+                    (self._slot_ids[shortlist[i]], float(scores[i])) for i in top.tolist()
+                ])
+        return results
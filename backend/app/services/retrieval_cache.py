@@ -0,0 +1,120 @@
+"""
+Retrieval Cache
+LRU + TTL cache of vector store query results, invalidated by store version
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+
+def normalize_query(query_text: str) -> str:
+    """Normalize a query for cache lookup (case and whitespace)"""
+    return " ".join(query_text.lower().split())
+
+
+def cache_key(
+    query_text: str,
+    n_results: int,
+    filter_dict: Optional[Dict[str, Any]],
+    mode: str,
+) -> Hashable:
+    """Build the cache key of a query"""
+    filter_key = json.dumps(filter_dict, sort_keys=True, default=str) if filter_dict else ""
+    return (normalize_query(query_text), n_results, filter_key, mode)
+
+
+class RetrievalCache:
+    """
+    Thread-safe LRU cache of query results with a time-to-live.
+    
+    Every entry records the store version it was computed against. The store
+    bumps its version on each add or delete, so entries from an older
+    version are treated as misses and dropped on access.
+    """
+    
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300.0):
+        """
+        Initialize the cache.
+        
+        Args:
+            max_entries: Maximum number of cached queries; 0 disables caching
+            ttl_seconds: Entry lifetime; 0 means entries never expire
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[int, float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    @staticmethod
+    def _copy(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Copy results so callers cannot modify cached entries"""
+        return [{**result, "metadata": dict(result["metadata"])} for result in results]
+    
+    def get(self, key: Hashable, version: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Look up cached results.
+        
+        Args:
+            key: Key from cache_key()
+            version: Current store version
+        
+        Returns:
+            Copy of the cached results, or None on a miss
+        """
+        if self.max_entries <= 0:
+            return None
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry_version, stored_at, results = entry
+                expired = self.ttl_seconds > 0 and time.monotonic() - stored_at > self.ttl_seconds
+                if entry_version != version or expired:
+                    del self._entries[key]
+                    self.invalidations += 1
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return self._copy(results)
+    
+    def put(self, key: Hashable, version: int, results: List[Dict[str, Any]]):
+        """Store results computed against a store version"""
+        if self.max_entries <= 0:
+            return
+        
+        results = self._copy(results)
+        with self._lock:
+            self._entries[key] = (version, time.monotonic(), results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,584 @@
+"""
+SQLite Document Store
+Document store backed by an on-disk SQLite FTS5 full-text index
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from langchain_core.documents import Document
+from app.config import settings
+from app.services.fingerprints import chunk_hash
+from app.services.retrieval_cache import RetrievalCache, cache_key
+from app.services.text_analysis import get_analyzer
+
+logger = logging.getLogger(__name__)
+
+# Ranking modes served by FTS5; both rank with its built-in bm25()
+LEXICAL_MODES = ("keyword", "bm25")
+
+# Metadata fields stored in their own indexed columns
+METADATA_COLUMNS = {
+    "source": "source",
+    "id": "document_id",
+    "file_type": "file_type",
+    "upload_date": "upload_date",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    rowid INTEGER PRIMARY KEY,
+    chunk_id TEXT NOT NULL UNIQUE,
+    source TEXT,
+    document_id TEXT,
+    file_type TEXT,
+    upload_date TEXT,
+    size INTEGER,
+    metadata TEXT NOT NULL,
+    content TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chunks_source ON chunks(source);
+CREATE INDEX IF NOT EXISTS chunks_document_id ON chunks(document_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+    terms, tokenize = 'unicode61 remove_diacritics 0'
+);
+CREATE TABLE IF NOT EXISTS store_info (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+-- Per-source aggregates, kept current by the triggers below; chunks without
+-- a source are counted under ''
+CREATE TABLE IF NOT EXISTS documents (
+    source TEXT PRIMARY KEY,
+    document_id TEXT,
+    upload_date TEXT,
+    size INTEGER,
+    content_hash TEXT,
+    first_row INTEGER NOT NULL,
+    chunk_count INTEGER NOT NULL,
+    content_bytes INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS chunks_documents_insert AFTER INSERT ON chunks BEGIN
+    INSERT INTO documents (
+        source, document_id, upload_date, size, content_hash, first_row, chunk_count, content_bytes
+    ) VALUES (
+        COALESCE(new.source, ''), new.document_id, new.upload_date, new.size,
+        json_extract(new.metadata, '$.content_hash'), new.rowid, 1, LENGTH(CAST(new.content AS BLOB))
+    )
+    ON CONFLICT (source) DO UPDATE SET
+        chunk_count = chunk_count + 1,
+        content_bytes = content_bytes + excluded.content_bytes;
+END;
+CREATE TRIGGER IF NOT EXISTS chunks_documents_delete AFTER DELETE ON chunks BEGIN
+    UPDATE documents SET
+        chunk_count = chunk_count - 1,
+        content_bytes = content_bytes - LENGTH(CAST(old.content AS BLOB))
+    WHERE source = COALESCE(old.source, '');
+    DELETE FROM documents WHERE source = COALESCE(old.source, '') AND chunk_count <= 0;
+END;
+"""
+
+# Document-level fields stored in the documents table
+DOCUMENT_COLUMNS = {
+    "id": "document_id",
+    "upload_date": "upload_date",
+    "size": "size",
+    "content_hash": "content_hash",
+}
+
+
+class SQLiteVectorStore:
+    """
+    Document store kept in an SQLite database with an FTS5 index.
+    
+    Chunk texts and metadata live in a ``chunks`` table; the FTS5 table
+    ``chunks_fts`` indexes each chunk's analyzed terms (see TEXT_ANALYZER)
+    under the same rowid and ranks matches with bm25(). Indexes stay on
+    disk, so startup only opens the database file and memory use does not
+    grow with the corpus. Adds and deletes are single transactions.
+    
+    Only the lexical modes are supported; 'keyword' and 'bm25' both rank
+    by FTS5's bm25(), which uses fixed k1=1.2, b=0.75.
+    """
+    
+    _instance: Optional["SQLiteVectorStore"] = None
+    _initialized: bool = False
+    
+    def __new__(cls):
+        """Singleton pattern to ensure single instance"""
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+    
+    def __init__(self):
+        """Open (or create) the database"""
+        if SQLiteVectorStore._initialized:
+            return
+        
+        self.persist_directory = str(settings.chroma_dir)
+        self.collection_name = settings.CHROMA_COLLECTION
+        os.makedirs(self.persist_directory, exist_ok=True)
+        self._db_path = os.path.join(self.persist_directory, "fts_store.db")
+        self._analyzer = get_analyzer(settings.text_analyzer_for(self.collection_name))
+        self._lock = threading.RLock()
+        self._version = 0
+        # Notified of chunk adds and deletes (see add_listener)
+        self._listeners: List[Any] = []
+        self._cache = RetrievalCache(
+            max_entries=settings.RETRIEVAL_CACHE_SIZE,
+            ttl_seconds=settings.RETRIEVAL_CACHE_TTL,
+        )
+        
+        self._conn = sqlite3.connect(self._db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA synchronous={'FULL' if settings.STORE_LOG_FSYNC else 'NORMAL'}")
+        self._conn.executescript(SCHEMA)
+        self._check_analyzer()
+        self._check_documents()
+        
+        SQLiteVectorStore._initialized = True
+    
+    def _check_analyzer(self):
+        """Re-index every chunk if the database was built with another analyzer"""
+        row = self._conn.execute("SELECT value FROM store_info WHERE key = 'analyzer'").fetchone()
+        if row is not None and row[0] == self._analyzer.name:
+            return
+        
+        with self._conn:
+            if row is not None:
+                logger.info(f"Re-indexing SQLite store from analyzer '{row[0]}' to '{self._analyzer.name}'")
+                self._conn.execute("DELETE FROM chunks_fts")
+                self._conn.executemany(
+                    "INSERT INTO chunks_fts (rowid, terms) VALUES (?, ?)",
+                    (
+                        (rowid, self._terms(content))
+                        for rowid, content in self._conn.execute("SELECT rowid, content FROM chunks")
+                    ),
+                )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO store_info (key, value) VALUES ('analyzer', ?)",
+                (self._analyzer.name,),
+            )
+    
+    def _check_documents(self):
+        """Fill the documents table of a database created before it existed"""
+        row = self._conn.execute("SELECT value FROM store_info WHERE key = 'documents'").fetchone()
+        if row is not None:
+            return
+        
+        with self._conn:
+            self._conn.execute("DELETE FROM documents")
+            # Document-level fields are read from the first chunk of each source
+            self._conn.execute(
+                "INSERT INTO documents (source, document_id, upload_date, size, content_hash, "
+                "first_row, chunk_count, content_bytes) "
+                "SELECT g.source, f.document_id, f.upload_date, f.size, json_extract(f.metadata, '$.content_hash'), "
+                "g.first_row, g.chunk_count, g.content_bytes "
+                "FROM (SELECT COALESCE(source, '') AS source, COUNT(*) AS chunk_count, "
+                "SUM(LENGTH(CAST(content AS BLOB))) AS content_bytes, MIN(rowid) AS first_row "
+                "FROM chunks GROUP BY COALESCE(source, '')) g "
+                "JOIN chunks f ON f.rowid = g.first_row"
+            )
+            self._conn.execute("INSERT INTO store_info (key, value) VALUES ('documents', '1')")
+    
+    def _terms(self, text: str) -> str:
+        """Analyzed terms of a text as the string stored in the FTS table"""
+        return " ".join(self._analyzer.analyze(text))
+    
+    def add_documents(
+        self,
+        documents: List[Document],
+        ids: Optional[List[str]] = None,
+    ) -> List[str]:
+        """
+        Add documents to the store in one transaction.
+        
+        Chunks whose ID is already stored are replaced.
+        """
+        if not documents:
+            return []
+        
+        if ids is None:
+            ids = [
+                f"{doc.metadata.get('id', 'doc')}_{doc.metadata.get('chunk_index', i)}"
+                for i, doc in enumerate(documents)
+            ]
+        
+        # Later duplicates of an ID replace earlier ones, as in the in-memory store
+        entries = {doc_id: doc for doc_id, doc in zip(ids, documents)}
+        
+        with self._lock:
+            with self._conn:
+                self._delete_chunks(list(entries))
+                for doc_id, doc in entries.items():
+                    metadata = doc.metadata
+                    cursor = self._conn.execute(
+                        "INSERT INTO chunks (chunk_id, source, document_id, file_type, upload_date, size, metadata, content) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            doc_id,
+                            metadata.get("source"),
+                            metadata.get("id"),
+                            metadata.get("file_type"),
+                            metadata.get("upload_date"),
+                            metadata.get("size"),
+                            json.dumps(metadata, default=str),
+                            doc.page_content,
+                        ),
+                    )
+                    self._conn.execute(
+                        "INSERT INTO chunks_fts (rowid, terms) VALUES (?, ?)",
+                        (cursor.lastrowid, self._terms(doc.page_content)),
+                    )
+                self._version += 1
+            for listener in self._listeners:
+                listener.chunks_added([(doc_id, doc.page_content, doc.metadata) for doc_id, doc in entries.items()])
+        return ids
+    
+    def _delete_chunks(self, chunk_ids: List[str]) -> int:
+        """Delete chunks by ID and return how many existed; must run inside a transaction"""
+        params = [(chunk_id,) for chunk_id in chunk_ids]
+        self._conn.executemany(
+            "DELETE FROM chunks_fts WHERE rowid = (SELECT rowid FROM chunks WHERE chunk_id = ?)",
+            params,
+        )
+        return self._conn.executemany("DELETE FROM chunks WHERE chunk_id = ?", params).rowcount
+    
+    def query(
+        self,
+        query_text: str,
+        n_results: int = 5,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        mode: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Query the store with FTS5 bm25() ranking.
+        
+        Args:
+            query_text: Query string
+            n_results: Number of results to return
+            filter_dict: Optional exact-match metadata filter
+            mode: Ranking mode ('keyword' or 'bm25'), defaults to RETRIEVAL_MODE
+        """
+        mode = self._resolve_mode(mode)
+        key = cache_key(query_text, n_results, filter_dict, mode)
+        version = self._version
+        results = self._cache.get(key, version)
+        if results is None:
+            results = self._run_query(query_text, n_results, filter_dict)
+            self._cache.put(key, version, results)
+        return results
+    
+    def query_many(
+        self,
+        queries: List[str],
+        n_results: int = 5,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        mode: Optional[str] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Query the store with several queries.
+        
+        FTS5 evaluates one MATCH expression per statement, so queries run
+        one after another.
+        
+        Returns:
+            One result list per query, in the same format as query()
+        """
+        mode = self._resolve_mode(mode)
+        return [self.query(query_text, n_results, filter_dict, mode) for query_text in queries]
+    
+    @staticmethod
+    def _resolve_mode(mode: Optional[str]) -> str:
+        """Normalize a ranking mode, defaulting to RETRIEVAL_MODE"""
+        mode = (mode or settings.RETRIEVAL_MODE).lower()
+        if mode not in LEXICAL_MODES:
+            raise ValueError(
+                f"Retrieval mode '{mode}' is not supported by the sqlite backend. "
+                f"Supported modes: {', '.join(repr(m) for m in LEXICAL_MODES)}"
+            )
+        return mode
+    
+    @staticmethod
+    def _filter_clause(filter_dict: Optional[Dict[str, Any]]) -> Tuple[str, List[Any]]:
+        """SQL conditions on the chunks table (aliased c) for an exact-match filter"""
+        clause = ""
+        params: List[Any] = []
+        for key, value in (filter_dict or {}).items():
+            column = METADATA_COLUMNS.get(key)
+            if column is not None:
+                clause += f" AND c.{column} IS ?"
+            else:
+                clause += " AND json_extract(c.metadata, ?) IS ?"
+                params.append(f'$."{key}"')
+            params.append(value)
+        return clause, params
+    
+    def _run_query(
+        self,
+        query_text: str,
+        n_results: int,
+        filter_dict: Optional[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        """Rank chunks for one query, bypassing the cache"""
+        terms = sorted({
+            term for term in self._analyzer.analyze(query_text)
+            if any(ch.isalnum() for ch in term)
+        })
+        if not terms or n_results <= 0:
+            return []
+        
+        # Any-term match; each term is quoted so FTS5 query syntax is not interpreted
+        match = " OR ".join('"' + term.replace('"', '""') + '"' for term in terms)
+        clause, params = self._filter_clause(filter_dict)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT c.content, c.metadata, -bm25(chunks_fts) "
+                "FROM chunks_fts JOIN chunks c ON c.rowid = chunks_fts.rowid "
+                f"WHERE chunks_fts MATCH ?{clause} "
+                "ORDER BY bm25(chunks_fts) LIMIT ?",
+                [match, *params, n_results],
+            ).fetchall()
+        
+        return [
+            {
+                "content": content,
+                "metadata": json.loads(metadata),
+                "similarity_score": score,
+            }
+            for content, metadata, score in rows
+        ]
+    
+    def delete_document(self, source_name: str) -> int:
+        """Delete all chunks of a document by source name."""
+        with self._lock:
+            chunk_ids = [
+                row[0] for row in self._conn.execute("SELECT chunk_id FROM chunks WHERE source = ?", (source_name,))
+            ]
+            if not chunk_ids:
+                return 0
+            with self._conn:
+                self._conn.execute(
+                    "DELETE FROM chunks_fts WHERE rowid IN (SELECT rowid FROM chunks WHERE source = ?)",
+                    (source_name,),
+                )
+                deleted = self._conn.execute("DELETE FROM chunks WHERE source = ?", (source_name,)).rowcount
+                self._version += 1
+            for listener in self._listeners:
+                listener.chunks_deleted(chunk_ids)
+        return deleted
+    
+    def delete_chunks(self, chunk_ids: List[str]) -> int:
+        """Delete chunks by ID; unknown IDs are ignored."""
+        chunk_ids = list(chunk_ids)
+        with self._lock:
+            with self._conn:
+                deleted = self._delete_chunks(chunk_ids)
+                if deleted:
+                    self._version += 1
+            if deleted:
+                for listener in self._listeners:
+                    listener.chunks_deleted(chunk_ids)
+        return deleted
+    
+    def update_document(self, source_name: str, fields: Dict[str, Any]) -> int:
+        """
+        Set document-level metadata fields on every chunk of a document.
+        
+        Used after a re-index so that the size, upload date and content
+        hash of the new file version apply to kept chunks as well.
+        
+        Args:
+            source_name: Document source filename
+            fields: Document-level metadata fields to set
+        
+        Returns:
+            Number of chunks updated
+        """
+        columns = {column: fields[field] for field, column in METADATA_COLUMNS.items() if field in fields}
+        if "size" in fields:
+            columns["size"] = fields["size"]
+        assignments = "".join(f", {column} = ?" for column in columns)
+        # json_set keeps fields set to None as nulls, as the in-memory store does
+        paths = "".join(", ?, json(?)" for _ in fields)
+        params: List[Any] = []
+        for field, value in fields.items():
+            params += [f'$."{field}"', json.dumps(value, default=str)]
+        with self._lock, self._conn:
+            updated = self._conn.execute(
+                f"UPDATE chunks SET metadata = json_set(metadata{paths}){assignments} WHERE source = ?",
+                (*params, *columns.values(), source_name),
+            ).rowcount
+            if updated:
+                document_fields = {
+                    column: fields[field] for field, column in DOCUMENT_COLUMNS.items() if field in fields
+                }
+                if document_fields:
+                    self._conn.execute(
+                        "UPDATE documents SET "
+                        + ", ".join(f"{column} = ?" for column in document_fields)
+                        + " WHERE source = ?",
+                        (*document_fields.values(), source_name),
+                    )
+                self._version += 1
+        return updated
+    
+    def add_listener(self, listener):
+        """
+        Register a listener for chunk adds and deletes.
+        
+        The listener's chunks_added(entries) is called with the (chunk ID,
+        text, metadata) of added chunks and chunks_deleted(chunk_ids) with
+        the IDs of deleted chunks, after the transaction commits and while
+        the store lock is held, so it must not block or call back into the
+        store.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+    
+    def remove_listener(self, listener):
+        """Unregister a listener added with add_listener"""
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+    
+    def iter_chunks(self, page_size: int = 1000) -> Iterator[Tuple[str, Optional[str], str, Optional[str], str]]:
+        """Yield (chunk ID, source, text, duplicate_of, chunk hash) for every stored chunk, a page at a time."""
+        last_rowid = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT rowid, chunk_id, source, content, json_extract(metadata, '$.duplicate_of'), "
+                    "json_extract(metadata, '$.chunk_hash') "
+                    "FROM chunks WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (last_rowid, page_size),
+                ).fetchall()
+            if not rows:
+                return
+            last_rowid = rows[-1][0]
+            for _, chunk_id, source, content, duplicate_of, fingerprint in rows:
+                yield chunk_id, source, content, duplicate_of, fingerprint or chunk_hash(content)
+    
+    def get_chunk_hashes(self, source_name: str) -> Dict[str, str]:
+        """
+        Get the content fingerprint of every chunk of a document.
+        
+        Chunks stored without a "chunk_hash" field are hashed from their text.
+        
+        Args:
+            source_name: Document source filename
+        
+        Returns:
+            Mapping of chunk ID to chunk hash
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_id, json_extract(metadata, '$.chunk_hash'), content FROM chunks WHERE source = ?",
+                (source_name,),
+            ).fetchall()
+        return {chunk_id: stored or chunk_hash(content) for chunk_id, stored, content in rows}
+    
+    def _document_rows(self, source: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Per-source aggregates as document info dicts, in first-insert order"""
+        where = "source = ?" if source is not None else "source != ''"
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT source, document_id, chunk_count, upload_date, size, content_bytes, content_hash "
+                f"FROM documents WHERE {where} ORDER BY first_row",
+                (source,) if source is not None else (),
+            ).fetchall()
+        
+        return [
+            {
+                "id": document_id or "",
+                "name": name,
+                "chunk_count": chunk_count,
+                "upload_date": upload_date or "",
+                # Documents ingested without a recorded size fall back to their text size
+                "size": file_size or content_bytes,
+                "content_hash": content_hash,
+            }
+            for name, document_id, chunk_count, upload_date, file_size, content_bytes, content_hash in rows
+        ]
+    
+    def find_document(self, doc_id_or_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a document by its ID or source name.
+        
+        Args:
+            doc_id_or_name: Document ID or source filename
+        
+        Returns:
+            Document info dict (as in get_all_documents), or None if not found
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT source FROM chunks WHERE document_id = ? LIMIT 1", (doc_id_or_name,)
+            ).fetchone()
+        source = row[0] if row is not None else doc_id_or_name
+        documents = self._document_rows(source)
+        return documents[0] if documents else None
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get the store version and retrieval cache counters."""
+        return {"store_version": self._version, **self._cache.stats()}
+    
+    def get_collection_stats(self) -> Dict[str, Any]:
+        """Get statistics about the document store."""
+        with self._lock:
+            total_chunks = self._conn.execute("SELECT COALESCE(SUM(chunk_count), 0) FROM documents").fetchone()[0]
+            sources = [
+                source for (source,) in self._conn.execute(
+                    "SELECT source FROM documents WHERE source != '' ORDER BY source"
+                )
+            ]
+        
+        return {
+            "total_chunks": total_chunks,
+            "total_documents": len(sources),
+            "sources": sources,
+        }
+    
+    def get_all_documents(self) -> List[Dict[str, Any]]:
+        """Get information about all documents in the store."""
+        return self._document_rows()
+    
+    def is_empty(self) -> bool:
+        """Check if the store is empty"""
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM chunks LIMIT 1").fetchone() is None
+    
+    def checkpoint(self):
+        """Fold the write-ahead log back into the database file"""
+        try:
+            with self._lock:
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except sqlite3.Error as e:
+            logger.error(f"Failed to checkpoint SQLite store: {e}")
+    
+    def flush_and_stop(self):
+        """Checkpoint the write-ahead log and close the database"""
+        self.checkpoint()
+        with self._lock:
+            self._conn.close()
+        SQLiteVectorStore._instance = None
+        SQLiteVectorStore._initialized = False
+    
+    def get_persistence_stats(self) -> Optional[Dict[str, Any]]:
+        """Writes are committed synchronously, so there is no flush backlog."""
+        return None
+    
+    def get_retriever(self, k: int = 5):
+        """Get a simple retriever function."""
+        def retrieve(query: str) -> List[Document]:
+            results = self.query(query, n_results=k)
+            return [
+                Document(
+                    page_content=r["content"],
+                    metadata=r["metadata"]
+                )
+                for r in results
+            ]
+        return retrieve
@@ -0,0 +1,124 @@
+"""
+Vector Store Persistence
+Append-only operation log and atomic file helpers for the simple vector store
+"""
+import json
+import logging
+import os
+import tempfile
+from typing import Any, Dict, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+
+def atomic_write_text(path: str, text: str):
+    """
+    Write a text file atomically.
+    
+    The text is written to a temp file in the same directory, fsynced and
+    renamed over the target, so readers see either the old or the new file.
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class OperationLog:
+    """
+    Append-only log of store mutations, one JSON record per line.
+    
+    Records are ``{"op": "add", "id", "content", "metadata"}``,
+    ``{"op": "delete", "ids": [...]}`` or ``{"op": "update", "source",
+    "metadata"}`` (document-level fields set on every chunk of a source).
+    Replaying is idempotent, so the log can safely be replayed over a
+    snapshot that already contains some of it.
+    """
+    
+    def __init__(self, path: str, fsync: bool = True):
+        """
+        Initialize the log.
+        
+        Args:
+            path: Log file path
+            fsync: Whether to fsync after every append
+        """
+        self.path = path
+        self.fsync = fsync
+    
+    def append(self, records: Iterable[Dict[str, Any]]):
+        """Append records to the log"""
+        lines = "".join(json.dumps(record) + "\n" for record in records)
+        if not lines:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+    
+    def read(self) -> List[Dict[str, Any]]:
+        """
+        Read every complete record in the log.
+        
+        A torn record left by a crash mid-append is dropped and truncated
+        away so later appends start on a clean line.
+        """
+        if not os.path.exists(self.path):
+            return []
+        
+        records = []
+        valid_bytes = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+                valid_bytes += len(line)
+        
+        if valid_bytes < os.path.getsize(self.path):
+            logger.warning(f"Discarding torn tail of operation log {self.path}")
+            with open(self.path, "r+b") as f:
+                f.truncate(valid_bytes)
+        
+        return records
+    
+    def truncate(self):
+        """Empty the log after a checkpoint"""
+        with open(self.path, "w"):
+            pass
+    
+    def rewrite(self, records: Iterable[Dict[str, Any]]):
+        """Atomically replace the log with the given records"""
+        atomic_write_text(self.path, "".join(json.dumps(record) + "\n" for record in records))
+
+
+def apply_operations(documents: Dict[str, Dict[str, Any]], records: Iterable[Dict[str, Any]]):
+    """Replay log records onto a documents dict in place"""
+    for record in records:
+        op = record.get("op")
+        if op == "add":
+            documents[record["id"]] = {
+                "content": record["content"],
+                "metadata": record["metadata"],
+            }
+        elif op == "delete":
+            for doc_id in record["ids"]:
+                documents.pop(doc_id, None)
+        elif op == "update":
+            for document in documents.values():
+                if document["metadata"].get("source") == record["source"]:
+                    document["metadata"] = {**document["metadata"], **record["metadata"]}
+        else:
+            logger.warning(f"Skipping unknown operation log record: {op}")
@@ -0,0 +1,362 @@
+"""
+Vector Store Snapshots
+Binary, memory-mappable snapshot format for the simple vector store
+
+A snapshot is a directory of flat files. Arrays are saved as .npy and opened
+with ``mmap_mode="r"``, so opening a snapshot costs a manifest read plus a
+handful of mmap calls, and pages are only read from disk when a query
+touches them:
+    
+    manifest.json         format version, chunk IDs, document metadata table,
+                          sparse chunk-level metadata, vocabulary, text analyzer,
+                          embedding provider, model and dimensions
+    chunk_documents.npy   int32 row of each chunk's document in the metadata table
+    chunk_indexes.npy     int64 chunk_index of each chunk (-1 if absent)
+    content.bin           chunk texts as packed UTF-8
+    content_offsets.npy   int64 byte offsets into content.bin (n_chunks + 1)
+    lengths.npy           int32 chunk lengths in terms
+    postings_offsets.npy  int64 CSR row offsets, one row per vocabulary term
+    postings_slots.npy    int32 chunk rows of every posting
+    postings_tfs.npy      int32 term frequency of every posting
+    tokens.npy            int32 vocabulary rows of every chunk's tokens, in text order
+    token_offsets.npy     int64 offsets of each chunk's tokens (n_chunks + 1)
+    embeddings.npy        float32 (n_chunks, dim) normalized rows, if dense search was used
+
+Snapshots live in ``snapshot-NNNNNN`` directories; the ``CURRENT`` file names
+the live one and is replaced atomically once a new snapshot is complete.
+
+Convert an existing ``simple_store.json`` with:
+    
+    python -m app.services.store_snapshot [STORE_DIR]
+"""
+import json
+import logging
+import mmap
+import os
+import shutil
+import sys
+from typing import Any, Dict, Iterable, List, Optional
+import numpy as np
+from app.services.chunk_records import ChunkRecord, DocumentRegistry, split_metadata
+from app.services.store_persistence import atomic_write_text
+from app.services.text_analysis import Analyzer
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 3
+
+# Older versions that can still be opened
+READABLE_VERSIONS = (1, 2, 3)
+CURRENT_FILE = "CURRENT"
+SNAPSHOT_PREFIX = "snapshot-"
+
+
+class ContentBlob:
+    """Random access to chunk texts packed in a memory-mapped file"""
+    
+    def __init__(self, path: str, offsets: np.ndarray):
+        """
+        Open a content blob.
+        
+        Args:
+            path: Path to content.bin
+            offsets: Byte offsets of each chunk (n_chunks + 1)
+        """
+        self._offsets = offsets
+        self._file = open(path, "rb")
+        if os.path.getsize(path):
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._data = b""
+    
+    def __getitem__(self, row: int) -> str:
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        return self._data[start:end].decode("utf-8")
+    
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+    
+    def byte_length(self, row: int) -> int:
+        """Size of a chunk's encoded text, without reading it"""
+        return int(self._offsets[row + 1] - self._offsets[row])
+    
+    def close(self):
+        """Release the mapping"""
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+
+class Snapshot:
+    """An opened snapshot whose arrays are memory-mapped"""
+    
+    def __init__(self, path: str):
+        """
+        Open the snapshot stored in a directory.
+        
+        Args:
+            path: Snapshot directory
+        """
+        self.path = path
+        with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        
+        version = manifest.get("format_version")
+        if version not in READABLE_VERSIONS:
+            raise ValueError(f"Unsupported snapshot format version: {version}")
+        
+        self.chunk_ids: List[str] = manifest["chunk_ids"]
+        if version == 1:
+            self._split_chunk_metadata(manifest["metadata"])
+        else:
+            self.documents: List[Dict[str, Any]] = manifest["documents"]
+            self.chunk_documents = self._load("chunk_documents.npy")
+            self.chunk_indexes = self._load("chunk_indexes.npy")
+            self.chunk_extras: Dict[int, Dict[str, Any]] = {
+                int(row): extra for row, extra in manifest["chunk_extras"].items()
+            }
+        self.terms: List[str] = manifest["terms"]
+        # Snapshots written before analyzers were configurable used whitespace splitting
+        self.analyzer: str = manifest.get("analyzer", "whitespace")
+        
+        self.lengths = self._load("lengths.npy")
+        self.postings_offsets = self._load("postings_offsets.npy")
+        self.postings_slots = self._load("postings_slots.npy")
+        self.postings_tfs = self._load("postings_tfs.npy")
+        if version >= 3:
+            self.tokens = self._load("tokens.npy")
+            self.token_offsets = self._load("token_offsets.npy")
+        else:
+            # Token positions predate version 3; the store rebuilds them
+            self.tokens = None
+            self.token_offsets = None
+        self.content = ContentBlob(
+            os.path.join(path, "content.bin"),
+            self._load("content_offsets.npy"),
+        )
+        self.embeddings = (
+            self._load("embeddings.npy") if manifest.get("has_embeddings") else None
+        )
+        # Model that produced the embeddings; None for snapshots that predate it
+        self.embedding_model: Optional[Dict[str, Any]] = manifest.get("embedding_model")
+    
+    def _split_chunk_metadata(self, metadata: List[Dict[str, Any]]):
+        """Build the document table from version 1 per-chunk metadata"""
+        self.documents = []
+        self.chunk_documents = np.zeros(len(metadata), dtype=np.int32)
+        self.chunk_indexes = np.full(len(metadata), -1, dtype=np.int64)
+        self.chunk_extras = {}
+        rows: Dict[str, int] = {}
+        for row, chunk_metadata in enumerate(metadata):
+            document, chunk_index, extra = split_metadata(chunk_metadata)
+            key = json.dumps(document, sort_keys=True)
+            if key not in rows:
+                rows[key] = len(self.documents)
+                self.documents.append(document)
+            self.chunk_documents[row] = rows[key]
+            if chunk_index is not None:
+                self.chunk_indexes[row] = chunk_index
+            if extra:
+                self.chunk_extras[row] = extra
+    
+    def _load(self, name: str) -> np.ndarray:
+        """Memory-map an array file from the snapshot"""
+        return np.load(os.path.join(self.path, name), mmap_mode="r")
+    
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+    
+    def close(self):
+        """Release memory-mapped files"""
+        self.content.close()
+
+
+def _current_name(store_dir: str) -> Optional[str]:
+    """Name of the live snapshot directory, if any"""
+    current_path = os.path.join(store_dir, CURRENT_FILE)
+    if not os.path.exists(current_path):
+        return None
+    with open(current_path, "r", encoding="utf-8") as f:
+        return f.read().strip() or None
+
+
+def open_snapshot(store_dir: str) -> Optional[Snapshot]:
+    """
+    Open the live snapshot of a store directory.
+    
+    Returns:
+        Snapshot, or None if the store has never been checkpointed
+    """
+    name = _current_name(store_dir)
+    if name is None:
+        return None
+    return Snapshot(os.path.join(store_dir, name))
+
+
+def _save_array(path: str, array: np.ndarray):
+    """Save an .npy file and fsync it"""
+    with open(path, "wb") as f:
+        np.save(f, array)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def write_snapshot(
+    store_dir: str,
+    chunk_ids: List[str],
+    records: List[ChunkRecord],
+    contents: Iterable[str],
+    index_arrays: Dict[str, Any],
+    embeddings: Optional[np.ndarray] = None,
+    embedding_model: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    Write a new snapshot and make it the live one.
+    
+    Args:
+        store_dir: Store directory
+        chunk_ids: Chunk IDs in row order
+        records: Chunk records in row order; their shared document
+            records become the document metadata table
+        contents: Chunk texts in row order
+        index_arrays: Output of InvertedIndex.export_arrays()
+        embeddings: Optional embedding matrix in row order
+        embedding_model: Provider and model of the embeddings (see
+            get_embedding_info); the dimensions are taken from the matrix
+    
+    Returns:
+        Path of the new snapshot directory
+    """
+    current = _current_name(store_dir)
+    sequence = int(current[len(SNAPSHOT_PREFIX):]) + 1 if current else 1
+    name = f"{SNAPSHOT_PREFIX}{sequence:06d}"
+    path = os.path.join(store_dir, name)
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.makedirs(path)
+    
+    offsets = np.zeros(len(chunk_ids) + 1, dtype=np.int64)
+    with open(os.path.join(path, "content.bin"), "wb") as f:
+        position = 0
+        for row, text in enumerate(contents):
+            data = text.encode("utf-8")
+            f.write(data)
+            position += len(data)
+            offsets[row + 1] = position
+        f.flush()
+        os.fsync(f.fileno())
+    
+    documents: List[Dict[str, Any]] = []
+    document_rows: Dict[int, int] = {}
+    chunk_documents = np.zeros(len(chunk_ids), dtype=np.int32)
+    chunk_indexes = np.full(len(chunk_ids), -1, dtype=np.int64)
+    chunk_extras: Dict[str, Dict[str, Any]] = {}
+    for row, record in enumerate(records):
+        document_row = document_rows.get(id(record.document))
+        if document_row is None:
+            document_row = document_rows[id(record.document)] = len(documents)
+            documents.append(record.document.metadata)
+        chunk_documents[row] = document_row
+        if record.chunk_index is not None:
+            chunk_indexes[row] = record.chunk_index
+        if record.extra:
+            chunk_extras[str(row)] = record.extra
+    
+    _save_array(os.path.join(path, "chunk_documents.npy"), chunk_documents)
+    _save_array(os.path.join(path, "chunk_indexes.npy"), chunk_indexes)
+    _save_array(os.path.join(path, "content_offsets.npy"), offsets)
+    _save_array(os.path.join(path, "lengths.npy"), index_arrays["lengths"])
+    _save_array(os.path.join(path, "postings_offsets.npy"), index_arrays["offsets"])
+    _save_array(os.path.join(path, "postings_slots.npy"), index_arrays["slots"])
+    _save_array(os.path.join(path, "postings_tfs.npy"), index_arrays["tfs"])
+    _save_array(os.path.join(path, "tokens.npy"), index_arrays["tokens"])
+    _save_array(os.path.join(path, "token_offsets.npy"), index_arrays["token_offsets"])
+    if embeddings is not None:
+        _save_array(os.path.join(path, "embeddings.npy"), np.ascontiguousarray(embeddings, dtype=np.float32))
+    
+    atomic_write_text(os.path.join(path, "manifest.json"), json.dumps({
+        "format_version": FORMAT_VERSION,
+        "chunk_ids": chunk_ids,
+        "documents": documents,
+        "chunk_extras": chunk_extras,
+        "terms": index_arrays["terms"],
+        "analyzer": index_arrays["analyzer"],
+        "has_embeddings": embeddings is not None,
+        "embedding_model": (
+            {**(embedding_model or {}), "dimensions": int(embeddings.shape[1])}
+            if embeddings is not None else None
+        ),
+    }))
+    
+    atomic_write_text(os.path.join(store_dir, CURRENT_FILE), name)
+    
+    # Older snapshots are no longer reachable. Open mappings stay valid on
+    # POSIX; elsewhere the removal is retried after the next checkpoint.
+    for entry in os.listdir(store_dir):
+        if entry.startswith(SNAPSHOT_PREFIX) and entry != name:
+            shutil.rmtree(os.path.join(store_dir, entry), ignore_errors=True)
+    
+    return path
+
+
+def convert_json_store(store_dir: str, analyzer: Optional[Analyzer] = None) -> Optional[str]:
+    """
+    Convert a legacy simple_store.json (plus its operation log) to a snapshot.
+    
+    The JSON file is renamed to simple_store.json.bak once the snapshot is live.
+    
+    Args:
+        store_dir: Store directory
+        analyzer: Analyzer for the keyword index; defaults to StandardAnalyzer
+    
+    Returns:
+        Path of the new snapshot directory, or None if there was nothing to convert
+    """
+    from app.services.inverted_index import InvertedIndex
+    from app.services.store_persistence import OperationLog, apply_operations
+    
+    json_path = os.path.join(store_dir, "simple_store.json")
+    if not os.path.exists(json_path):
+        return None
+    
+    with open(json_path, "r") as f:
+        documents = json.load(f)
+    log = OperationLog(os.path.join(store_dir, "simple_store.log"))
+    apply_operations(documents, log.read())
+    
+    index = InvertedIndex(analyzer)
+    for doc_id, doc_data in documents.items():
+        index.add(doc_id, doc_data["content"])
+    arrays = index.export_arrays()
+    chunk_ids = arrays["chunk_ids"]
+    registry = DocumentRegistry()
+    
+    path = write_snapshot(
+        store_dir,
+        chunk_ids,
+        [registry.make_chunk(documents[doc_id]["metadata"]) for doc_id in chunk_ids],
+        (documents[doc_id]["content"] for doc_id in chunk_ids),
+        arrays,
+    )
+    log.truncate()
+    os.replace(json_path, json_path + ".bak")
+    return path
+
+
+if __name__ == "__main__":
+    from app.config import settings
+    from app.services.text_analysis import get_analyzer
+    
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) > 1:
+        target_dir = sys.argv[1]
+    else:
+        target_dir = str(settings.chroma_dir)
+    
+    snapshot_path = convert_json_store(
+        target_dir, get_analyzer(settings.text_analyzer_for(settings.CHROMA_COLLECTION))
+    )
+    if snapshot_path:
+        logger.info(f"Wrote snapshot {snapshot_path}")
+    else:
+        logger.info(f"No simple_store.json found in {target_dir}")
@@ -0,0 +1,151 @@
+"""
+Text Analysis
+Analyzers that turn chunk and query text into index terms
+"""
+import re
+import unicodedata
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional
+
+# Letters and digits; underscores and punctuation separate terms
+_WORD_PATTERN = re.compile(r"[^\W_]+")
+
+STOPWORDS: FrozenSet[str] = frozenset("""
+a about above after again against all am an and any are as at be because been
+before being below between both but by can could did do does doing down during
+each few for from further had has have having he her here hers herself him
+himself his how i if in into is it its itself just me more most my myself no
+nor not of off on once only or other our ours ourselves out over own same she
+should so some such than that the their theirs them themselves then there these
+they this those through to too under until up very was we were what when where
+which while who whom why will with would you your yours yourself yourselves
+s t d ll m re ve
+""".split())
+
+
+@lru_cache(maxsize=65536)
+def light_stem(word: str) -> str:
+    """
+    Strip English plural endings.
+    
+    A deliberately light stemmer (Porter step 1a with a guard for short
+    words): "policies" -> "policy", "classes" -> "class", "rules" -> "rule",
+    while "campus", "class" and "analysis" are kept as they are.
+    
+    Args:
+        word: Lowercase word
+    
+    Returns:
+        Stemmed word
+    """
+    if len(word) <= 3 or not word.endswith("s"):
+        return word
+    if word.endswith("sses"):
+        return word[:-2]
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith(("ss", "us", "is")):
+        return word
+    return word[:-1]
+
+
+class Analyzer(ABC):
+    """
+    Turns text into a sequence of index terms.
+    
+    The same analyzer must be used for indexing and for queries; its name is
+    stored with snapshots so a changed analyzer triggers re-indexing.
+    """
+    
+    name = "base"
+    
+    @abstractmethod
+    def analyze(self, text: str) -> List[str]:
+        """
+        Split text into index terms, in text order.
+        
+        Args:
+            text: Text to analyze
+        
+        Returns:
+            List of terms
+        """
+
+
+class WhitespaceAnalyzer(Analyzer):
+    """Lowercase and split on whitespace, keeping punctuation attached to words"""
+    
+    name = "whitespace"
+    
+    def analyze(self, text: str) -> List[str]:
+        return text.lower().split()
+
+
+class StandardAnalyzer(Analyzer):
+    """
+    Unicode-normalizing analyzer with stopword removal and light stemming.
+    
+    Text is NFKC-normalized and case-folded, split on anything that is not
+    a letter or digit (so "policy," and "policy" are the same term),
+    stopwords are dropped and plural endings are stripped.
+    """
+    
+    name = "standard"
+    
+    def __init__(self, stopwords: Optional[Iterable[str]] = None, stem: bool = True):
+        """
+        Initialize the analyzer.
+        
+        Args:
+            stopwords: Words to drop; defaults to STOPWORDS
+            stem: Whether to strip plural endings
+        """
+        self.stopwords = STOPWORDS if stopwords is None else frozenset(stopwords)
+        self.stem = stem
+    
+    def analyze(self, text: str) -> List[str]:
+        # ASCII text is already in NFKC form
+        if not text.isascii():
+            text = unicodedata.normalize("NFKC", text)
+        stopwords = self.stopwords
+        words = [word for word in _WORD_PATTERN.findall(text.casefold()) if word not in stopwords]
+        if self.stem:
+            return [light_stem(word) for word in words]
+        return words
+
+
+_ANALYZERS: Dict[str, Callable[[], Analyzer]] = {
+    StandardAnalyzer.name: StandardAnalyzer,
+    WhitespaceAnalyzer.name: WhitespaceAnalyzer,
+}
+
+
+def register_analyzer(name: str, factory: Callable[[], Analyzer]):
+    """
+    Register an analyzer so it can be selected by name in the settings.
+    
+    Args:
+        name: Analyzer name; must match the ``name`` of the analyzers it builds
+        factory: Callable returning a new analyzer
+    """
+    _ANALYZERS[name.lower()] = factory
+
+
+def get_analyzer(name: str) -> Analyzer:
+    """
+    Build a registered analyzer.
+    
+    Args:
+        name: Analyzer name, e.g. 'standard' or 'whitespace'
+    
+    Returns:
+        Analyzer instance
+    """
+    factory = _ANALYZERS.get(name.lower())
+    if factory is None:
+        raise ValueError(
+            f"Unknown text analyzer: {name}. "
+            f"Supported analyzers: {', '.join(repr(n) for n in sorted(_ANALYZERS))}"
+        )
+    return factory()
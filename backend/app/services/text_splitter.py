@@ -0,0 +1,148 @@
+"""
+Text Splitter
+Recursive character splitting over character offsets
+"""
+from collections import deque
+from typing import List, Sequence, Tuple
+
+DEFAULT_SEPARATORS = ("\n\n", "\n", " ", "")
+
+
+class RecursiveTextSplitter:
+    """
+    Splits text into overlapping chunks of at most ``chunk_size`` characters.
+    
+    Produces the same chunks as LangChain's RecursiveCharacterTextSplitter
+    with its defaults (separators kept at the start of the following piece,
+    whitespace stripped, ``len`` as the length function), but works on
+    (start, end) offsets into the original text instead of building and
+    re-joining substrings. Each level scans its segment once with
+    ``str.find`` to cut it at the first separator that occurs in it; pieces
+    of at least ``chunk_size`` characters are cut again with the next
+    separator, and runs of smaller pieces are merged into chunks by a
+    sliding window that keeps up to ``chunk_overlap`` characters of
+    overlap. Only the emitted chunks are ever copied out of the text.
+    """
+    
+    def __init__(
+        self,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        separators: Sequence[str] = DEFAULT_SEPARATORS,
+    ):
+        """
+        Initialize the splitter.
+        
+        Args:
+            chunk_size: Maximum chunk length in characters
+            chunk_overlap: Maximum overlap between consecutive chunks
+            separators: Separators to cut at, coarsest first; "" cuts between characters
+        """
+        if chunk_overlap > chunk_size:
+            raise ValueError(
+                f"Chunk overlap ({chunk_overlap}) is larger than chunk size ({chunk_size})"
+            )
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = tuple(separators)
+    
+    def split_text(self, text: str) -> List[str]:
+        """
+        Split text into chunks.
+        
+        Args:
+            text: Text to split
+        
+        Returns:
+            Chunk texts, in order
+        """
+        return [text[start:end] for start, end in self.split_offsets(text)]
+    
+    def split_offsets(self, text: str) -> List[Tuple[int, int]]:
+        """
+        Split text into chunks given as character offsets.
+        
+        Args:
+            text: Text to split
+        
+        Returns:
+            (start, end) offsets of each chunk; text[start:end] is the chunk
+        """
+        spans: List[Tuple[int, int]] = []
+        self._split(text, 0, len(text), 0, spans)
+        return spans
+    
+    def _split(self, text: str, start: int, end: int, level: int, spans: List[Tuple[int, int]]):
+        """Split text[start:end] with separators[level:], appending chunk spans"""
+        # Use the first separator present in the segment
+        separator = self.separators[-1]
+        recurse = False
+        for i in range(level, len(self.separators)):
+            candidate = self.separators[i]
+            if not candidate:
+                separator = candidate
+                break
+            if text.find(candidate, start, end) != -1:
+                separator = candidate
+                level = i + 1
+                recurse = level < len(self.separators)
+                break
+        
+        good: List[Tuple[int, int]] = []
+        for piece_start, piece_end in self._pieces(text, start, end, separator):
+            if piece_end - piece_start < self.chunk_size:
+                good.append((piece_start, piece_end))
+                continue
+            if good:
+                self._merge(text, good, spans)
+                good = []
+            if recurse:
+                self._split(text, piece_start, piece_end, level, spans)
+            else:
+                spans.append((piece_start, piece_end))
+        if good:
+            self._merge(text, good, spans)
+    
+    @staticmethod
+    def _pieces(text: str, start: int, end: int, separator: str) -> List[Tuple[int, int]]:
+        """Cut text[start:end] before each separator occurrence, dropping empty pieces"""
+        if not separator:
+            return [(i, i + 1) for i in range(start, end)]
+        
+        pieces = []
+        previous = start
+        position = text.find(separator, start, end)
+        while position != -1:
+            if position > previous:
+                pieces.append((previous, position))
+            previous = position
+            position = text.find(separator, position + len(separator), end)
+        if end > previous:
+            pieces.append((previous, end))
+        return pieces
+    
+    def _merge(self, text: str, pieces: List[Tuple[int, int]], spans: List[Tuple[int, int]]):
+        """Merge consecutive small pieces into chunks with overlap"""
+        window = deque()
+        total = 0
+        for piece_start, piece_end in pieces:
+            length = piece_end - piece_start
+            if total + length > self.chunk_size and window:
+                self._emit(text, window[0][0], window[-1][1], spans)
+                # Drop pieces from the front until the rest fits as overlap
+                while total > self.chunk_overlap or (total + length > self.chunk_size and total > 0):
+                    first_start, first_end = window.popleft()
+                    total -= first_end - first_start
+            window.append((piece_start, piece_end))
+            total += length
+        if window:
+            self._emit(text, window[0][0], window[-1][1], spans)
+    
+    @staticmethod
+    def _emit(text: str, start: int, end: int, spans: List[Tuple[int, int]]):
+        """Append the span of text[start:end] with surrounding whitespace stripped, unless empty"""
+        chunk = text[start:end]
+        stripped = chunk.strip()
+        if stripped:
+            start += len(chunk) - len(chunk.lstrip())
+            spans.append((start, start + len(stripped)))
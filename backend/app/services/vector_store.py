@@ -2,19 +2,74 @@
 Vector Store Service
 In-memory fallback for Python 3.14 compatibility (ChromaDB has issues)
 """
+import logging
 import os
-from typing import List, Dict, Any, Optional
+import threading
+from typing import TYPE_CHECKING, List, Dict, Any, Iterator, Optional, Tuple, Union
 from langchain_core.documents import Document
 from app.config import settings
+from app.services.chunk_records import ChunkRecord, DocumentRegistry
+from app.services.fingerprints import chunk_hash
+from app.services.inverted_index import InvertedIndex
+from app.services.dense_index import DenseIndex
+from app.services.ivf_index import IVFDenseIndex
+from app.services.quantized_index import QuantizedDenseIndex
+from app.services.retrieval_cache import RetrievalCache, cache_key
+from app.services.text_analysis import get_analyzer
+from app.services.hybrid_ranking import maximal_marginal_relevance, reciprocal_rank_fusion
+from app.services.persistence_worker import PersistenceWorker
+from app.services.store_persistence import OperationLog
+from app.services.store_snapshot import Snapshot, open_snapshot, write_snapshot
 import json
 import hashlib
+import heapq
+import numpy as np
+
+if TYPE_CHECKING:
+    from app.services.sqlite_store import SQLiteVectorStore
+
+logger = logging.getLogger(__name__)
+
+# Number of chunks sent to the embedding provider per call
+EMBEDDING_BATCH_SIZE = 64
+
+# Ranking modes accepted by query() and query_many()
+RETRIEVAL_MODES = ("keyword", "bm25", "dense", "hybrid")
+
+# Metadata fields with a value -> chunk IDs secondary index
+INDEXED_METADATA_FIELDS = ("source", "id", "file_type", "upload_date")
 
 
 class VectorStoreService:
     """
     Simple in-memory vector store fallback.
     ChromaDB has Pydantic compatibility issues with Python 3.14.
-    This provides basic similarity search using keyword matching.
+    This provides keyword/BM25 search backed by an inverted index, and
+    dense search over chunk embeddings built on first use.
+    
+    Mutations are appended to an operation log; the full store is only
+    rewritten as a checkpoint snapshot by a background PersistenceWorker,
+    at most every STORE_FLUSH_INTERVAL seconds or once
+    STORE_CHECKPOINT_INTERVAL chunk operations are pending, so requests
+    never wait for a snapshot write. Snapshots are memory-mapped on load,
+    so chunk texts and posting lists are paged in only when queries touch
+    them.
+    
+    With DENSE_INDEX=ivf, dense search probes an IVF (k-means inverted
+    file) index instead of scoring every chunk; with DENSE_INDEX=int8 it
+    scores int8 codes and re-scores a shortlist from the snapshot floats.
+    
+    Secondary indexes on INDEXED_METADATA_FIELDS serve filters, document
+    lookup and deletion without scanning every chunk, and per-document
+    aggregates keep the listing and stats endpoints independent of the
+    number of chunks.
+    
+    Query results are cached (LRU + TTL) against a store version that is
+    bumped by every add and delete, so cached results are never stale.
+    
+    Chunks are stored as slotted ChunkRecords that share one interned
+    DocumentRecord per document, so document-level metadata is held once
+    rather than copied into every chunk.
     """
     
     _instance: Optional["VectorStoreService"] = None
@@ -34,32 +89,587 @@ class VectorStoreService:
         self.persist_directory = str(settings.chroma_dir)
         self.collection_name = settings.CHROMA_COLLECTION
         self._store_path = os.path.join(self.persist_directory, "simple_store.json")
+        self._log = OperationLog(
+            os.path.join(self.persist_directory, "simple_store.log"),
+            fsync=settings.STORE_LOG_FSYNC,
+        )
+        self._snapshot: Optional[Snapshot] = None
+        
+        # Guards the store against the background checkpoint thread
+        self._lock = threading.RLock()
+        self._log_tail: Optional[List[Dict[str, Any]]] = None
+        self._persistence = PersistenceWorker(
+            self._write_checkpoint,
+            interval=settings.STORE_FLUSH_INTERVAL,
+            max_pending=settings.STORE_CHECKPOINT_INTERVAL,
+            name="vector-store-persistence",
+        )
         
         # Ensure directory exists
         os.makedirs(self.persist_directory, exist_ok=True)
         
         # Load existing documents or initialize empty
-        self._documents: Dict[str, Dict[str, Any]] = {}
+        self._documents: Dict[str, ChunkRecord] = {}
+        self._registry = DocumentRegistry()
+        self._metadata_index: Dict[str, Dict[Any, set]] = {
+            field: {} for field in INDEXED_METADATA_FIELDS
+        }
+        self._document_stats: Dict[str, Dict[str, Any]] = {}
+        self._sorted_sources: Optional[List[str]] = None
+        self._index = InvertedIndex(get_analyzer(settings.text_analyzer_for(self.collection_name)))
+        self._dense: Optional[DenseIndex] = None
+        self._embeddings = None
+        self._version = 0
+        # Notified of chunk adds and deletes (see add_listener)
+        self._listeners: List[Any] = []
+        self._cache = RetrievalCache(
+            max_entries=settings.RETRIEVAL_CACHE_SIZE,
+            ttl_seconds=settings.RETRIEVAL_CACHE_TTL,
+        )
         self._load_store()
         
         VectorStoreService._initialized = True
     
     def _load_store(self):
-        """Load persisted documents from disk"""
-        if os.path.exists(self._store_path):
+        """Load the latest snapshot from disk and replay the operation log"""
+        try:
+            snapshot = open_snapshot(self.persist_directory)
+        except Exception as e:
+            logger.error(f"Failed to open vector store snapshot: {e}")
+            snapshot = None
+        
+        reanalyzed = False
+        if snapshot is not None and snapshot.analyzer != self._index.analyzer.name:
+            # The keyword index was built with another analyzer; re-index the texts
+            logger.info(
+                f"Re-indexing snapshot from analyzer '{snapshot.analyzer}' "
+                f"to '{self._index.analyzer.name}'"
+            )
+            self._attach_snapshot(snapshot, reindex=True)
+            reanalyzed = True
+        elif snapshot is not None:
+            self._attach_snapshot(snapshot)
+        elif os.path.exists(self._store_path):
+            # Legacy JSON store; the next checkpoint converts it to a snapshot
             try:
                 with open(self._store_path, 'r') as f:
-                    self._documents = json.load(f)
-            except Exception:
-                self._documents = {}
+                    stored = json.load(f)
+            except Exception as e:
+                logger.error(f"Failed to load vector store: {e}")
+                stored = {}
+            self._documents = {
+                doc_id: self._registry.make_chunk(doc_data["metadata"], content=doc_data["content"])
+                for doc_id, doc_data in stored.items()
+            }
+            self._rebuild_index()
+        
+        try:
+            records = self._log.read()
+        except Exception as e:
+            logger.error(f"Failed to read vector store operation log: {e}")
+            records = []
+        self._replay(records)
+        self._persistence.notify(len(records))
+        if reanalyzed:
+            self.checkpoint()
+    
+    def _attach_snapshot(
+        self,
+        snapshot: Snapshot,
+        reindex: bool = False,
+        training: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        Serve every chunk from a snapshot, dropping in-memory copies.
+        
+        Args:
+            snapshot: Opened snapshot
+            reindex: Rebuild the keyword index from the chunk texts instead of
+                loading the snapshot's postings (for a changed analyzer)
+            training: Dense index training_state to reuse
+        """
+        self._install_snapshot_state(self._snapshot_state(snapshot, reindex, training))
+    
+    def _snapshot_state(
+        self,
+        snapshot: Snapshot,
+        reindex: bool = False,
+        training: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Build the records and indexes serving a snapshot, without touching the live ones.
+        
+        Only reads the snapshot, so a checkpoint can run it without the store
+        lock and swap the result in with _install_snapshot_state.
+        
+        Args:
+            snapshot: Opened snapshot
+            reindex: Rebuild the keyword index from the chunk texts
+            training: Dense index training_state to reuse
+        
+        Returns:
+            New values of the store attributes, by name
+        """
+        registry = DocumentRegistry()
+        chunk_documents = snapshot.chunk_documents.tolist()
+        counts = np.bincount(snapshot.chunk_documents, minlength=len(snapshot.documents)).tolist()
+        documents = [
+            registry.acquire(metadata, chunks=count)
+            for metadata, count in zip(snapshot.documents, counts)
+        ]
+        extras = snapshot.chunk_extras
+        records = {
+            chunk_id: ChunkRecord(
+                documents[chunk_documents[row]],
+                chunk_index if chunk_index >= 0 else None,
+                extras.get(row),
+                row=row,
+            )
+            for row, (chunk_id, chunk_index) in enumerate(
+                zip(snapshot.chunk_ids, snapshot.chunk_indexes.tolist())
+            )
+        }
+        
+        metadata_index = {field: {} for field in INDEXED_METADATA_FIELDS}
+        document_stats = {}
+        for doc_id, record in records.items():
+            self._add_metadata(
+                metadata_index, document_stats, doc_id, record, snapshot.content.byte_length(record.row)
+            )
+        
+        index = InvertedIndex(self._index.analyzer)
+        if reindex:
+            for row, chunk_id in enumerate(snapshot.chunk_ids):
+                index.add(chunk_id, snapshot.content[row])
+        else:
+            tokens, token_offsets = self._snapshot_tokens(snapshot)
+            index.load_arrays(
+                snapshot.chunk_ids,
+                snapshot.lengths,
+                snapshot.terms,
+                snapshot.postings_offsets,
+                snapshot.postings_slots,
+                snapshot.postings_tfs,
+                tokens,
+                token_offsets,
+            )
+        
+        dense = None
+        if snapshot.embeddings is not None and self._snapshot_embeddings_current(snapshot):
+            dense_class, dense_options = self._dense_index_type()
+            dense = dense_class.from_matrix(snapshot.chunk_ids, snapshot.embeddings, **dense_options)
+            if training is not None:
+                dense.restore_training(training)
+        
+        return {
+            "snapshot": snapshot,
+            "registry": registry,
+            "documents": records,
+            "metadata_index": metadata_index,
+            "document_stats": document_stats,
+            "index": index,
+            "dense": dense,
+        }
+    
+    @staticmethod
+    def _snapshot_embeddings_current(snapshot: Snapshot) -> bool:
+        """
+        Whether a snapshot's embeddings come from the configured embeddings model.
+        
+        Embeddings of another provider, model or size would be compared
+        with query vectors they have nothing in common with, so they are
+        dropped and the store is re-embedded on the next dense query.
+        """
+        from app.services.llm_provider import get_embedding_info
+        try:
+            current = get_embedding_info()
+        except ValueError as e:
+            logger.warning(f"Dropping snapshot embeddings: {e}")
+            return False
+        
+        stored = snapshot.embedding_model or {}
+        if any(stored.get(key) != current[key] for key in ("provider", "model", "dimensions")):
+            logger.warning(
+                f"Snapshot embeddings were made with {stored.get('provider', 'an unrecorded provider')} "
+                f"{stored.get('model', '')} ({stored.get('dimensions', snapshot.embeddings.shape[1])} dims); "
+                f"configured embeddings are {current['provider']} {current['model']} "
+                f"({current['dimensions']} dims). Re-embedding on the next dense query"
+            )
+            return False
+        return True
+    
+    def _install_snapshot_state(self, state: Dict[str, Any]):
+        """Swap in the records and indexes built by _snapshot_state and close the previous snapshot"""
+        previous = self._snapshot
+        self._snapshot = state["snapshot"]
+        self._registry = state["registry"]
+        self._documents = state["documents"]
+        self._metadata_index = state["metadata_index"]
+        self._document_stats = state["document_stats"]
+        self._sorted_sources = None
+        self._index = state["index"]
+        self._dense = state["dense"]
+        
+        if previous is not None:
+            previous.close()
+    
+    def _snapshot_tokens(self, snapshot: Snapshot) -> Tuple[np.ndarray, np.ndarray]:
+        """Token arrays of a snapshot, rebuilt from chunk texts for snapshots that predate them"""
+        if snapshot.tokens is not None:
+            return snapshot.tokens, snapshot.token_offsets
+        
+        logger.info("Rebuilding token positions for an older snapshot; the next checkpoint stores them")
+        term_rows = {term: row for row, term in enumerate(snapshot.terms)}
+        parts = [
+            np.array([term_rows[term] for term in self._index.tokenize(snapshot.content[row])], dtype=np.int32)
+            for row in range(len(snapshot))
+        ]
+        offsets = np.zeros(len(parts) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(part) for part in parts], dtype=np.int64)
+        tokens = np.concatenate(parts) if parts else np.zeros(0, dtype=np.int32)
+        return tokens, offsets
+    
+    def _content(self, doc_id: str) -> str:
+        """Get a chunk's text, reading it from the snapshot if not in memory"""
+        record = self._documents[doc_id]
+        if record.content is None:
+            return self._snapshot.content[record.row]
+        return record.content
+    
+    def _content_bytes(self, doc_id: str) -> int:
+        """Get the UTF-8 size of a chunk's text without reading it from the snapshot"""
+        record = self._documents[doc_id]
+        if record.content is None:
+            return self._snapshot.content.byte_length(record.row)
+        return len(record.content.encode("utf-8"))
+    
+    def _replay(self, records: List[Dict[str, Any]]):
+        """Apply operation log records without logging them again"""
+        batch = []
+        for record in records:
+            op = record.get("op")
+            if op == "add":
+                batch.append((record["id"], record["content"], record["metadata"]))
+                continue
+            
+            if batch:
+                self._apply_add(batch)
+                batch = []
+            if op == "delete":
+                self._apply_delete(record["ids"])
+            elif op == "update":
+                self._apply_update(record["source"], record["metadata"])
+            else:
+                logger.warning(f"Skipping unknown operation log record: {op}")
+        
+        if batch:
+            self._apply_add(batch)
+    
+    def _apply_add(
+        self,
+        entries: List[Tuple[str, str, Dict[str, Any]]],
+        vectors: Optional[np.ndarray] = None,
+    ):
+        """
+        Insert or replace (id, content, metadata) chunks in memory and in the indexes.
+        
+        Args:
+            entries: Chunks to add
+            vectors: Embeddings of the chunk texts from _embed_entries, computed
+                here if the dense index exists and they are not given
+        """
+        self._version += 1
+        for doc_id, content, metadata in entries:
+            if doc_id in self._documents:
+                self._index.remove(doc_id)
+                self._unindex_metadata(doc_id)
+                self._registry.release(self._documents[doc_id].document)
+            record = self._registry.make_chunk(metadata, content=content)
+            self._documents[doc_id] = record
+            self._index.add(doc_id, content)
+            self._index_metadata(doc_id, record)
+        
+        if self._dense is not None:
+            if vectors is None:
+                vectors = self._embed_entries(entries)
+            self._dense.add([doc_id for doc_id, _, _ in entries], vectors)
+    
+    def _embed_entries(self, entries: List[Tuple[str, str, Dict[str, Any]]]) -> np.ndarray:
+        """Embed the texts of (id, content, metadata) chunks, a batch at a time"""
+        return np.concatenate([
+            self._embed_documents([content for _, content, _ in entries[start:start + EMBEDDING_BATCH_SIZE]])
+            for start in range(0, len(entries), EMBEDDING_BATCH_SIZE)
+        ])
+    
+    def _apply_delete(self, doc_ids: List[str]):
+        """Remove chunks from memory and from the indexes"""
+        self._version += 1
+        for doc_id in doc_ids:
+            if doc_id not in self._documents:
+                continue
+            self._index.remove(doc_id)
+            self._unindex_metadata(doc_id)
+            self._registry.release(self._documents.pop(doc_id).document)
+            if self._dense is not None:
+                self._dense.remove(doc_id)
+    
+    def _apply_update(self, source_name: str, fields: Dict[str, Any]):
+        """Set document-level metadata fields on every chunk of a source"""
+        self._version += 1
+        chunk_ids = list(self._metadata_index["source"].get(source_name, ()))
+        for doc_id in chunk_ids:
+            self._unindex_metadata(doc_id)
+        for doc_id in chunk_ids:
+            record = self._documents[doc_id]
+            previous = record.document
+            record.document = self._registry.acquire({**previous.metadata, **fields})
+            self._registry.release(previous)
+        for doc_id in chunk_ids:
+            self._index_metadata(doc_id, self._documents[doc_id])
+    
+    def _log_operations(self, records: List[Dict[str, Any]]):
+        """Append mutations to the operation log and schedule a background checkpoint"""
+        try:
+            self._log.append(records)
+        except Exception as e:
+            logger.error(f"Failed to append to vector store operation log: {e}")
+            return
+        
+        if self._log_tail is not None:
+            self._log_tail.extend(records)
+        self._persistence.notify(len(records))
+    
+    def checkpoint(self) -> bool:
+        """
+        Write a checkpoint snapshot now, in the calling thread.
+        
+        Returns:
+            True if the snapshot was written
+        """
+        return self._persistence.flush()
+    
+    def flush_and_stop(self):
+        """Stop the background persistence worker after a final checkpoint"""
+        self._persistence.stop(flush=True)
     
-    def _save_store(self):
-        """Persist documents to disk"""
+    def get_persistence_stats(self) -> Dict[str, Any]:
+        """Get pending operations, flush lag and checkpoint counters."""
+        return self._persistence.stats()
+    
+    def _write_checkpoint(self):
+        """
+        Write a binary snapshot atomically and reset the operation log.
+        
+        The store is locked only while its state is captured and while the
+        new snapshot's indexes are swapped in; the snapshot files are written
+        and its indexes built unlocked. Mutations logged in between are
+        replayed onto the new snapshot and kept in the log.
+        """
+        from app.services.llm_provider import get_embedding_info
+        with self._lock:
+            arrays = self._index.export_arrays()
+            chunk_ids = arrays["chunk_ids"]
+            records = [self._documents[doc_id] for doc_id in chunk_ids]
+            snapshot = self._snapshot
+            embeddings = self._dense.vectors(chunk_ids) if self._dense is not None else None
+            training = self._dense.training_state() if self._dense is not None else None
+            # The dense index always holds embeddings of the configured model
+            embedding_model = get_embedding_info() if self._dense is not None else None
+            self._log_tail = []
+        
+        try:
+            write_snapshot(
+                self.persist_directory,
+                chunk_ids,
+                records,
+                (
+                    record.content if record.content is not None else snapshot.content[record.row]
+                    for record in records
+                ),
+                arrays,
+                embeddings,
+                embedding_model,
+            )
+        except BaseException:
+            with self._lock:
+                self._log_tail = None
+            raise
+        
+        # Serve from the new snapshot so in-memory chunk texts are released.
+        # Its indexes are built unlocked, keeping the dense index's trained
+        # centroids or quantizer, and swapped in under the lock.
         try:
-            with open(self._store_path, 'w') as f:
-                json.dump(self._documents, f)
-        except Exception:
-            pass
+            state = self._snapshot_state(open_snapshot(self.persist_directory), training=training)
+        except BaseException:
+            with self._lock:
+                self._log_tail = None
+            raise
+        
+        with self._lock:
+            tail, self._log_tail = self._log_tail, None
+            self._log.rewrite(tail)
+            dense = self._dense
+            self._install_snapshot_state(state)
+            if embeddings is None and dense is not None:
+                # A dense query built the index after the state was captured;
+                # it already covers the snapshot's chunks, so keep it
+                self._dense = dense
+            self._replay(tail)
+    
+    def _rebuild_index(self):
+        """Rebuild the inverted and metadata indexes from the loaded documents"""
+        self._index.clear()
+        for doc_id, record in self._documents.items():
+            self._index.add(doc_id, record.content)
+        self._rebuild_metadata_index()
+        
+        # Dense index is rebuilt lazily on the next dense query
+        self._dense = None
+    
+    def _rebuild_metadata_index(self):
+        """Rebuild the secondary metadata indexes and document aggregates"""
+        self._metadata_index = {field: {} for field in INDEXED_METADATA_FIELDS}
+        self._document_stats = {}
+        self._sorted_sources = None
+        for doc_id, record in self._documents.items():
+            self._index_metadata(doc_id, record)
+    
+    def _index_metadata(self, doc_id: str, record: ChunkRecord):
+        """Add a chunk to the secondary metadata indexes and document aggregates"""
+        if self._add_metadata(
+            self._metadata_index, self._document_stats, doc_id, record, self._content_bytes(doc_id)
+        ):
+            self._sorted_sources = None
+    
+    @staticmethod
+    def _add_metadata(
+        metadata_index: Dict[str, Dict[Any, set]],
+        document_stats: Dict[str, Dict[str, Any]],
+        doc_id: str,
+        record: ChunkRecord,
+        content_bytes: int,
+    ) -> bool:
+        """
+        Add a chunk to metadata indexes and document aggregates.
+        
+        Returns:
+            True if the chunk is the first of its source
+        """
+        for field in INDEXED_METADATA_FIELDS:
+            value = record.get(field)
+            if isinstance(value, (str, int, float, bool)):
+                metadata_index[field].setdefault(value, set()).add(doc_id)
+        
+        source = record.get("source")
+        if not source:
+            return False
+        stats = document_stats.get(source)
+        created = stats is None
+        if created:
+            stats = document_stats[source] = {
+                "id": record.get("id", ""),
+                "name": source,
+                "chunk_count": 0,
+                "upload_date": record.get("upload_date", ""),
+                "file_size": record.get("size"),
+                "content_bytes": 0,
+                "content_hash": record.get("content_hash"),
+            }
+        stats["chunk_count"] += 1
+        stats["content_bytes"] += content_bytes
+        return created
+    
+    def _unindex_metadata(self, doc_id: str):
+        """Remove a chunk from the secondary metadata indexes and document aggregates"""
+        record = self._documents[doc_id]
+        for field in INDEXED_METADATA_FIELDS:
+            value = record.get(field)
+            if not isinstance(value, (str, int, float, bool)):
+                continue
+            chunk_ids = self._metadata_index[field].get(value)
+            if chunk_ids is None:
+                continue
+            chunk_ids.discard(doc_id)
+            if not chunk_ids:
+                del self._metadata_index[field][value]
+        
+        source = record.get("source")
+        stats = self._document_stats.get(source)
+        if stats is None:
+            return
+        stats["chunk_count"] -= 1
+        stats["content_bytes"] -= self._content_bytes(doc_id)
+        if stats["chunk_count"] <= 0:
+            del self._document_stats[source]
+            self._sorted_sources = None
+    
+    def _embed_documents(self, texts: List[str]) -> np.ndarray:
+        """Embed chunk texts into a float32 matrix"""
+        if self._embeddings is None:
+            from app.services.llm_provider import get_embeddings
+            self._embeddings = get_embeddings()
+        
+        if hasattr(self._embeddings, "embed_array"):
+            return self._embeddings.embed_array(texts)
+        return np.asarray(self._embeddings.embed_documents(texts), dtype=np.float32)
+    
+    def _embed_query(self, text: str) -> np.ndarray:
+        """Embed a query string"""
+        if self._embeddings is None:
+            from app.services.llm_provider import get_embeddings
+            self._embeddings = get_embeddings()
+        return np.asarray(self._embeddings.embed_query(text), dtype=np.float32)
+    
+    def _embed_queries(self, texts: List[str]) -> np.ndarray:
+        """Embed several query strings into a float32 matrix"""
+        if self._embeddings is None:
+            from app.services.llm_provider import get_embeddings
+            self._embeddings = get_embeddings()
+        
+        # Local embeddings treat queries and documents alike and batch natively
+        if hasattr(self._embeddings, "embed_array"):
+            return self._embeddings.embed_array(texts)
+        return np.asarray([self._embeddings.embed_query(text) for text in texts], dtype=np.float32)
+    
+    @staticmethod
+    def _dense_index_type() -> Tuple[type, Dict[str, Any]]:
+        """Dense index class and constructor options selected by DENSE_INDEX"""
+        kind = settings.DENSE_INDEX.lower()
+        if kind == "exact":
+            return DenseIndex, {}
+        if kind == "ivf":
+            return IVFDenseIndex, {
+                "nlist": settings.IVF_NLIST,
+                "nprobe": settings.IVF_NPROBE,
+                "min_train": settings.IVF_MIN_CHUNKS,
+            }
+        if kind == "int8":
+            return QuantizedDenseIndex, {
+                "rescore_factor": settings.QUANTIZED_RESCORE_FACTOR,
+                "spill_dir": str(settings.chroma_dir),
+            }
+        raise ValueError(
+            f"Unknown dense index: {settings.DENSE_INDEX}. "
+            "Supported indexes: 'exact', 'ivf', 'int8'"
+        )
+    
+    def _get_dense_index(self) -> DenseIndex:
+        """Get the dense index, embedding the whole store on first use"""
+        if self._dense is None:
+            doc_ids = list(self._documents)
+            dense_class, dense_options = self._dense_index_type()
+            dense = dense_class(
+                len(self._embed_query("")),
+                initial_capacity=max(1024, len(doc_ids)),
+                **dense_options,
+            )
+            for start in range(0, len(doc_ids), EMBEDDING_BATCH_SIZE):
+                batch = doc_ids[start:start + EMBEDDING_BATCH_SIZE]
+                dense.add(batch, self._embed_documents(
+                    [self._content(doc_id) for doc_id in batch]
+                ))
+            self._dense = dense
+        return self._dense
     
     def _generate_id(self, content: str, index: int) -> str:
         """Generate a unique ID for a document chunk"""
@@ -82,14 +692,23 @@ class VectorStoreService:
                 for i, doc in enumerate(documents)
             ]
         
+        entries = []
         for i, doc in enumerate(documents):
             doc_id = ids[i] if i < len(ids) else self._generate_id(doc.page_content, i)
-            self._documents[doc_id] = {
-                "content": doc.page_content,
-                "metadata": doc.metadata
-            }
+            entries.append((doc_id, doc.page_content, doc.metadata))
+        
+        # Embedding is the slow part of an add, so it runs before the lock is
+        # taken; if the dense index is created meanwhile, _apply_add embeds
+        vectors = self._embed_entries(entries) if self._dense is not None else None
         
-        self._save_store()
+        with self._lock:
+            self._apply_add(entries, vectors)
+            self._log_operations([
+                {"op": "add", "id": doc_id, "content": content, "metadata": metadata}
+                for doc_id, content, metadata in entries
+            ])
+            for listener in self._listeners:
+                listener.chunks_added(entries)
         return ids
     
     def query(
@@ -97,98 +716,476 @@ class VectorStoreService:
         query_text: str,
         n_results: int = 5,
         filter_dict: Optional[Dict[str, Any]] = None,
+        mode: Optional[str] = None,
     ) -> List[Dict[str, Any]]:
         """
-        Query using simple keyword matching.
+        Query the store with the configured ranking mode.
+        
+        Lexical modes only score chunks sharing a term with the query;
+        dense mode ranks every chunk by embedding cosine similarity. Hybrid
+        mode fuses the BM25 and dense candidate lists with reciprocal-rank
+        fusion and picks diverse results from them with MMR.
+        
+        Args:
+            query_text: Query string
+            n_results: Number of results to return
+            filter_dict: Optional exact-match metadata filter
+            mode: Ranking mode ('keyword', 'bm25', 'dense' or 'hybrid'),
+                defaults to RETRIEVAL_MODE
         """
+        mode = self._resolve_mode(mode)
+        key = cache_key(query_text, n_results, filter_dict, mode)
+        version = self._version
+        results = self._cache.get(key, version)
+        if results is None:
+            with self._lock:
+                results = self._run_query(query_text, n_results, filter_dict, mode)
+            self._cache.put(key, version, results)
+        return results
+    
+    def _run_query(
+        self,
+        query_text: str,
+        n_results: int,
+        filter_dict: Optional[Dict[str, Any]],
+        mode: str,
+    ) -> List[Dict[str, Any]]:
+        """Rank chunks for one query, bypassing the cache"""
         if not self._documents:
             return []
         
-        query_lower = query_text.lower()
-        query_words = set(query_lower.split())
+        allowed_ids = self._matching_ids(filter_dict) if filter_dict else None
+        if allowed_ids is not None and not allowed_ids:
+            return []
         
-        # Score documents based on keyword overlap
-        scored_docs = []
-        for doc_id, doc_data in self._documents.items():
-            content = doc_data["content"]
-            metadata = doc_data["metadata"]
-            
-            # Apply filter if provided
-            if filter_dict:
-                skip = False
-                for key, value in filter_dict.items():
-                    if metadata.get(key) != value:
-                        skip = True
-                        break
-                if skip:
-                    continue
-            
-            # Simple keyword matching score
-            content_lower = content.lower()
-            content_words = set(content_lower.split())
-            
-            # Count matching words
-            matches = len(query_words & content_words)
-            
-            # Check for phrase match
-            if query_lower in content_lower:
-                matches += 10
+        if mode == "keyword":
+            scores = self._keyword_scores(query_text)
+        elif mode == "bm25":
+            scores = dict(self._index.bm25_top_k(
+                set(self._index.tokenize(query_text)),
+                n_results,
+                k1=settings.BM25_K1,
+                b=settings.BM25_B,
+                mask=self._index.slot_mask(allowed_ids) if allowed_ids is not None else None,
+            ))
+        elif mode == "dense":
+            scores = dict(self._get_dense_index().search(
+                self._embed_query(query_text), n_results, allowed_ids
+            ))
+        else:
+            candidates = settings.HYBRID_CANDIDATES
+            lexical = self._index.bm25_top_k(
+                set(self._index.tokenize(query_text)),
+                candidates,
+                k1=settings.BM25_K1,
+                b=settings.BM25_B,
+                mask=self._index.slot_mask(allowed_ids) if allowed_ids is not None else None,
+            )
+            dense = self._get_dense_index().search(
+                self._embed_query(query_text), candidates, allowed_ids
+            )
+            return self._hybrid_results(lexical, dense, n_results)
+        
+        return self._top_results(scores, n_results, allowed_ids)
+    
+    def query_many(
+        self,
+        queries: List[str],
+        n_results: int = 5,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        mode: Optional[str] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Run several queries in one batched pass.
+        
+        All queries are tokenized together and each distinct term's posting
+        list is scored once for the whole batch; dense mode embeds the batch
+        at once and scores it with matrix products. Results match calling
+        query() for each query, up to floating-point rounding of dense scores.
+        
+        Args:
+            queries: Query strings
+            n_results: Number of results per query
+            filter_dict: Optional exact-match metadata filter applied to every query
+            mode: Ranking mode, defaults to RETRIEVAL_MODE
             
-            if matches > 0:
-                scored_docs.append({
-                    "content": content,
-                    "metadata": metadata,
-                    "similarity_score": matches / max(len(query_words), 1),
-                })
+        Returns:
+            One result list per query, in the same format as query()
+        """
+        mode = self._resolve_mode(mode)
+        version = self._version
+        keys = [cache_key(query_text, n_results, filter_dict, mode) for query_text in queries]
+        results = [self._cache.get(key, version) for key in keys]
+        
+        missing = [i for i, cached in enumerate(results) if cached is None]
+        if missing:
+            with self._lock:
+                computed = self._run_query_many(
+                    [queries[i] for i in missing], n_results, filter_dict, mode
+                )
+            for i, query_results in zip(missing, computed):
+                results[i] = query_results
+                self._cache.put(keys[i], version, query_results)
+        return results
+    
+    def _run_query_many(
+        self,
+        queries: List[str],
+        n_results: int,
+        filter_dict: Optional[Dict[str, Any]],
+        mode: str,
+    ) -> List[List[Dict[str, Any]]]:
+        """Rank chunks for several queries in one batched pass, bypassing the cache"""
+        if not queries:
+            return []
+        if not self._documents:
+            return [[] for _ in queries]
+        
+        allowed_ids = self._matching_ids(filter_dict) if filter_dict else None
+        if allowed_ids is not None and not allowed_ids:
+            return [[] for _ in queries]
+        
+        term_lists = [set(self._index.tokenize(query_text)) for query_text in queries]
+        if mode == "keyword":
+            return [
+                self._top_results(self._keyword_scores(query_text, counts), n_results, allowed_ids)
+                for query_text, counts in zip(queries, self._index.match_counts_many(term_lists))
+            ]
+        
+        # Hybrid mode ranks a wider candidate pool before fusing
+        depth = settings.HYBRID_CANDIDATES if mode == "hybrid" else n_results
+        lexical = dense = None
+        if mode in ("bm25", "hybrid"):
+            lexical = self._index.bm25_top_k_many(
+                term_lists,
+                depth,
+                k1=settings.BM25_K1,
+                b=settings.BM25_B,
+                mask=self._index.slot_mask(allowed_ids) if allowed_ids is not None else None,
+            )
+        if mode in ("dense", "hybrid"):
+            dense = self._get_dense_index().search_many(
+                self._embed_queries(queries), depth, allowed_ids
+            )
+        
+        if mode == "hybrid":
+            return [
+                self._hybrid_results(lexical_ranking, dense_ranking, n_results)
+                for lexical_ranking, dense_ranking in zip(lexical, dense)
+            ]
+        rankings = lexical if mode == "bm25" else dense
+        return [self._top_results(dict(ranking), n_results, allowed_ids) for ranking in rankings]
+    
+    @staticmethod
+    def _resolve_mode(mode: Optional[str]) -> str:
+        """Normalize a ranking mode, defaulting to RETRIEVAL_MODE"""
+        mode = (mode or settings.RETRIEVAL_MODE).lower()
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(
+                f"Unknown retrieval mode: {mode}. "
+                f"Supported modes: {', '.join(repr(m) for m in RETRIEVAL_MODES)}"
+            )
+        return mode
+    
+    def _top_results(
+        self,
+        scores: Dict[str, float],
+        n_results: int,
+        allowed_ids: Optional[set] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Format the n best positively scored chunks as result dicts.
+        
+        The n best are selected with a bounded heap, and only the winners'
+        texts and metadata are read. Ties keep the order of ``scores``.
+        """
+        scored = (
+            (doc_id, score) for doc_id, score in scores.items()
+            if score > 0 and (allowed_ids is None or doc_id in allowed_ids)
+        )
+        return [
+            {
+                "content": self._content(doc_id),
+                "metadata": self._documents[doc_id].metadata,
+                "similarity_score": score,
+            }
+            for doc_id, score in heapq.nlargest(n_results, scored, key=lambda item: item[1])
+        ]
+    
+    def _hybrid_results(
+        self,
+        lexical: List[Tuple[str, float]],
+        dense: List[Tuple[str, float]],
+        n_results: int,
+    ) -> List[Dict[str, Any]]:
+        """
+        Fuse lexical and dense rankings and diversify the fused candidates.
+        
+        Candidates are ranked by reciprocal-rank fusion, then picked with
+        maximal marginal relevance over their embeddings so near-duplicate
+        chunks (e.g. neighbours sharing chunk overlap) do not fill every
+        slot. Results are returned in pick order, scored by their RRF score.
+        """
+        fused = reciprocal_rank_fusion([lexical, dense], k=settings.RRF_K)
+        fused = fused[:settings.HYBRID_CANDIDATES]
+        if not fused:
+            return []
+        
+        doc_ids = [doc_id for doc_id, _ in fused]
+        relevance = np.array([score for _, score in fused], dtype=np.float64)
+        picked = maximal_marginal_relevance(
+            relevance / relevance.max(),
+            self._get_dense_index().vectors(doc_ids),
+            n_results,
+            lambda_mult=settings.MMR_LAMBDA,
+        )
+        return [
+            {
+                "content": self._content(doc_ids[i]),
+                "metadata": self._documents[doc_ids[i]].metadata,
+                "similarity_score": fused[i][1],
+            }
+            for i in picked
+        ]
+    
+    @staticmethod
+    def _matches_filter(record: ChunkRecord, filter_dict: Dict[str, Any]) -> bool:
+        """Check a chunk's metadata against an exact-match filter"""
+        return all(record.get(key) == value for key, value in filter_dict.items())
+    
+    def _matching_ids(self, filter_dict: Dict[str, Any]) -> set:
+        """
+        Get IDs of all chunks whose metadata matches the filter.
+        
+        Indexed fields are resolved by intersecting their ID sets, smallest
+        first; any remaining fields are checked on the surviving chunks only.
+        """
+        indexed = [key for key in filter_dict if key in INDEXED_METADATA_FIELDS]
+        if not indexed:
+            return {
+                doc_id
+                for doc_id, record in self._documents.items()
+                if self._matches_filter(record, filter_dict)
+            }
+        
+        candidate_sets = sorted(
+            (self._metadata_index[key].get(filter_dict[key], set()) for key in indexed),
+            key=len,
+        )
+        matches = set(candidate_sets[0])
+        for candidates in candidate_sets[1:]:
+            matches &= candidates
+        
+        remaining = {key: value for key, value in filter_dict.items() if key not in indexed}
+        if remaining:
+            matches = {
+                doc_id for doc_id in matches
+                if self._matches_filter(self._documents[doc_id], remaining)
+            }
+        return matches
+    
+    def _keyword_scores(
+        self,
+        query_text: str,
+        counts: Optional[Dict[str, int]] = None,
+    ) -> Dict[str, float]:
+        """
+        Score chunks by query term overlap plus phrase and proximity bonuses.
+        
+        Chunks containing the query as an exact phrase get PHRASE_BOOST;
+        chunks with several query terms close together get up to
+        PROXIMITY_BOOST, scaled by how many distinct query terms fit in one
+        PROXIMITY_WINDOW-token window. Both come from the positional index,
+        so no chunk text is read.
+        
+        Args:
+            query_text: Query string
+            counts: Precomputed match counts (from match_counts_many)
+        """
+        query_terms = self._index.tokenize(query_text)
+        query_words = set(query_terms)
+        if counts is None:
+            counts = self._index.match_counts(query_words)
+        
+        phrase_matches = set()
+        if settings.PHRASE_BOOST:
+            phrase_matches = self._index.phrase_matches(query_terms)
+        
+        proximity = {}
+        if settings.PROXIMITY_BOOST and len(query_words) > 1:
+            proximity = self._index.proximity_counts(
+                query_words,
+                [doc_id for doc_id, matches in counts.items() if matches > 1],
+                settings.PROXIMITY_WINDOW,
+            )
+        
+        scores = {}
+        for doc_id, matches in counts.items():
+            score = float(matches)
+            if doc_id in phrase_matches:
+                score += settings.PHRASE_BOOST
+            if doc_id in proximity:
+                score += settings.PROXIMITY_BOOST * (proximity[doc_id] - 1) / (len(query_words) - 1)
+            scores[doc_id] = score / max(len(query_words), 1)
         
-        # Sort by score and return top n
-        scored_docs.sort(key=lambda x: x["similarity_score"], reverse=True)
-        return scored_docs[:n_results]
+        return scores
     
     def delete_document(self, source_name: str) -> int:
         """Delete all chunks of a document by source name."""
-        to_delete = []
-        for doc_id, doc_data in self._documents.items():
-            if doc_data["metadata"].get("source") == source_name:
-                to_delete.append(doc_id)
+        with self._lock:
+            to_delete = list(self._metadata_index["source"].get(source_name, ()))
+            
+            self._apply_delete(to_delete)
+            if to_delete:
+                self._log_operations([{"op": "delete", "ids": to_delete}])
+                for listener in self._listeners:
+                    listener.chunks_deleted(to_delete)
+        return len(to_delete)
+    
+    def delete_chunks(self, chunk_ids: List[str]) -> int:
+        """Delete chunks by ID; unknown IDs are ignored."""
+        with self._lock:
+            to_delete = [chunk_id for chunk_id in chunk_ids if chunk_id in self._documents]
+            
+            self._apply_delete(to_delete)
+            if to_delete:
+                self._log_operations([{"op": "delete", "ids": to_delete}])
+                for listener in self._listeners:
+                    listener.chunks_deleted(to_delete)
+        return len(to_delete)
+    
+    def update_document(self, source_name: str, fields: Dict[str, Any]) -> int:
+        """
+        Set document-level metadata fields on every chunk of a document.
         
-        for doc_id in to_delete:
-            del self._documents[doc_id]
+        Used after a re-index so that the size, upload date and content
+        hash of the new file version apply to kept chunks as well.
         
-        self._save_store()
-        return len(to_delete)
+        Args:
+            source_name: Document source filename
+            fields: Document-level metadata fields to set
+        
+        Returns:
+            Number of chunks updated
+        """
+        with self._lock:
+            count = len(self._metadata_index["source"].get(source_name, ()))
+            if count:
+                self._apply_update(source_name, fields)
+                self._log_operations([{"op": "update", "source": source_name, "metadata": fields}])
+        return count
     
-    def get_collection_stats(self) -> Dict[str, Any]:
-        """Get statistics about the document store."""
-        sources = set()
-        for doc_data in self._documents.values():
-            source = doc_data["metadata"].get("source")
-            if source:
-                sources.add(source)
+    def add_listener(self, listener):
+        """
+        Register a listener for chunk adds and deletes.
+        
+        The listener's chunks_added(entries) is called with the (chunk ID,
+        text, metadata) of added chunks and chunks_deleted(chunk_ids) with
+        the IDs of deleted chunks, while the store lock is held, so it must
+        not block or call back into the store. Replayed log records are not
+        reported.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+    
+    def remove_listener(self, listener):
+        """Unregister a listener added with add_listener"""
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+    
+    def iter_chunks(self) -> Iterator[Tuple[str, Optional[str], str, Optional[str], str]]:
+        """Yield (chunk ID, source, text, duplicate_of, chunk hash) for every stored chunk."""
+        with self._lock:
+            chunk_ids = list(self._documents)
+        for chunk_id in chunk_ids:
+            with self._lock:
+                record = self._documents.get(chunk_id)
+                if record is None:
+                    continue
+                content = self._content(chunk_id)
+                item = (
+                    chunk_id,
+                    record.get("source"),
+                    content,
+                    record.get("duplicate_of"),
+                    record.get("chunk_hash") or chunk_hash(content),
+                )
+            yield item
+    
+    def get_chunk_hashes(self, source_name: str) -> Dict[str, str]:
+        """
+        Get the content fingerprint of every chunk of a document.
+        
+        Chunks stored without a "chunk_hash" field are hashed from their text.
+        
+        Args:
+            source_name: Document source filename
+        
+        Returns:
+            Mapping of chunk ID to chunk hash
+        """
+        with self._lock:
+            return {
+                chunk_id: self._documents[chunk_id].get("chunk_hash") or chunk_hash(self._content(chunk_id))
+                for chunk_id in self._metadata_index["source"].get(source_name, ())
+            }
+    
+    def find_document(self, doc_id_or_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a document by its ID or source name.
+        
+        Args:
+            doc_id_or_name: Document ID or source filename
+        
+        Returns:
+            Document info dict (as in get_all_documents), or None if not found
+        """
+        with self._lock:
+            chunk_ids = self._metadata_index["id"].get(doc_id_or_name)
+            if chunk_ids:
+                source = self._documents[next(iter(chunk_ids))].get("source")
+            else:
+                source = doc_id_or_name
+            
+            return self._document_info(source)
+    
+    def _document_info(self, source: str) -> Optional[Dict[str, Any]]:
+        """Format the aggregates of one source as a document info dict (lock held)"""
+        stats = self._document_stats.get(source)
+        if stats is None:
+            return None
         
         return {
-            "total_chunks": len(self._documents),
-            "total_documents": len(sources),
-            "sources": sorted(list(sources)),
+            "id": stats["id"],
+            "name": stats["name"],
+            "chunk_count": stats["chunk_count"],
+            "upload_date": stats["upload_date"],
+            # Documents ingested before sizes were recorded fall back to their text size
+            "size": stats["file_size"] or stats["content_bytes"],
+            "content_hash": stats["content_hash"],
         }
     
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get the store version and retrieval cache counters."""
+        return {"store_version": self._version, **self._cache.stats()}
+    
+    def get_collection_stats(self) -> Dict[str, Any]:
+        """Get statistics about the document store."""
+        with self._lock:
+            if self._sorted_sources is None:
+                self._sorted_sources = sorted(self._document_stats)
+            
+            return {
+                "total_chunks": len(self._documents),
+                "total_documents": len(self._document_stats),
+                "sources": list(self._sorted_sources),
+            }
+    
     def get_all_documents(self) -> List[Dict[str, Any]]:
         """Get information about all documents in the store."""
-        documents = {}
-        for doc_data in self._documents.values():
-            source = doc_data["metadata"].get("source")
-            if source and source not in documents:
-                documents[source] = {
-                    "id": doc_data["metadata"].get("id", ""),
-                    "name": source,
-                    "chunk_count": 0,
-                    "upload_date": doc_data["metadata"].get("upload_date", ""),
-                    "size": 0,
-                }
-            if source:
-                documents[source]["chunk_count"] += 1
-        
-        return list(documents.values())
+        with self._lock:
+            return [self._document_info(source) for source in self._document_stats]
     
     def is_empty(self) -> bool:
         """Check if the store is empty"""
@@ -206,3 +1203,30 @@ class VectorStoreService:
                 for r in results
             ]
         return retrieve
+
+
+def get_vector_store() -> Union[VectorStoreService, "SQLiteVectorStore"]:
+    """
+    Get the document store selected by the VECTOR_STORE_BACKEND setting.
+    
+    Returns:
+        The in-memory VectorStoreService ('memory') or the FTS5-backed
+        SQLiteVectorStore ('sqlite'); both expose the same query API
+    
+    Raises:
+        ValueError: If the backend is unknown
+    """
+    backend = settings.VECTOR_STORE_BACKEND.lower()
+    
+    if backend == "memory":
+        return VectorStoreService()
+    
+    elif backend == "sqlite":
+        from app.services.sqlite_store import SQLiteVectorStore
+        return SQLiteVectorStore()
+    
+    else:
+        raise ValueError(
+            f"Unknown vector store backend: {backend}. "
+            "Supported backends: 'memory', 'sqlite'"
+        )
@@ -0,0 +1,5 @@
+"""
+Retrieval and ingestion benchmarks
+
+Run from the backend directory, e.g. ``python -m benchmarks.bench_ranking``.
+"""
@@ -0,0 +1,84 @@
+"""
+ANN benchmark: IVF index recall@k and latency vs exact dense search
+
+Uses a synthetic clustered embedding corpus (topics plus noise) so the
+corpus size can reach the scale the IVF index targets. The last 10% of the
+corpus is inserted after training to exercise incremental assignment.
+    
+    python -m benchmarks.bench_ann [--chunks 100000] [--dim 384] [--k 10]
+"""
+import argparse
+import time
+
+import numpy as np
+
+import benchmarks.common  # noqa: F401  (keeps stores out of the data directory)
+from benchmarks.common import percentile
+from app.services.dense_index import DenseIndex
+from app.services.ivf_index import IVFDenseIndex
+
+
+def synthetic_embeddings(n: int, dim: int, topics: int, rng: np.random.Generator) -> np.ndarray:
+    """Normalized vectors scattered around random topic directions"""
+    centers = rng.standard_normal((topics, dim)).astype(np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    vectors = centers[rng.integers(0, topics, n)]
+    vectors += 0.03 * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=100000, help="Corpus size")
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimensions")
+    parser.add_argument("--k", type=int, default=10, help="Results per query")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries")
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(42)
+    vectors = synthetic_embeddings(args.chunks, args.dim, max(1, args.chunks // 50), rng)
+    chunk_ids = [f"chunk-{i}" for i in range(args.chunks)]
+    queries = vectors[rng.integers(0, args.chunks, args.queries)]
+    queries = queries + 0.02 * rng.standard_normal(queries.shape).astype(np.float32)
+    
+    exact = DenseIndex(args.dim, initial_capacity=args.chunks)
+    exact.add(chunk_ids, vectors)
+    
+    initial = int(args.chunks * 0.9)
+    ivf = IVFDenseIndex(args.dim, initial_capacity=args.chunks, min_train=0)
+    ivf.add(chunk_ids[:initial], vectors[:initial])
+    start = time.perf_counter()
+    ivf.train()
+    train_s = time.perf_counter() - start
+    start = time.perf_counter()
+    ivf.add(chunk_ids[initial:], vectors[initial:])
+    insert_ms = (time.perf_counter() - start) * 1000
+    
+    truth = []
+    exact_latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        truth.append({chunk_id for chunk_id, _ in exact.search(query, args.k)})
+        exact_latencies.append((time.perf_counter() - start) * 1000)
+    
+    print(f"{args.chunks} chunks x {args.dim} dims, {len(ivf._centroids)} clusters")
+    print(f"train {train_s:.1f}s on {initial} chunks, incremental insert of {args.chunks - initial}: {insert_ms:.0f} ms")
+    print(f"{'index':<14}{'recall@' + str(args.k):>10}{'p50 ms':>9}{'p95 ms':>9}")
+    print(f"{'exact':<14}{1.0:>10.3f}{percentile(exact_latencies, 50):>9.2f}{percentile(exact_latencies, 95):>9.2f}")
+    
+    for nprobe in (1, 2, 4, 8, 16, 32, 64):
+        ivf.nprobe = nprobe
+        hits = 0
+        latencies = []
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            found = ivf.search(query, args.k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += len(expected & {chunk_id for chunk_id, _ in found})
+        recall = hits / (args.k * len(queries))
+        name = f"ivf nprobe={nprobe}"
+        print(f"{name:<14}{recall:>10.3f}{percentile(latencies, 50):>9.2f}{percentile(latencies, 95):>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Batch query benchmark: query() in a loop vs query_many()
+    
+    python -m benchmarks.bench_batch [--copies 100] [--queries 300]
+"""
+import argparse
+import time
+
+from benchmarks.common import LABELLED_QUERIES, fresh_store, load_sample_chunks, replicate_chunks
+from app.config import settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--copies", type=int, default=100, help="Sample corpus copies")
+    parser.add_argument("--queries", type=int, default=300, help="Queries per batch")
+    args = parser.parse_args()
+    
+    settings.STORE_CHECKPOINT_INTERVAL = 10 ** 9
+    store = fresh_store()
+    store.add_documents(replicate_chunks(load_sample_chunks(), args.copies))
+    questions = [question for question, _ in LABELLED_QUERIES]
+    queries = [questions[i % len(questions)] for i in range(args.queries)]
+    
+    print(f"{len(store._documents)} chunks, {len(queries)} queries")
+    print(f"{'mode':<10}{'loop ms':>10}{'batch ms':>10}{'speedup':>9}")
+    for mode in ["keyword", "bm25", "dense"]:
+        # Warm up lazy structures (dense index, posting arrays)
+        store.query_many(queries, mode=mode)
+        
+        start = time.perf_counter()
+        for query in queries:
+            store.query(query, n_results=5, mode=mode)
+        loop_ms = (time.perf_counter() - start) * 1000
+        
+        start = time.perf_counter()
+        store.query_many(queries, n_results=5, mode=mode)
+        batch_ms = (time.perf_counter() - start) * 1000
+        print(f"{mode:<10}{loop_ms:>10.1f}{batch_ms:>10.1f}{loop_ms / batch_ms:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
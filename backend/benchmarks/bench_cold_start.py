@@ -0,0 +1,63 @@
+"""
+Cold start benchmark: legacy simple_store.json vs memory-mapped snapshot
+
+Builds a store from copies of the sample documents, saves it in both
+formats and times opening each one, with peak Python heap usage.
+    
+    python -m benchmarks.bench_cold_start [--copies 500]
+"""
+import argparse
+import json
+import os
+import time
+import tracemalloc
+
+from benchmarks.common import fresh_store, load_sample_chunks, replicate_chunks
+from app.config import settings
+from app.services.vector_store import VectorStoreService
+
+
+def open_store(store_dir: str):
+    """Open the store in a directory and run one query; returns (ms, peak MB)"""
+    settings.CHROMA_PERSIST_DIR = store_dir
+    VectorStoreService._instance = None
+    VectorStoreService._initialized = False
+    
+    tracemalloc.start()
+    start = time.perf_counter()
+    store = VectorStoreService()
+    store.query("attendance policy", n_results=3, mode="bm25")
+    elapsed = (time.perf_counter() - start) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--copies", type=int, default=500, help="Sample corpus copies")
+    args = parser.parse_args()
+    
+    settings.STORE_CHECKPOINT_INTERVAL = 10 ** 9
+    chunks = replicate_chunks(load_sample_chunks(), args.copies)
+    store = fresh_store()
+    store.add_documents(chunks)
+    store.checkpoint()
+    snapshot_dir = store.persist_directory
+    
+    legacy_dir = fresh_store().persist_directory
+    with open(os.path.join(legacy_dir, "simple_store.json"), "w") as f:
+        json.dump({
+            doc_id: {"content": store._content(doc_id), "metadata": record.metadata}
+            for doc_id, record in store._documents.items()
+        }, f)
+    
+    print(f"{len(chunks)} chunks")
+    print(f"{'format':<10}{'open + first query ms':>24}{'peak heap MB':>14}")
+    for name, store_dir in [("json", legacy_dir), ("snapshot", snapshot_dir)]:
+        elapsed, peak = open_store(store_dir)
+        print(f"{name:<10}{elapsed:>24.1f}{peak:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Hybrid retrieval benchmark on the sample documents
+
+Compares recall@k and redundancy of the top 3 results (the slots the agent
+router fills) for each ranking mode, and for hybrid mode with and without
+MMR diversification.
+
+Redundancy is the mean pairwise word-set Jaccard similarity between the
+returned chunks; overlapping neighbour chunks push it up.
+    
+    python -m benchmarks.bench_hybrid
+"""
+import itertools
+from typing import Dict, List
+
+from benchmarks.common import (
+    LABELLED_QUERIES,
+    fresh_store,
+    load_sample_chunks,
+    percentile,
+    recall_at_k,
+    time_calls,
+)
+from app.config import settings
+
+
+def redundancy(results: List[Dict]) -> float:
+    """Mean pairwise Jaccard similarity of the results' word sets"""
+    word_sets = [set(result["content"].lower().split()) for result in results]
+    pairs = list(itertools.combinations(word_sets, 2))
+    if not pairs:
+        return 0.0
+    return sum(len(a & b) / len(a | b) for a, b in pairs) / len(pairs)
+
+
+def main():
+    store = fresh_store()
+    store.add_documents(load_sample_chunks())
+    configured_lambda = settings.MMR_LAMBDA
+    
+    variants = [
+        ("keyword", "keyword", None),
+        ("bm25", "bm25", None),
+        ("dense", "dense", None),
+        ("hybrid rrf", "hybrid", 1.0),
+        (f"hybrid mmr={configured_lambda}", "hybrid", configured_lambda),
+    ]
+    
+    print(f"{len(store._documents)} chunks, {len(LABELLED_QUERIES)} labelled queries")
+    print(f"{'mode':<18}{'R@1':>6}{'R@3':>6}{'R@5':>6}{'redund@3':>10}{'p50 ms':>8}")
+    for name, mode, mmr_lambda in variants:
+        if mmr_lambda is not None:
+            settings.MMR_LAMBDA = mmr_lambda
+        
+        def search(query, k):
+            return store.query(query, n_results=k, mode=mode)
+        
+        recalls = [recall_at_k(search, k) for k in (1, 3, 5)]
+        overlap = sum(
+            redundancy(search(question, 3)) for question, _ in LABELLED_QUERIES
+        ) / len(LABELLED_QUERIES)
+        latencies = time_calls(lambda: [search(q, 3) for q, _ in LABELLED_QUERIES], 5)
+        per_query = percentile(latencies, 50) / len(LABELLED_QUERIES)
+        print(
+            f"{name:<18}{recalls[0]:>6.2f}{recalls[1]:>6.2f}{recalls[2]:>6.2f}"
+            f"{overlap:>10.3f}{per_query:>8.2f}"
+        )
+    
+    settings.MMR_LAMBDA = configured_lambda
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Ingestion benchmark: sequential vs process-pool parsing and chunking
+
+Writes a corpus of text files and multi-page PDFs built from the sample
+documents, then ingests it into a fresh store with one worker and with
+--workers workers, reporting files/sec and MB/sec and checking that both
+runs produce the same chunks.
+    
+    python -m benchmarks.bench_ingest [--files 48] [--workers 0]
+"""
+import argparse
+import os
+import tempfile
+from pathlib import Path
+
+import fitz
+
+from benchmarks.common import SAMPLE_DOCS_DIR, fresh_store
+from app.services.ingestion import IngestionEngine
+
+
+def write_corpus(directory: Path, n_files: int):
+    """Alternate .txt copies and 40-page PDFs of the sample documents"""
+    texts = [path.read_text(encoding="utf-8") for path in sorted(SAMPLE_DOCS_DIR.iterdir())]
+    for i in range(n_files):
+        text = texts[i % len(texts)]
+        if i % 2 == 0:
+            (directory / f"doc_{i:04d}.txt").write_text(text * 40, encoding="utf-8")
+            continue
+        pdf = fitz.open()
+        for _ in range(40):
+            page = pdf.new_page()
+            page.insert_textbox(page.rect + (36, 36, -36, -36), text[:3000], fontsize=8)
+        pdf.save(str(directory / f"doc_{i:04d}.pdf"))
+        pdf.close()
+
+
+def run(directory: Path, workers: int):
+    """Ingest the corpus into an empty store; returns (report, chunk texts)"""
+    store = fresh_store()
+    report = IngestionEngine(workers=workers).ingest_directory(str(directory), store)
+    return report, sorted(record.content for record in store._documents.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=48, help="Files in the corpus")
+    parser.add_argument("--workers", type=int, default=0, help="Parallel workers (0 = CPU count)")
+    args = parser.parse_args()
+    
+    directory = Path(tempfile.mkdtemp(prefix="klu_bench_ingest_"))
+    write_corpus(directory, args.files)
+    size_mb = sum(path.stat().st_size for path in directory.iterdir()) / (1024 * 1024)
+    workers = args.workers or os.cpu_count() or 1
+    
+    print(f"{args.files} files, {size_mb:.1f} MB, {os.cpu_count()} CPUs")
+    print(f"{'workers':<10}{'seconds':>9}{'files/s':>9}{'MB/s':>8}{'chunks':>8}")
+    outputs = []
+    for n in [1, workers]:
+        report, chunks = run(directory, n)
+        outputs.append(chunks)
+        print(
+            f"{n:<10}{report['seconds']:>9.2f}{report['files_per_second']:>9.1f}"
+            f"{report['mb_per_second']:>8.2f}{report['chunks_added']:>8}"
+        )
+    print(f"identical chunks: {outputs[0] == outputs[-1]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Top-k BM25 benchmark: exhaustive scoring vs MaxScore pruning
+
+Builds an inverted index over a synthetic corpus with a Zipfian vocabulary
+plus very common campus terms ("klu", "university", ...), then times
+exhaustive BM25 (score every posting, sort) against bm25_top_k and checks
+that both return the same top k.
+    
+    python -m benchmarks.bench_maxscore [--chunks 100000] [--queries 200] [--k 5]
+"""
+import argparse
+import heapq
+
+import numpy as np
+
+from benchmarks.common import percentile, time_calls
+from app.services.inverted_index import InvertedIndex
+
+COMMON_TERMS = ["klu", "university", "student", "campus", "policy"]
+
+
+def synthetic_corpus(n_chunks: int, vocabulary: int, length: int, seed: int = 0):
+    """Chunks of Zipf-distributed terms, each also containing a few common terms"""
+    rng = np.random.default_rng(seed)
+    words = np.minimum(rng.zipf(1.2, size=(n_chunks, length)), vocabulary)
+    common = rng.random((n_chunks, len(COMMON_TERMS))) < [0.6, 0.5, 0.4, 0.3, 0.2]
+    return [
+        " ".join([f"w{word}" for word in row] + [term for term, present in zip(COMMON_TERMS, flags) if present])
+        for row, flags in zip(words.tolist(), common.tolist())
+    ]
+
+
+def exhaustive_top_k(index: InvertedIndex, terms, k: int):
+    """Score every posting of every term, then keep the k best"""
+    scores = index.bm25_scores(terms)
+    return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=100000, help="Synthetic chunks")
+    parser.add_argument("--queries", type=int, default=200, help="Queries to time")
+    parser.add_argument("--k", type=int, default=5, help="Results per query")
+    args = parser.parse_args()
+    
+    index = InvertedIndex()
+    for i, text in enumerate(synthetic_corpus(args.chunks, vocabulary=50000, length=60)):
+        index.add(f"chunk-{i}", text)
+    
+    rng = np.random.default_rng(1)
+    queries = []
+    for _ in range(args.queries):
+        # Two or three common terms plus one or two rarer terms
+        common = rng.choice(COMMON_TERMS, size=rng.integers(2, 4), replace=False).tolist()
+        rare = [f"w{word}" for word in rng.integers(20, 5000, size=rng.integers(1, 3)).tolist()]
+        queries.append(set(index.tokenize(" ".join(common + rare))))
+    
+    # Warm posting array caches for both paths
+    for terms in queries:
+        index.bm25_top_k(terms, args.k)
+    
+    mismatches = 0
+    for terms in queries:
+        expected = exhaustive_top_k(index, terms, args.k)
+        got = index.bm25_top_k(terms, args.k)
+        if [chunk_id for chunk_id, _ in expected] != [chunk_id for chunk_id, _ in got] or not np.allclose(
+            [score for _, score in expected], [score for _, score in got]
+        ):
+            mismatches += 1
+    
+    postings = sum(len(index._posting_arrays(term)[0]) for terms in queries for term in terms)
+    print(f"{args.chunks} chunks, {len(queries)} queries, {postings / len(queries):.0f} postings per query")
+    print(f"{'method':<12}{'p50 ms':>9}{'p95 ms':>9}")
+    for name, search in [
+        ("exhaustive", lambda terms: exhaustive_top_k(index, terms, args.k)),
+        ("maxscore", lambda terms: index.bm25_top_k(terms, args.k)),
+    ]:
+        latencies = [time_calls(lambda: search(terms), 1)[0] for terms in queries]
+        print(f"{name:<12}{percentile(latencies, 50):>9.2f}{percentile(latencies, 95):>9.2f}")
+    print(f"top-{args.k} mismatches: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Memory benchmark: per-chunk dicts vs slotted chunk records
+
+Builds the chunk table the store keeps in memory for N chunks, once as
+``{"content", "metadata"}`` dicts with a metadata copy per chunk (the old
+layout) and once as ChunkRecords sharing interned document metadata, and
+reports retained bytes per chunk. Chunk texts are shared by both layouts and
+not counted.
+    
+    python -m benchmarks.bench_memory [--sizes 10000 100000]
+"""
+import argparse
+import json
+import math
+import tracemalloc
+from typing import Callable, Dict, List
+
+from benchmarks.common import load_sample_chunks, replicate_chunks
+from app.services.chunk_records import DocumentRegistry
+
+
+def retained_bytes(build: Callable[[], Dict]) -> int:
+    """Bytes still allocated by build() once it returns"""
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    table = build()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del table
+    return after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000], help="Chunk counts")
+    args = parser.parse_args()
+    
+    samples = load_sample_chunks()
+    print(f"{'chunks':>8}{'dict B/chunk':>15}{'record B/chunk':>17}{'documents':>11}")
+    for size in args.sizes:
+        chunks = replicate_chunks(samples, math.ceil(size / len(samples)))[:size]
+        ids = [f"{chunk.metadata['id']}_{chunk.metadata['chunk_index']}" for chunk in chunks]
+        contents = [chunk.page_content for chunk in chunks]
+        # Metadata as it arrives from the operation log or a snapshot manifest
+        serialized: List[str] = [json.dumps(chunk.metadata) for chunk in chunks]
+        
+        def build_dicts():
+            return {
+                doc_id: {"content": content, "metadata": json.loads(metadata)}
+                for doc_id, content, metadata in zip(ids, contents, serialized)
+            }
+        
+        registry = DocumentRegistry()
+        
+        def build_records():
+            return {
+                doc_id: registry.make_chunk(json.loads(metadata), content=content)
+                for doc_id, content, metadata in zip(ids, contents, serialized)
+            }
+        
+        dict_bytes = retained_bytes(build_dicts)
+        record_bytes = retained_bytes(build_records)
+        print(f"{size:>8}{dict_bytes / size:>15.0f}{record_bytes / size:>17.0f}{len(registry):>11}")
+
+
+if __name__ == "__main__":
+    main()
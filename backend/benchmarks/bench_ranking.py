@@ -0,0 +1,59 @@
+"""
+Ranking benchmark: keyword overlap vs BM25 vs dense embeddings
+
+Reports recall@k on the labelled sample-document queries and query latency
+on the sample corpus and on synthetic copies of it.
+    
+    python -m benchmarks.bench_ranking [--copies 200] [--repeat 50]
+"""
+import argparse
+
+from benchmarks.common import (
+    LABELLED_QUERIES,
+    fresh_store,
+    load_sample_chunks,
+    percentile,
+    recall_at_k,
+    replicate_chunks,
+    time_calls,
+)
+
+MODES = ["keyword", "bm25", "dense"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--copies", type=int, default=200, help="Sample corpus copies for the latency run")
+    parser.add_argument("--repeat", type=int, default=20, help="Passes over the query set per mode")
+    args = parser.parse_args()
+    
+    chunks = load_sample_chunks()
+    questions = [question for question, _ in LABELLED_QUERIES]
+    
+    store = fresh_store()
+    store.add_documents(chunks)
+    print(f"Sample corpus: {len(chunks)} chunks, {len(questions)} labelled queries")
+    print(f"{'mode':<10}{'recall@1':>10}{'recall@3':>10}{'recall@5':>10}")
+    for mode in MODES:
+        search = lambda q, k, mode=mode: store.query(q, n_results=k, mode=mode)
+        print(
+            f"{mode:<10}"
+            + "".join(f"{recall_at_k(search, k):>10.2f}" for k in (1, 3, 5))
+        )
+    
+    store = fresh_store()
+    store.add_documents(replicate_chunks(chunks, args.copies))
+    print(f"\nLatency over {len(chunks) * args.copies} chunks ({args.copies} copies)")
+    print(f"{'mode':<10}{'p50 ms':>10}{'p95 ms':>10}")
+    for mode in MODES:
+        # Build any lazily constructed index before timing
+        store.query(questions[0], n_results=3, mode=mode)
+        latencies = []
+        for _ in range(args.repeat):
+            for question in questions:
+                latencies.extend(time_calls(lambda: store.query(question, n_results=3, mode=mode), 1))
+        print(f"{mode:<10}{percentile(latencies, 50):>10.2f}{percentile(latencies, 95):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Text splitter benchmark: LangChain RecursiveCharacterTextSplitter vs RecursiveTextSplitter
+
+Splits each sample document and the KLU Knowledge Base PDF, each repeated
+--copies times, with both splitters using the DocumentProcessor settings,
+reporting MB/sec and checking that both produce the same chunks and that
+every offset points at its chunk.
+    
+    python -m benchmarks.bench_splitter [--copies 50] [--repeat 5]
+"""
+import argparse
+import time
+from pathlib import Path
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from benchmarks.common import SAMPLE_DOCS_DIR
+from app.services.document_processor import DocumentProcessor
+from app.services.text_splitter import DEFAULT_SEPARATORS, RecursiveTextSplitter
+
+KNOWLEDGE_BASE_PDF = Path(__file__).parent.parent.parent / "KLU Knowledge Base.pdf"
+
+
+def load_texts():
+    """(name, text) of every sample document and the knowledge base PDF"""
+    texts = [(path.name, path.read_text(encoding="utf-8")) for path in sorted(SAMPLE_DOCS_DIR.iterdir())]
+    if KNOWLEDGE_BASE_PDF.exists():
+        texts.append((KNOWLEDGE_BASE_PDF.name, DocumentProcessor()._extract_pdf_text(str(KNOWLEDGE_BASE_PDF))))
+    return texts
+
+
+def best_seconds(func, text: str, repeat: int) -> float:
+    """Fastest of repeat calls"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--copies", type=int, default=50, help="Times each document is repeated")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per splitter (best is kept)")
+    args = parser.parse_args()
+    
+    processor = DocumentProcessor()
+    chunk_size, chunk_overlap = processor.chunk_size, processor.chunk_overlap
+    langchain = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        separators=list(DEFAULT_SEPARATORS),
+    )
+    native = RecursiveTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    
+    print(f"chunk_size={chunk_size} chunk_overlap={chunk_overlap} copies={args.copies}")
+    print(f"{'document':<32}{'MB':>7}{'chunks':>8}{'langchain MB/s':>16}{'native MB/s':>13}{'speedup':>9}{'same':>6}")
+    total_mb = langchain_seconds = native_seconds = 0.0
+    all_same = True
+    for name, text in load_texts():
+        text = "\n\n".join([text] * args.copies)
+        mb = len(text.encode("utf-8")) / (1024 * 1024)
+        
+        expected = langchain.split_text(text)
+        spans = native.split_offsets(text)
+        same = [text[start:end] for start, end in spans] == expected
+        all_same = all_same and same
+        
+        lc = best_seconds(langchain.split_text, text, args.repeat)
+        nt = best_seconds(native.split_offsets, text, args.repeat)
+        total_mb += mb
+        langchain_seconds += lc
+        native_seconds += nt
+        print(
+            f"{name[:31]:<32}{mb:>7.2f}{len(spans):>8}{mb / lc:>16.1f}"
+            f"{mb / nt:>13.1f}{lc / nt:>8.1f}x{str(same):>6}"
+        )
+    
+    print(
+        f"{'total':<32}{total_mb:>7.2f}{'':>8}{total_mb / langchain_seconds:>16.1f}"
+        f"{total_mb / native_seconds:>13.1f}{langchain_seconds / native_seconds:>8.1f}x{str(all_same):>6}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Backend benchmark: in-memory store vs SQLite FTS5 store
+
+Ingests the same corpus into both backends, then times reopening each
+store (with peak Python heap), BM25 query latency and recall@5 on the
+labelled queries. SQLite's own page cache is allocated outside the Python
+heap and is bounded by its cache_size pragma.
+    
+    python -m benchmarks.bench_sqlite [--copies 200] [--repeat 5]
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.common import (
+    LABELLED_QUERIES, load_sample_chunks, percentile, recall_at_k, replicate_chunks, time_calls,
+)
+from app.config import settings
+from app.services.sqlite_store import SQLiteVectorStore
+from app.services.vector_store import VectorStoreService
+
+
+def open_store(store_class, store_dir: str):
+    """Open a store singleton over a directory"""
+    settings.CHROMA_PERSIST_DIR = store_dir
+    store_class._instance = None
+    store_class._initialized = False
+    return store_class()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--copies", type=int, default=200, help="Sample corpus copies")
+    parser.add_argument("--repeat", type=int, default=5, help="Passes over the labelled queries")
+    args = parser.parse_args()
+    
+    settings.STORE_CHECKPOINT_INTERVAL = 10 ** 9
+    chunks = replicate_chunks(load_sample_chunks(), args.copies)
+    questions = [question for question, _ in LABELLED_QUERIES]
+    print(f"{len(chunks)} chunks")
+    print(
+        f"{'backend':<9}{'ingest s':>10}{'open+query ms':>15}{'peak heap MB':>14}"
+        f"{'disk MB':>9}{'p50 ms':>8}{'p95 ms':>8}{'R@5':>6}"
+    )
+    
+    for name, store_class in [("memory", VectorStoreService), ("sqlite", SQLiteVectorStore)]:
+        store_dir = tempfile.mkdtemp(prefix="klu_bench_")
+        store = open_store(store_class, store_dir)
+        start = time.perf_counter()
+        store.add_documents(chunks)
+        store.checkpoint()
+        ingest = time.perf_counter() - start
+        
+        tracemalloc.start()
+        start = time.perf_counter()
+        store = open_store(store_class, store_dir)
+        store.query("attendance policy", n_results=3, mode="bm25")
+        open_ms = (time.perf_counter() - start) * 1000
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        
+        disk = sum(
+            os.path.getsize(os.path.join(root, file))
+            for root, _, files in os.walk(store_dir) for file in files
+        )
+        latencies = time_calls(
+            lambda: [store.query(q, n_results=5, mode="bm25") for q in questions], args.repeat
+        )
+        per_query = [latency / len(questions) for latency in latencies]
+        recall = recall_at_k(lambda q, k: store.query(q, n_results=k, mode="bm25"), 5)
+        print(
+            f"{name:<9}{ingest:>10.2f}{open_ms:>15.1f}{peak / (1024 * 1024):>14.1f}"
+            f"{disk / (1024 * 1024):>9.1f}{percentile(per_query, 50):>8.2f}"
+            f"{percentile(per_query, 95):>8.2f}{recall:>6.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -98,6 +98,28 @@ export const documentsAPI = {
     getStats: () => {
         return api.get('/documents/stats');
     },
+
+    getJob: (jobId) => {
+        return api.get(`/documents/jobs/${jobId}`);
+    },
+};
+
+/**
+ * Poll an ingestion job until it completes or fails
+ * @param {string} jobId - Job ID returned by the upload endpoint
+ * @param {Function} onProgress - Optional callback with each job status
+ * @param {number} interval - Milliseconds between polls
+ * @returns {Promise<Object>} Final job status
+ */
+export const waitForIngestionJob = async (jobId, onProgress = null, interval = 1000) => {
+    while (true) {
+        const { data } = await documentsAPI.getJob(jobId);
+        if (onProgress) onProgress(data);
+        if (data.state === 'completed' || data.state === 'failed') {
+            return data;
+        }
+        await new Promise((resolve) => setTimeout(resolve, interval));
+    }
 };
 
 export const adminAPI = {
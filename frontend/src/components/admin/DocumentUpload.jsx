@@ -3,7 +3,7 @@ import { motion, AnimatePresence } from 'framer-motion';
 import { Upload, File, X, Check, AlertCircle, Loader2 } from 'lucide-react';
 import { formatFileSize, isFileAllowed, parseErrorMessage } from '../../utils/helpers';
 import { FILE_UPLOAD } from '../../utils/constants';
-import { documentsAPI } from '../../api/axios';
+import { documentsAPI, waitForIngestionJob } from '../../api/axios';
 import toast from 'react-hot-toast';
 
 const DocumentUpload = ({ onUploadSuccess }) => {
@@ -61,17 +61,37 @@ const DocumentUpload = ({ onUploadSuccess }) => {
             try {
                 const response = await documentsAPI.upload(file);
 
+                if (!response.data.success) {
+                    setUploadingFiles(prev => prev.map(f =>
+                        f.id === fileId ? { ...f, status: 'error' } : f
+                    ));
+                    toast.error(response.data.message);
+                    continue;
+                }
+
+                // Ingestion runs in the background; poll the job for progress
+                setUploadingFiles(prev => prev.map(f =>
+                    f.id === fileId ? { ...f, status: 'processing' } : f
+                ));
+                const job = await waitForIngestionJob(response.data.job_id, (status) => {
+                    setUploadingFiles(prev => prev.map(f =>
+                        f.id === fileId
+                            ? { ...f, pages: status.pages_processed, totalPages: status.total_pages, chunks: status.chunks_indexed }
+                            : f
+                    ));
+                });
+
                 setUploadingFiles(prev => prev.map(f =>
                     f.id === fileId
-                        ? { ...f, status: response.data.success ? 'success' : 'error' }
+                        ? { ...f, status: job.state === 'completed' ? 'success' : 'error', error: job.error }
                         : f
                 ));
 
-                if (response.data.success) {
+                if (job.state === 'completed') {
                     toast.success(`Uploaded: ${file.name}`);
                     if (onUploadSuccess) onUploadSuccess();
                 } else {
-                    toast.error(response.data.message);
+                    toast.error(`Failed to process ${file.name}`);
                 }
             } catch (error) {
                 setUploadingFiles(prev => prev.map(f =>
@@ -175,6 +195,11 @@ const DocumentUpload = ({ onUploadSuccess }) => {
                                             {file.status === 'uploading' && (
                                                 <span className="text-[10px] font-bold text-primary-600 bg-primary-100 px-1.5 py-0.5 rounded tracking-wide uppercase">Uploading...</span>
                                             )}
+                                            {file.status === 'processing' && (
+                                                <span className="text-[10px] font-bold text-primary-600 bg-primary-100 px-1.5 py-0.5 rounded tracking-wide uppercase">
+                                                    Processing{file.totalPages ? ` ${file.pages}/${file.totalPages} pages` : '...'}{file.chunks ? `, ${file.chunks} chunks` : ''}
+                                                </span>
+                                            )}
                                             {file.status === 'error' && file.error && (
                                                 <span className="text-[10px] font-bold text-red-600 bg-red-100 px-1.5 py-0.5 rounded tracking-wide truncate max-w-[150px]">{file.error}</span>
                                             )}
@@ -183,7 +208,7 @@ const DocumentUpload = ({ onUploadSuccess }) => {
                                 </div>
 
                                 <div className="flex items-center space-x-3">
-                                    {file.status === 'uploading' && (
+                                    {(file.status === 'uploading' || file.status === 'processing') && (
                                         <div className="bg-primary-50 p-1.5 rounded-full">
                                             <Loader2 size={18} className="text-primary-500 animate-spin" />
                                         </div>
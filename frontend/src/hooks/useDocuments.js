@@ -1,5 +1,5 @@
 import { useState, useCallback, useEffect } from 'react';
-import { documentsAPI } from '../api/axios';
+import { documentsAPI, waitForIngestionJob } from '../api/axios';
 import { parseErrorMessage } from '../utils/helpers';
 import toast from 'react-hot-toast';
 
@@ -42,14 +42,21 @@ const useDocuments = () => {
         try {
             const response = await documentsAPI.upload(file);
 
-            if (response.data.success) {
+            if (!response.data.success) {
+                toast.error(response.data.message);
+                return { success: false, error: response.data.message };
+            }
+
+            // Ingestion runs in the background; wait for the job to finish
+            const job = await waitForIngestionJob(response.data.job_id);
+            if (job.state === 'completed') {
                 toast.success(`Uploaded: ${file.name}`);
                 fetchDocuments();
                 fetchStats();
-                return { success: true, document: response.data.document };
+                return { success: true, document: job.document };
             } else {
-                toast.error(response.data.message);
-                return { success: false, error: response.data.message };
+                toast.error(job.error || `Failed to process ${file.name}`);
+                return { success: false, error: job.error };
             }
         } catch (err) {
             const errorMessage = parseErrorMessage(err);